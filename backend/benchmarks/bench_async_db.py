@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Benchmark database access under concurrent requests, sync Session vs AsyncSession.
+
+Simulates the routers: `--heavy` concurrent requests load a stored dataset while `--light`
+requests list the datasets, all on one event loop. The sync path calls `db_service` from the
+event loop like the routers used to; the async path awaits `async_db_service` on the aiosqlite
+engine. Reports wall time, request latencies and the worst event loop stall, which is what
+delays every other request the server is handling.
+
+Usage: python benchmarks/bench_async_db.py [--rows 20000] [--heavy 8] [--light 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+DB_PATH = Path(tempfile.mkdtemp()) / "bench.db"
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from database import async_db_service, db_service  # noqa: E402
+from database.migrations import upgrade  # noqa: E402
+from database.models import AsyncSessionLocal, SessionLocal, async_engine, engine  # noqa: E402
+
+
+async def sync_request(query, *args):
+    db = SessionLocal()
+    try:
+        return query(db, *args)
+    finally:
+        db.close()
+
+
+async def async_request(query, *args):
+    async with AsyncSessionLocal() as db:
+        return await query(db, *args)
+
+
+async def run_load(request, service, dataset_id: str, heavy: int, light: int):
+    stalls = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        # the loop should wake this every millisecond, any extra delay is time other requests wait
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - start - 0.001)
+
+    async def timed(query, *args):
+        start = time.perf_counter()
+        await request(query, *args)
+        return time.perf_counter() - start
+
+    async def light_requests():
+        latencies = []
+        for _ in range(light):
+            latencies.append(await timed(service.get_all_datasets))
+            await asyncio.sleep(0.002)
+        return latencies
+
+    monitor = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    heavy_latencies, light_latencies = await asyncio.gather(
+        asyncio.gather(*(timed(service.get_dataset_data, dataset_id) for _ in range(heavy))), light_requests()
+    )
+    wall = time.perf_counter() - start
+    done.set()
+    await monitor
+    return wall, list(heavy_latencies), light_latencies, max(stalls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--heavy", type=int, default=8)
+    parser.add_argument("--light", type=int, default=50)
+    args = parser.parse_args()
+
+    upgrade(engine)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(args.rows, 10)), columns=[f"col_{i}" for i in range(10)])
+    with SessionLocal() as db:
+        dataset_id = db_service.create_dataset(db, df, "bench.csv")
+    print(f"dataset: {args.rows} rows, {args.heavy} concurrent loads, {args.light} light requests")
+
+    print(
+        f"{'':>6} {'wall [s]':>9} {'load mean [s]':>14} {'light p50 [ms]':>15} "
+        f"{'light max [ms]':>15} {'stall [ms]':>11}"
+    )
+    for name, request, service in (
+        ("sync", sync_request, db_service),
+        ("async", async_request, async_db_service),
+    ):
+        wall, heavy, light, stall = asyncio.run(run_load(request, service, dataset_id, args.heavy, args.light))
+        print(
+            f"{name:>6} {wall:>9.2f} {np.mean(heavy):>14.2f} {np.median(light) * 1e3:>15.1f} "
+            f"{max(light) * 1e3:>15.1f} {stall * 1e3:>11.1f}"
+        )
+
+    asyncio.run(async_engine.dispose())
+    DB_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Benchmark dataset sanitization on a wide synthetic dataset.
+
+Compares `sanitize_dataset` against the previous column-at-a-time implementation
+(kept below as `legacy_sanitize`) in wall time and peak traced memory.
+
+Usage: python benchmarks/bench_sanitize.py [--rows 5000] [--columns 500]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.data_utils import sanitize_dataset  # noqa: E402
+
+
+def legacy_sanitize(data):
+    df = pd.DataFrame(data)
+    numeric_cols = []
+    string_cols = []
+    for col in df.columns:
+        if df[col].isna().all():
+            continue
+        try:
+            non_null_values = df[col].dropna()
+            if len(non_null_values) > 0:
+                pd.to_numeric(non_null_values.iloc[0])
+                numeric_cols.append(col)
+            else:
+                string_cols.append(col)
+        except (ValueError, TypeError):
+            string_cols.append(col)
+    for col in numeric_cols:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+        if df[col].isna().any():
+            mean_val = df[col].mean()
+            df[col] = df[col].fillna(0 if pd.isna(mean_val) else mean_val)
+    for col in string_cols:
+        df[col] = df[col].fillna("")
+        df[col] = df[col].astype(str)
+    return df
+
+
+def make_dataset(rows: int, columns: int) -> list:
+    rng = np.random.default_rng(0)
+    data = {}
+    for i in range(columns):
+        kind = i % 5
+        if kind == 0:
+            values = rng.normal(size=rows).round(3).tolist()
+        elif kind == 1:
+            values = rng.integers(0, 100, size=rows).astype(float).tolist()
+        elif kind == 2:
+            values = [None if j % 13 == 0 else float(v) for j, v in enumerate(rng.normal(size=rows))]
+        elif kind == 3:
+            values = [f"group_{v}" for v in rng.integers(0, 8, size=rows)]
+        else:
+            # mostly numeric with a few invalid entries
+            values = [("n/a" if j % 101 == 0 else float(v)) for j, v in enumerate(rng.integers(0, 10, size=rows))]
+        data[f"col_{i}"] = values
+    return pd.DataFrame(data).replace({np.nan: None}).to_dict(orient="records")
+
+
+def measure(fn, make_input):
+    # timed and traced separately, tracemalloc slows down allocation-heavy code unevenly
+    data = make_input()
+    start = time.perf_counter()
+    result = fn(data)
+    elapsed = time.perf_counter() - start
+
+    data = make_input()
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--columns", type=int, default=500)
+    args = parser.parse_args()
+
+    records = make_dataset(args.rows, args.columns)
+    print(f"dataset: {args.rows} rows x {args.columns} columns")
+
+    # JSON records as received by /dataset/upload, and a parsed frame as produced by the file reader
+    for input_name, make_input in (("records", lambda: records), ("frame", lambda: pd.DataFrame(records))):
+        legacy_time, legacy_peak, legacy_df = measure(legacy_sanitize, make_input)
+        new_time, new_peak, (new_df, _) = measure(sanitize_dataset, make_input)
+
+        print(f"\ninput: {input_name}")
+        print(f"{'':>10} {'time [s]':>10} {'peak [MB]':>10} {'frame [MB]':>11}")
+        for name, elapsed, peak, df in (
+            ("legacy", legacy_time, legacy_peak, legacy_df),
+            ("vectorized", new_time, new_peak, new_df),
+        ):
+            frame_mb = df.memory_usage(deep=True).sum() / 2**20
+            print(f"{name:>10} {elapsed:>10.3f} {peak / 2**20:>10.1f} {frame_mb:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
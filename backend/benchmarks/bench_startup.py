@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Benchmark server startup time against a budget.
+
+Each run starts a fresh interpreter that imports the app (`run.py`) and runs its lifespan
+startup (migrations, fingerprint backfill) on an empty temporary database, with the ML
+warm-up disabled. Reports the median import and startup times, checks that none of the
+lazily imported ML libraries was loaded during startup, and measures how long warming
+them up takes afterwards, which is what the first ML request pays without warm-up.
+
+Exits with status 1 when the median startup time exceeds the budget or an ML library was
+imported eagerly, so the benchmark can run in CI.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--budget 2.5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import run
+imported = time.perf_counter()
+
+async def startup():
+    async with run.app.router.lifespan_context(run.app):
+        pass
+
+asyncio.run(startup())
+started = time.perf_counter()
+
+from utils.lazy_import import import_status, warm_up
+eager = [name for name, loaded in import_status().items() if loaded]
+warm_up_start = time.perf_counter()
+warm_up()
+print(json.dumps({
+    "import": imported - start,
+    "startup": started - start,
+    "warm_up": time.perf_counter() - warm_up_start,
+    "eager": eager,
+}))
+"""
+
+
+def probe(directory: str) -> dict:
+    env = dict(
+        os.environ,
+        SQLALCHEMY_DATABASE_URL=f"sqlite:///{Path(directory) / 'startup.db'}",
+        CACHE_DIR=str(Path(directory) / "cache"),
+        ML_WARMUP="false",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=2.5, help="maximum median startup time in seconds")
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            runs.append(probe(directory))
+
+    print(f"{'':>9} {'median [s]':>11} {'max [s]':>8}")
+    for name in ("import", "startup", "warm_up"):
+        values = [run[name] for run in runs]
+        print(f"{name:>9} {np.median(values):>11.2f} {max(values):>8.2f}")
+
+    startup = float(np.median([run["startup"] for run in runs]))
+    eager = sorted({name for run in runs for name in run["eager"]})
+    failed = False
+    if eager:
+        print(f"FAIL: imported during startup: {', '.join(eager)}")
+        failed = True
+    if startup > args.budget:
+        print(f"FAIL: startup {startup:.2f}s exceeds the budget of {args.budget:.2f}s")
+        failed = True
+    if not failed:
+        print(f"OK: startup {startup:.2f}s within the budget of {args.budget:.2f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
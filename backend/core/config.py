@@ -11,10 +11,69 @@ class CONFIG:
     API_DESCRIPTION = "API for three layered visualization operations"
     MAX_REQUEST_SIZE = 1024 * 1024 * 100  # 100MB
 
+    # Upload settings
+    UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR")  # None: system temp dir
+    UPLOAD_READ_CHUNK_ROWS = int(os.getenv("UPLOAD_READ_CHUNK_ROWS", 50_000))
+    # dataset bundles found here are imported when the production server starts (see serve.py)
+    BUNDLE_IMPORT_DIR = os.getenv("BUNDLE_IMPORT_DIR")
+
+    # Sanitization settings
+    SANITIZE_SAMPLE_ROWS = 2_000  # rows sampled for column type inference
+    SANITIZE_NUMERIC_THRESHOLD = 0.9  # share of sampled values that must parse for a column to be numeric
+    FINGERPRINT_BLOCK_ROWS = 65_536  # rows hashed at a time when fingerprinting a dataset
+    # column summaries computed at upload, see utils.column_summary
+    SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+    SUMMARY_HISTOGRAM_BINS = (2, 5, 10, 15, 20, 25, 30)  # the bin counts offered by the Data Panel
+    SUMMARY_TOP_VALUES = 10  # most frequent values listed for non-numeric columns
+
     SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL", "sqlite:///./app.db")
+    SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL")  # None: derived from the sync URL
+
+    # Storage profile, keyed by dialect name (see database.engine)
+    # settings applied to every new connection: PRAGMAs for SQLite, SET for PostgreSQL
+    DATABASE_CONNECTION_SETTINGS = {
+        "sqlite": {
+            "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),  # readers are not blocked by a writer
+            "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # safe with WAL, fsync only at checkpoints
+            "cache_size": -64_000,  # 64MB page cache per connection
+            "mmap_size": 256 * 1024 * 1024,  # 256MB memory mapped reads
+            "temp_store": "MEMORY",
+            "busy_timeout": 5_000,  # ms to wait for a lock instead of failing with "database is locked"
+        },
+        "postgresql": {},
+    }
+    DATABASE_POOL_OPTIONS = {
+        "sqlite": {"pool_size": 8, "max_overflow": 8},
+        "postgresql": {"pool_size": 10, "max_overflow": 20, "pool_pre_ping": True, "pool_recycle": 1800},
+    }
 
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
+    # production server (serve.py): worker processes and seconds to finish open requests on shutdown
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.cpu_count() or 1))
+    SERVER_GRACEFUL_SHUTDOWN_TIMEOUT = 30
+    # directory of the store shared by the workers, set by serve.py (None: a private store per process)
+    SHARED_STORE_DIR = os.getenv("SHARED_STORE_DIR")
+    # import the ML libraries in a background thread after startup instead of on the first request
+    ML_WARMUP = os.getenv("ML_WARMUP", "true").lower() == "true"
+
+    # CPU job settings: concurrent CPU-heavy jobs share the thread budget, see core.resources
+    CPU_JOB_LIMIT = int(os.getenv("CPU_JOB_LIMIT", 2))
+    CPU_THREAD_BUDGET = int(os.getenv("CPU_THREAD_BUDGET", os.cpu_count() or 1))
+    CPU_JOB_QUEUE_SIZE = int(os.getenv("CPU_JOB_QUEUE_SIZE", 16))  # waiting jobs beyond this are rejected
+    CPU_JOB_QUEUE_TIMEOUT = float(os.getenv("CPU_JOB_QUEUE_TIMEOUT", 30))  # seconds a job waits for a slot
+
+    # Cache settings
+    CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+    SHAP_VALUES_CACHE_MEMORY_ENTRIES = 512
+    SHAP_VALUES_CACHE_MAX_DISK_BYTES = 64 * 1024 * 1024  # 64MB
+    SHAP_MODEL_CACHE_MEMORY_ENTRIES = 16
+    SHAP_MODEL_CACHE_MAX_DISK_BYTES = 1024 * 1024 * 1024  # 1GB
+    PARTITION_SIMILARITY_CACHE_MEMORY_ENTRIES = 16
+    PARTITION_SIMILARITY_CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024  # 256MB
+    PAIR_VIEW_CACHE_MEMORY_ENTRIES = 64
+    PAIR_VIEW_CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024  # 256MB
+    CLUSTER_MODEL_SETS_MEMORY_ENTRIES = 16  # decoded model sets with their KD-trees, see load_cluster_models
 
     # Logging settings
     LOG_LEVEL = "DEBUG"
@@ -25,3 +84,65 @@ class CONFIG:
         "xgboost": {"n_estimators": 100, "learning_rate": 0.1, "max_depth": 6, "random_state": 42},
         "lightgbm": {"n_estimators": 100, "learning_rate": 0.1, "max_depth": 6, "random_state": 42},
     }
+    # batch computation: models trained concurrently, each with its share of the job's threads
+    SHAP_BATCH_WORKERS = int(os.getenv("SHAP_BATCH_WORKERS", 4))
+    # budgeted mode: the model is fitted on a row subsample and explained on as many rows as the budget allows
+    SHAP_BUDGET_FIT_ROWS = 20_000  # maximum rows used to fit the model
+    SHAP_BUDGET_PILOT_ROWS = 256  # rows explained first to estimate the cost per row
+    SHAP_BUDGET_MIN_EXACT_ROWS = 1_000  # below this sample size, approximate (Saabas) SHAP is used instead
+    SHAP_EXPLAIN_CHUNK_ROWS = 2_000  # rows explained per task
+    SHAP_EXPLAIN_PROCESSES = int(os.getenv("SHAP_EXPLAIN_PROCESSES", 1))  # >1: explain chunks in a process pool
+    SHAP_CONFIDENCE_LEVEL = 0.95
+    # interaction values cost O(features^2) per row, they are computed on a random row sample
+    SHAP_INTERACTION_SAMPLE_ROWS = 1_000  # maximum rows explained
+    SHAP_INTERACTION_PILOT_ROWS = 32  # rows explained first to estimate the cost per row
+    SHAP_INTERACTION_CHUNK_ROWS = 250
+    SHAP_INTERACTION_LATENCY_BUDGET = 5.0  # seconds, fewer rows are explained if the sample does not fit
+    # cluster membership explanations: classifiers fitted and explained on random row samples
+    CLUSTER_EXPLAIN_FIT_ROWS = 20_000
+    CLUSTER_EXPLAIN_ROWS = 2_000
+
+    # Clustering pre-pass: pairs of columns correlated at least this much are clustered last (or skipped)
+    CLUSTERING_CORRELATION_THRESHOLD = 0.9999
+    CLUSTERING_SKIP_CORRELATED_PAIRS = os.getenv("CLUSTERING_SKIP_CORRELATED_PAIRS", "false").lower() == "true"
+    # Appended rows are assigned to the stored clusters; a pair is refitted when the outlier rate of the rows
+    # assigned since its last fit exceeds that of the fitted rows by the threshold (see ClusterModel)
+    CLUSTERING_OUTLIER_QUANTILE = 0.95  # k-means points farther from their centroid than this quantile are outliers
+    CLUSTERING_DRIFT_THRESHOLD = float(os.getenv("CLUSTERING_DRIFT_THRESHOLD", 0.1))
+    CLUSTERING_DRIFT_MIN_ROWS = 30  # assigned rows needed before a pair can be refitted
+    CLUSTER_PREDICT_CHUNK_ELEMENTS = 1 << 18  # row x centroid distances computed at a time when labelling new rows
+
+    # Approximate cluster similarity: MinHash signatures computed when clusters are saved, see utils.minhash
+    MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", 128))  # 0: no signatures, exact similarities only
+    MINHASH_SEED = 1
+    MINHASH_BANDS = 32  # LSH bands of 4 values, pairs with Jaccard index above ~0.4 are likely candidates
+    MINHASH_CONFIDENCE = 0.95  # probability that an estimate lies within the reported error bound
+    SIMILARITY_DEFAULT_TOP_K = 20  # matches returned by approximate similarity requests without top_k
+    SIMILARITY_MAX_RERANK = 200  # maximum clusters whose exact Jaccard index is computed for re-ranking
+    # partition similarity (ARI/NMI/max-Jaccard between the clusterings of feature pairs)
+    PARTITION_SIMILARITY_CHUNK_ELEMENTS = 1 << 24  # labels combined per block, bounds the temporary memory
+    PARTITION_SIMILARITY_PROCESSES = int(os.getenv("PARTITION_SIMILARITY_PROCESSES", 1))  # >1: blocks in a process pool
+    # downsampled scatter and density tiles of a feature pair (Panel 2), see utils.pair_view
+    PAIR_VIEW_RESOLUTION = 128  # default grid cells per axis, the strata of samples and the tiles of densities
+    PAIR_VIEW_MAX_RESOLUTION = 1024
+    PAIR_VIEW_POINTS = 5_000  # default sample size
+    PAIR_VIEW_MAX_POINTS = 100_000
+    PAIR_VIEW_SEED = 1  # samples are reproducible, so repeated requests show the same points
+    # heatmap tiles of the Data Panel, served from pyramids of row blocks, see utils.heatmap
+    HEATMAP_TILE_ROWS = 256  # blocks per tile, the coarsest zoom level fits in one tile
+    HEATMAP_TILE_COLUMNS = 64
+    HEATMAP_ZOOM_FACTOR = 4  # rows per block grow by this factor from one zoom level to the next coarser one
+    HEATMAP_BUILD_COLUMNS = 32  # columns aggregated at a time when building a pyramid, bounds the temporary memory
+    # precompute pipeline run in the background after uploads, see routers.precompute
+    # stages to run, from "summary", "clusters", "shapley" and "similarity" (empty: none)
+    PIPELINE_STAGES = tuple(
+        stage.strip()
+        for stage in os.getenv("PIPELINE_STAGES", "summary,clusters,shapley,similarity").split(",")
+        if stage.strip()
+    )
+    PIPELINE_CLUSTER_COLUMNS = 8  # first numeric columns whose pairs are clustered if a dataset has no clusters
+    PIPELINE_SHAP_TARGETS = 1  # likely target columns whose Shapley values are computed
+    PIPELINE_TARGET_MAX_CLASSES = 20  # numeric columns with at most this many distinct values look like class labels
+    # background jobs run on idle priority threads once no request job runs or waits, see ResourceGovernor
+    BACKGROUND_JOB_WORKERS = 1
+    BACKGROUND_IDLE_POLL = 0.5  # seconds between checks whether the CPU jobs are idle
@@ -0,0 +1,58 @@
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies larger than `max_size` bytes.
+
+    The declared Content-Length is checked up front; chunked bodies without a length
+    are counted while they are received, so the limit holds for streamed uploads too.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int) -> None:
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                await self._reject(send, 400, "Invalid Content-Length header")
+                return
+            if declared > self.max_size:
+                await self._reject(send, 413, self._detail())
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"Request body exceeds the maximum size of {self.max_size} bytes"
+
+    async def _reject(self, send: Send, status: int, detail: str) -> None:
+        body = f'{{"detail":"{detail}"}}'.encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,188 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, TypeVar
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from threadpoolctl import threadpool_limits
+
+from core.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+def lower_thread_priority() -> None:
+    """
+    Run the calling thread at idle priority, so it only gets CPU time no other thread wants.
+    Linux schedules threads individually (pid 0 is the calling thread) and threads started by it,
+    such as native thread pools, inherit the policy. Elsewhere the thread keeps its priority.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Background jobs run at normal priority: {str(e)}")
+
+
+class ResourceGovernor:
+    """
+    Central limit on CPU-heavy jobs (clustering, model training, SHAP explanations).
+
+    At most `max_jobs` jobs run at the same time and each gets `thread_budget // max_jobs` threads:
+    native thread pools (OpenMP, BLAS) are limited with threadpoolctl while a job runs, and
+    models take the same count through their n_jobs parameter (`threads_per_job`). Further jobs
+    wait up to `queue_timeout` seconds for a slot; when `queue_size` jobs are already waiting or
+    the timeout expires, the request is rejected with 503 so clients can retry later.
+
+    Background jobs (work no request waits for) start only while no job runs or waits, and run on
+    `background_workers` idle priority threads without taking a slot, see `run_background`.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int,
+        thread_budget: int,
+        queue_size: int,
+        queue_timeout: float,
+        background_workers: int = 1,
+        idle_poll: float = 0.5,
+    ) -> None:
+        self.max_jobs = max(1, max_jobs)
+        self.threads_per_job = max(1, thread_budget // self.max_jobs)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_jobs)
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._running: Dict[int, Dict[str, Any]] = {}
+        self._waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self.idle_poll = idle_poll
+        self._background = ThreadPoolExecutor(
+            max_workers=max(1, background_workers),
+            thread_name_prefix="background-job",
+            initializer=lower_thread_priority,
+        )
+        self._background_jobs: Dict[int, Dict[str, Any]] = {}
+
+    def apply_process_limits(self) -> None:
+        """
+        Limit the native thread pools of the process to the per-job thread count.
+        BLAS limits are process-wide, so jobs that end restore this value instead of the core count.
+        """
+        threadpool_limits(limits=self.threads_per_job)
+
+    @contextmanager
+    def job(self, name: str) -> Iterator[int]:
+        """Run a block as a CPU job, yields the number of threads the job may use."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.queue_size:
+                    self._rejected += 1
+                    raise self._busy(f"Too many queued {name} jobs")
+                self._waiting += 1
+
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self._waiting -= 1
+                if not acquired:
+                    self._rejected += 1
+            if not acquired:
+                raise self._busy(f"No CPU slot for {name} job within {self.queue_timeout}s")
+
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._running[job_id] = {"name": name, "started": time.monotonic()}
+        try:
+            with threadpool_limits(limits=self.threads_per_job):
+                yield self.threads_per_job
+        finally:
+            with self._lock:
+                del self._running[job_id]
+                self._completed += 1
+            self._slots.release()
+
+    async def run(self, name: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run func as a CPU job in the thread pool, so waiting for a slot does not block the event loop."""
+
+        def run_job() -> T:
+            with self.job(name):
+                return func(*args, **kwargs)
+
+        return await run_in_threadpool(run_job)
+
+    def idle(self) -> bool:
+        """Whether no job runs or waits for a slot."""
+        with self._lock:
+            return not self._running and not self._waiting
+
+    async def run_background(self, name: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run func as a background job once no job runs or waits, on an idle priority thread (see
+        lower_thread_priority). It takes no slot: jobs of requests that arrive meanwhile start right
+        away and get the CPU first, the background job only slows down.
+        """
+        while not self.idle():
+            await asyncio.sleep(self.idle_poll)
+
+        def run_job() -> T:
+            job_id = next(self._job_ids)
+            with self._lock:
+                self._background_jobs[job_id] = {"name": name, "started": time.monotonic()}
+            try:
+                with threadpool_limits(limits=self.threads_per_job):
+                    return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    del self._background_jobs[job_id]
+
+        return await asyncio.get_running_loop().run_in_executor(self._background, run_job)
+
+    def shutdown(self) -> None:
+        """Drop queued background jobs, a running one finishes on its thread."""
+        self._background.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "max_jobs": self.max_jobs,
+                "threads_per_job": self.threads_per_job,
+                "running": len(self._running),
+                "waiting": self._waiting,
+                "queue_size": self.queue_size,
+                "utilization": len(self._running) / self.max_jobs,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "jobs": [
+                    {"name": job["name"], "seconds": round(now - job["started"], 3)} for job in self._running.values()
+                ],
+                "background": [
+                    {"name": job["name"], "seconds": round(now - job["started"], 3)}
+                    for job in self._background_jobs.values()
+                ],
+            }
+
+    def _busy(self, detail: str) -> HTTPException:
+        logger.warning(f"Rejecting CPU job: {detail}")
+        return HTTPException(
+            status_code=503, detail=f"Server busy: {detail}", headers={"Retry-After": str(int(self.queue_timeout))}
+        )
+
+
+governor = ResourceGovernor(
+    max_jobs=CONFIG.CPU_JOB_LIMIT,
+    thread_budget=CONFIG.CPU_THREAD_BUDGET,
+    queue_size=CONFIG.CPU_JOB_QUEUE_SIZE,
+    queue_timeout=CONFIG.CPU_JOB_QUEUE_TIMEOUT,
+    background_workers=CONFIG.BACKGROUND_JOB_WORKERS,
+    idle_poll=CONFIG.BACKGROUND_IDLE_POLL,
+)
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces identical computations in flight: while a call with a key runs, further calls with the
+    same key wait for its result instead of running it again. Keys are built like cache keys (see
+    utils.cache.make_cache_key); results are not kept once the call is done, the caches are for that.
+
+    The call runs as a task of its own, so a caller that disconnects does not cancel it for the others.
+    Calls are coalesced within a process, the workers of serve.py each run their own.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._coalesced = 0
+
+    async def run(self, key: str, func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Await func(*args, **kwargs), or the call with the same key that is already in flight."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(func(*args, **kwargs), name=f"single-flight-{key}")
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._coalesced += 1
+            logger.info(f"Joining computation in flight: {key}")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, in case every caller went away
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": sorted(self._calls), "coalesced": self._coalesced}
+
+
+# computations of requests, keyed by dataset, operation and parameters
+in_flight = SingleFlight()
@@ -0,0 +1,276 @@
+# Async counterparts of the db_service functions for AsyncSession (see models.get_async_db).
+# Queries run on the async engine, so waiting for the database does not block the event loop;
+# the query logic itself is shared with db_service through AsyncSession.run_sync. Large JSON
+# columns are fetched as text and decoded in the thread pool, decoding them in the result
+# processing would stall the event loop just as long as a blocking query. For the same reason
+# rows and clusters are serialized in the thread pool before they are written (see
+# db_service.encode_records and db_service.prepare_cluster_rows), run_sync only does the session work.
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Text, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from database import db_service
+from database.models import Cluster, ClusterGroup, Dataset
+from utils.column_summary import ColumnSummaries, filled_counts, summarize_columns
+from utils.data_utils import SanitizationReport, canonical_pair
+from utils.fingerprint import fingerprint_dataframe
+
+
+async def create_dataset(
+    db: AsyncSession,
+    data: pd.DataFrame | List[Dict],
+    filename: Optional[str] = None,
+    report: Optional[SanitizationReport] = None,
+) -> str:
+    """
+    Create a new dataset or return existing dataset ID, fingerprinting and summarizing the data in the
+    thread pool. The sanitization report adds the values that were filled to the summary.
+    """
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    fingerprint = await run_in_threadpool(fingerprint_dataframe, df)
+    existing_id = await db.run_sync(db_service.find_dataset_id, fingerprint)
+    if existing_id:
+        return existing_id
+    summary = await run_in_threadpool(summarize_columns, df, filled_counts(report))
+    data_json = await run_in_threadpool(db_service.encode_records, data)
+    return await db.run_sync(db_service.create_dataset, df, filename, fingerprint, summary, data_json)
+
+
+async def get_dataset_data(db: AsyncSession, dataset_id: str) -> List[Dict]:
+    raw_data = await db.scalar(select(type_coerce(Dataset.data, Text)).where(Dataset.id == dataset_id))
+    if raw_data is None:
+        return []
+    return await run_in_threadpool(json.loads, raw_data) or []
+
+
+async def get_all_datasets(db: AsyncSession) -> List[Dict[str, str]]:
+    return await db.run_sync(db_service.get_all_datasets)
+
+
+async def delete_dataset(db: AsyncSession, dataset_id: str) -> bool:
+    return await db.run_sync(db_service.delete_dataset, dataset_id)
+
+
+async def reset_datasets(db: AsyncSession) -> None:
+    await db.run_sync(db_service.reset_datasets)
+
+
+async def replace_dataset_data(
+    db: AsyncSession, dataset_id: str, df: pd.DataFrame, missing: Optional[Dict[str, int]] = None
+) -> bool:
+    """Replace the rows of a dataset, fingerprinting, summarizing and serializing the data in the thread pool."""
+    fingerprint = await run_in_threadpool(fingerprint_dataframe, df)
+    summary = await run_in_threadpool(summarize_columns, df, missing)
+    data_json = await run_in_threadpool(db_service.encode_records, df)
+    return await db.run_sync(db_service.replace_dataset_data, dataset_id, df, fingerprint, summary, data_json)
+
+
+async def append_dataset_rows(
+    db: AsyncSession,
+    dataset_id: str,
+    version: int,
+    df: pd.DataFrame,
+    missing: Optional[Dict[str, int]],
+    results: Dict[str, Dict[str, Dict[int, List[int]]]],
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]],
+) -> bool:
+    """Replace the rows and clusters of a dataset at a version, serializing both in the thread pool."""
+    fingerprint = await run_in_threadpool(fingerprint_dataframe, df)
+    summary = await run_in_threadpool(summarize_columns, df, missing)
+    data_json = await run_in_threadpool(db_service.encode_records, df)
+    cluster_rows = await run_in_threadpool(db_service.prepare_cluster_rows, results)
+    return await db.run_sync(
+        db_service.append_dataset_rows,
+        dataset_id,
+        version,
+        df,
+        fingerprint,
+        summary,
+        results,
+        models,
+        data_json,
+        cluster_rows,
+    )
+
+
+async def get_dataset_contents(db: AsyncSession, dataset_id: str) -> Optional[Dict[str, Any]]:
+    return await db.run_sync(db_service.get_dataset_contents, dataset_id)
+
+
+async def import_dataset(
+    db: AsyncSession,
+    dataset_id: str,
+    filename: Optional[str],
+    fingerprints: List[str],
+    summary: Optional[ColumnSummaries],
+    records: List[Dict],
+    algorithm: Optional[str],
+    clusters: Dict[str, Dict[str, Dict[int, List[int]]]],
+    signatures: Optional[np.ndarray],
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]],
+    shapley_values: Dict[str, List[Dict[str, Any]]],
+) -> Tuple[str, bool]:
+    """Import a dataset, serializing its records and clusters in the thread pool."""
+    data_json = await run_in_threadpool(db_service.encode_records, records)
+    cluster_rows = await run_in_threadpool(db_service.prepare_cluster_rows, clusters, signatures)
+    return await db.run_sync(
+        db_service.import_dataset,
+        dataset_id,
+        filename,
+        fingerprints,
+        summary,
+        records,
+        algorithm,
+        clusters,
+        signatures,
+        models,
+        shapley_values,
+        data_json,
+        cluster_rows,
+    )
+
+
+async def get_dataset_version(db: AsyncSession, dataset_id: str) -> Optional[int]:
+    return await db.run_sync(db_service.get_dataset_version, dataset_id)
+
+
+async def get_dataset_summary(db: AsyncSession, dataset_id: str) -> Optional[ColumnSummaries]:
+    return await db.run_sync(db_service.get_dataset_summary, dataset_id)
+
+
+async def save_dataset_summary(db: AsyncSession, dataset_id: str, summary: ColumnSummaries) -> None:
+    await db.run_sync(db_service.save_dataset_summary, dataset_id, summary)
+
+
+async def save_clusters(
+    db: AsyncSession,
+    dataset_id: str,
+    results: Dict[str, Dict[str, Dict[int, List[int]]]],
+    algorithm: str,
+    models: Optional[Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]]] = None,
+    replace: bool = True,
+) -> bool:
+    """Save clusters, computing their MinHash signatures and serializing them in the thread pool."""
+    cluster_rows = await run_in_threadpool(db_service.prepare_cluster_rows, results)
+    return await db.run_sync(
+        db_service.save_clusters, dataset_id, results, algorithm, None, models, cluster_rows, replace
+    )
+
+
+async def update_clusters(
+    db: AsyncSession,
+    dataset_id: str,
+    results: Dict[str, Dict[str, Dict[int, List[int]]]],
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]],
+) -> None:
+    """Replace the clusters of some feature pairs, computing their MinHash signatures in the thread pool."""
+    cluster_rows = await run_in_threadpool(db_service.prepare_cluster_rows, results)
+    await db.run_sync(db_service.update_clusters, dataset_id, results, models, None, cluster_rows)
+
+
+async def get_cluster_models(
+    db: AsyncSession, dataset_id: str
+) -> Dict[Tuple[str, str], Tuple[Optional[Dict[str, Any]], Optional[bytes]]]:
+    return await db.run_sync(db_service.get_cluster_models, dataset_id)
+
+
+async def get_all_clusters(db: AsyncSession, dataset_id: str) -> Dict[str, Dict[str, Dict[int, List[int]]]]:
+    rows = (
+        await db.execute(
+            select(
+                ClusterGroup.feature1,
+                ClusterGroup.feature2,
+                Cluster.cluster_id,
+                type_coerce(Cluster.data_point_indices, Text),
+            )
+            .outerjoin(Cluster, Cluster.cluster_group_id == ClusterGroup.id)
+            .where(ClusterGroup.dataset_id == dataset_id)
+        )
+    ).all()
+    return await run_in_threadpool(_decode_clusters, rows)
+
+
+def _decode_clusters(
+    rows: List[Tuple[str, str, Optional[int], Optional[str]]],
+) -> Dict[str, Dict[str, Dict[int, List[int]]]]:
+    result: Dict[str, Dict[str, Dict[int, List[int]]]] = {}
+    for feature1, feature2, cluster_id, raw_indices in rows:
+        feature_clusters = result.setdefault(feature1, {}).setdefault(feature2, {})
+        if cluster_id is not None:
+            feature_clusters[cluster_id] = json.loads(raw_indices)
+    return result
+
+
+async def get_cluster_signatures(db: AsyncSession, dataset_id: str) -> Dict[Tuple[str, str, int], Optional[bytes]]:
+    return await db.run_sync(db_service.get_cluster_signatures, dataset_id)
+
+
+async def get_clustered_feature_pairs(db: AsyncSession, dataset_id: str) -> List[Tuple[str, str]]:
+    return await db.run_sync(db_service.get_clustered_feature_pairs, dataset_id)
+
+
+async def get_clusters_by_features(
+    db: AsyncSession, dataset_id: str, feature1: str, feature2: str
+) -> Optional[Dict[int, List[int]]]:
+    """Get clusters for a specific feature pair, in either order, decoding their indices in the thread pool."""
+    feature1, feature2 = canonical_pair(feature1, feature2)
+    rows = (
+        await db.execute(
+            select(Cluster.cluster_id, type_coerce(Cluster.data_point_indices, Text))
+            .select_from(ClusterGroup)
+            .outerjoin(Cluster, Cluster.cluster_group_id == ClusterGroup.id)
+            .where(
+                ClusterGroup.dataset_id == dataset_id,
+                ClusterGroup.feature1 == feature1,
+                ClusterGroup.feature2 == feature2,
+            )
+        )
+    ).all()
+    if not rows:
+        return None
+    return await run_in_threadpool(_decode_pair_clusters, rows)
+
+
+def _decode_pair_clusters(rows: List[Tuple[Optional[int], Optional[str]]]) -> Dict[int, List[int]]:
+    return {cluster_id: json.loads(raw_indices) for cluster_id, raw_indices in rows if cluster_id is not None}
+
+
+async def save_shapley_values(
+    db: AsyncSession, dataset_id: str, target_column: str, shapley_values: List[Dict[str, Any]]
+) -> None:
+    await db.run_sync(db_service.save_shapley_values, dataset_id, target_column, shapley_values)
+
+
+async def save_shapley_values_bulk(
+    db: AsyncSession, dataset_id: str, shapley_values: Dict[str, List[Dict[str, Any]]]
+) -> None:
+    await db.run_sync(db_service.save_shapley_values_bulk, dataset_id, shapley_values)
+
+
+async def get_shapley_values(db: AsyncSession, dataset_id: str, target_column: str) -> List[Dict[str, Any]]:
+    return await db.run_sync(db_service.get_shapley_values, dataset_id, target_column)
+
+
+async def start_pipeline(db: AsyncSession, dataset_id: str, stages: List[str]) -> None:
+    await db.run_sync(db_service.start_pipeline, dataset_id, stages)
+
+
+async def update_pipeline_stage(
+    db: AsyncSession,
+    dataset_id: str,
+    stage: str,
+    status: str,
+    detail: Optional[str] = None,
+    seconds: Optional[float] = None,
+) -> bool:
+    return await db.run_sync(db_service.update_pipeline_stage, dataset_id, stage, status, detail, seconds)
+
+
+async def get_pipeline_stages(db: AsyncSession, dataset_id: str) -> List[Dict[str, Any]]:
+    return await db.run_sync(db_service.get_pipeline_stages, dataset_id)
@@ -1,52 +1,88 @@
 import json
-from typing import Any, Dict, List, Optional
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from sqlalchemy import Text, bindparam, func, insert, select, type_coerce
 from sqlalchemy.orm import Session
 
-from database.models import Cluster, ClusterGroup, Dataset, ShapleyValue
-from utils import hash_file
+from core.config import CONFIG
+from database.models import Cluster, ClusterGroup, Dataset, DatasetFingerprint, PipelineStage, ShapleyValue
+from utils.column_summary import ColumnSummaries, summarize_columns
+from utils.data_utils import canonical_pair, dataframe_to_dict_list
+from utils.fingerprint import fingerprint_dataframe
 from utils.logger import get_logger
+from utils.minhash import minhash_signatures_of
 
 logger = get_logger(__name__)
 
+# insert parameters of the clusters of each feature pair, see prepare_cluster_rows
+ClusterRows = Dict[Tuple[str, str], List[Dict[str, Any]]]
+
+# the indices are encoded ahead (see prepare_cluster_rows), so they are bound as text instead of JSON
+_INSERT_CLUSTER = insert(Cluster.__table__).values(
+    cluster_group_id=bindparam("group_id"),
+    cluster_id=bindparam("number"),
+    data_point_indices=bindparam("indices", type_=Text),
+    minhash=bindparam("signature"),
+)
+
+
+def find_dataset_id(db: Session, fingerprint: str) -> Optional[str]:
+    mapping = db.query(DatasetFingerprint).filter(DatasetFingerprint.fingerprint == fingerprint).first()
+    if mapping:
+        return mapping.dataset_id
+    # a dataset whose ID is this fingerprint but which is mapped to another one had rows appended since
+    dataset = (
+        db.query(Dataset.id)
+        .outerjoin(DatasetFingerprint, DatasetFingerprint.dataset_id == Dataset.id)
+        .filter(Dataset.id == fingerprint, DatasetFingerprint.fingerprint.is_(None))
+        .first()
+    )
+    return dataset.id if dataset else None
+
+
+def encode_records(data: pd.DataFrame | List[Dict]) -> str:
+    """The rows of a dataset as stored in Dataset.data, so they can be encoded outside the session."""
+    return json.dumps(dataframe_to_dict_list(data) if isinstance(data, pd.DataFrame) else data)
+
 
-def create_dataset(db: Session, data: List[Dict], filename: Optional[str] = None) -> str:
+def create_dataset(
+    db: Session,
+    data: pd.DataFrame | List[Dict],
+    filename: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+    summary: Optional[ColumnSummaries] = None,
+    data_json: Optional[str] = None,
+) -> str:
     """
     Create a new dataset or return existing dataset ID.
-    Handles JSON serialization issues by properly encoding numpy/pandas types.
+    The ID is the content fingerprint of the sanitized data (see `utils.fingerprint`), computed
+    block by block over its columns unless it is passed in. Records are only serialized if the dataset is new
+    and their JSON (see `encode_records`) is not passed in, the column summary (see `utils.column_summary`)
+    is computed for new datasets unless it is passed in.
+    Datasets stored before fingerprints were introduced keep their IDs, see `backfill_dataset_fingerprints`,
+    and so do datasets with appended rows, see `replace_dataset_data`.
     """
     try:
-        # Convert any pandas/numpy types for proper serialization
-        def json_serialize(obj):
-            if isinstance(obj, (np.integer, np.int64)):
-                return int(obj)
-            elif isinstance(obj, (np.floating, np.float64)):
-                return float(obj)
-            elif isinstance(obj, np.ndarray):
-                return obj.tolist()
-            elif pd and isinstance(obj, pd.DataFrame):
-                return obj.to_dict(orient="records")
-            elif pd and isinstance(obj, pd.Series):
-                return obj.to_dict()
-            elif isinstance(obj, (set, frozenset)):
-                return list(obj)
-            return obj
-
-        # custom serialization
-        data_str = json.dumps(data, default=json_serialize)
-        file_id = hash_file(data_str)
-
-        existing_dataset = db.query(Dataset).filter(Dataset.id == file_id).first()
-        if not existing_dataset:
-            logger.info(f"Creating new dataset with {len(data)} rows")
-            db_dataset = Dataset(id=file_id, filename=filename, data=data)
-            db.add(db_dataset)
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        file_id = fingerprint or fingerprint_dataframe(df)
+
+        existing_id = find_dataset_id(db, file_id)
+        if not existing_id:
+            logger.info(f"Creating new dataset with {len(df)} rows")
+            dataset_id = file_id
+            if db.query(Dataset.id).filter(Dataset.id == file_id).first():
+                dataset_id = f"{file_id}-{uuid.uuid4().hex[:8]}"  # the ID is taken by a dataset with appended rows
+            summary = summary or summarize_columns(df)
+            db.add(Dataset(id=dataset_id, filename=filename, data=_stored_rows(data, data_json), summary=summary))
+            db.add(DatasetFingerprint(fingerprint=file_id, dataset_id=dataset_id))
             db.commit()
-            db.refresh(db_dataset)
+            file_id = dataset_id
         else:
-            logger.info(f"Dataset already exists with ID {file_id}")
+            logger.info(f"Dataset already exists with ID {existing_id}")
+            file_id = existing_id
         return file_id
 
     except Exception as e:
@@ -54,6 +90,51 @@ def create_dataset(db: Session, data: List[Dict], filename: Optional[str] = None
         raise RuntimeError(f"Failed to create dataset: {str(e)}")
 
 
+def _stored_rows(data: pd.DataFrame | List[Dict], data_json: Optional[str]) -> Any:
+    """Value of Dataset.data: the rows, or their JSON encoded ahead (see encode_records) bound as text."""
+    if data_json is not None:
+        return type_coerce(data_json, Text)
+    return dataframe_to_dict_list(data) if isinstance(data, pd.DataFrame) else data
+
+
+def backfill_dataset_fingerprints(db: Session) -> int:
+    """
+    Record the content fingerprint of every dataset that has none yet.
+
+    Datasets created before fingerprints were introduced are identified by the sha256 of their
+    JSON dump. Their IDs stay valid; the backfill maps their fingerprint to the legacy ID, so
+    uploading the same data again returns the existing dataset instead of creating a copy.
+    A legacy dataset whose content is already mapped to another dataset is recorded as its
+    duplicate (`Dataset.duplicate_of`), so it is not fingerprinted again on every startup.
+
+    Returns:
+        int: Number of datasets whose fingerprint was mapped
+    """
+    missing_ids = [
+        row.id
+        for row in db.query(Dataset.id)
+        .outerjoin(DatasetFingerprint, DatasetFingerprint.dataset_id == Dataset.id)
+        .filter(DatasetFingerprint.fingerprint.is_(None), Dataset.duplicate_of.is_(None))
+        .all()
+    ]
+
+    backfilled = 0
+    for dataset_id in missing_ids:
+        fingerprint = fingerprint_dataframe(pd.DataFrame(get_dataset_data(db, dataset_id)))
+        canonical_id = find_dataset_id(db, fingerprint)
+        if canonical_id and canonical_id != dataset_id:
+            db.query(Dataset).filter(Dataset.id == dataset_id).update({Dataset.duplicate_of: canonical_id})
+            db.commit()
+            logger.warning(f"Dataset {dataset_id} duplicates dataset {canonical_id}, recorded as its duplicate")
+            continue
+        db.add(DatasetFingerprint(fingerprint=fingerprint, dataset_id=dataset_id))
+        db.commit()
+        backfilled += 1
+        logger.info(f"Mapped fingerprint {fingerprint} to legacy dataset {dataset_id}")
+
+    return backfilled
+
+
 def get_dataset(db: Session, dataset_id: str) -> Optional[Dataset]:
     return db.query(Dataset).filter(Dataset.id == dataset_id).first()
 
@@ -65,6 +146,24 @@ def get_dataset_data(db: Session, dataset_id: str) -> List[Dict]:
     return []
 
 
+def get_dataset_version(db: Session, dataset_id: str) -> Optional[int]:
+    """
+    Version of the rows of a dataset, increased whenever they are replaced (see replace_dataset_data),
+    so results derived from the rows can be cached per version. None if the dataset does not exist.
+    """
+    dataset = db.query(Dataset.version).filter(Dataset.id == dataset_id).first()
+    return (dataset.version or 0) if dataset else None
+
+
+def get_dataset_summary(db: Session, dataset_id: str) -> Optional[ColumnSummaries]:
+    return db.scalar(select(Dataset.summary).where(Dataset.id == dataset_id))
+
+
+def save_dataset_summary(db: Session, dataset_id: str, summary: ColumnSummaries) -> None:
+    db.query(Dataset).filter(Dataset.id == dataset_id).update({Dataset.summary: summary})
+    db.commit()
+
+
 def get_all_datasets(db: Session) -> List[Dict[str, str]]:
     """
     Get all datasets with their IDs and filenames.
@@ -72,7 +171,7 @@ def get_all_datasets(db: Session) -> List[Dict[str, str]]:
     Returns:
         List[Dict[str, str]]: List of dictionaries with 'id' and 'filename' keys
     """
-    datasets = db.query(Dataset).all()
+    datasets = db.query(Dataset.id, Dataset.filename).all()  # without loading the data
     return [{"id": dataset.id, "filename": dataset.filename} for dataset in datasets]
 
 
@@ -93,68 +192,385 @@ def delete_dataset(db: Session, dataset_id: str) -> bool:
     return True
 
 
+def replace_dataset_data(
+    db: Session,
+    dataset_id: str,
+    df: pd.DataFrame,
+    fingerprint: Optional[str] = None,
+    summary: Optional[ColumnSummaries] = None,
+    data_json: Optional[str] = None,
+) -> bool:
+    """
+    Replace the rows of a dataset, e.g. after rows were appended, keeping its ID and clusters.
+    The rows are serialized unless their JSON (see `encode_records`) is passed in.
+
+    The dataset is mapped to the fingerprint of its new content instead of the old one, so uploading
+    the old rows again creates a new dataset. Stored Shapley values describe the old rows and are deleted,
+    and the version of the dataset (see get_dataset_version) is increased.
+
+    Returns:
+        bool: True if the dataset was found and updated, False otherwise
+    """
+    if not _replace_rows(db, dataset_id, df, fingerprint, summary, data_json):
+        return False
+    db.commit()
+    return True
+
+
+def append_dataset_rows(
+    db: Session,
+    dataset_id: str,
+    version: int,
+    df: pd.DataFrame,
+    fingerprint: Optional[str],
+    summary: Optional[ColumnSummaries],
+    results: Dict[str, Dict[str, Dict[int, List[int]]]],
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]],
+    data_json: Optional[str] = None,
+    cluster_rows: Optional[ClusterRows] = None,
+) -> bool:
+    """
+    Replace the rows of a dataset (see replace_dataset_data) and the clusters of the feature pairs the
+    appended rows were assigned to (see update_clusters) in one transaction, if the dataset is still
+    at the version the rows were appended to.
+
+    Returns:
+        bool: True if the dataset was updated, False if it was deleted or changed since, e.g. its
+        feature pairs were clustered again
+    """
+    if not _replace_rows(db, dataset_id, df, fingerprint, summary, data_json, version) or (
+        results and not _update_clusters(db, dataset_id, results, models, cluster_rows)
+    ):
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def _replace_rows(
+    db: Session,
+    dataset_id: str,
+    df: pd.DataFrame,
+    fingerprint: Optional[str],
+    summary: Optional[ColumnSummaries],
+    data_json: Optional[str],
+    version: Optional[int] = None,
+) -> bool:
+    """Replace the rows of a dataset without committing, only at the given version if there is one."""
+    dataset = db.query(Dataset).filter(Dataset.id == dataset_id)
+    if version is not None:
+        dataset = dataset.filter(func.coalesce(Dataset.version, 0) == version)
+    updated = dataset.update(
+        {
+            Dataset.data: _stored_rows(df, data_json),
+            Dataset.summary: summary or summarize_columns(df),
+            Dataset.version: func.coalesce(Dataset.version, 0) + 1,
+        },
+        synchronize_session=False,
+    )
+    if not updated:
+        return False
+
+    fingerprint = fingerprint or fingerprint_dataframe(df)
+    db.query(DatasetFingerprint).filter(DatasetFingerprint.dataset_id == dataset_id).delete()
+    db.query(ShapleyValue).filter(ShapleyValue.dataset_id == dataset_id).delete()
+    if find_dataset_id(db, fingerprint):
+        logger.warning(f"Dataset {dataset_id} now duplicates another dataset, it is not mapped to its fingerprint")
+    else:
+        db.add(DatasetFingerprint(fingerprint=fingerprint, dataset_id=dataset_id))
+    return True
+
+
+def get_dataset_contents(db: Session, dataset_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get everything stored about a dataset except its rows and clusters, e.g. to export it (see BundleService).
+
+    Returns:
+        Optional[Dict[str, Any]]: The "id", "filename", "summary", "fingerprints", clustering "algorithm"
+        and "shapley_values" by target column, None if the dataset does not exist
+    """
+    dataset = db.query(Dataset.id, Dataset.filename, Dataset.summary).filter(Dataset.id == dataset_id).first()
+    if not dataset:
+        return None
+
+    fingerprints = db.scalars(select(DatasetFingerprint.fingerprint).where(DatasetFingerprint.dataset_id == dataset_id))
+    algorithm = db.scalar(select(ClusterGroup.algorithm).where(ClusterGroup.dataset_id == dataset_id).limit(1))
+    shapley_values: Dict[str, List[Dict[str, Any]]] = {}
+    for value in db.query(ShapleyValue).filter(ShapleyValue.dataset_id == dataset_id).order_by(ShapleyValue.id):
+        shapley_values.setdefault(value.target_column, []).append({"feature": value.feature, "SHAP Value": value.value})
+
+    return {
+        "id": dataset.id,
+        "filename": dataset.filename,
+        "summary": dataset.summary,
+        "fingerprints": list(fingerprints),
+        "algorithm": algorithm,
+        "shapley_values": shapley_values,
+    }
+
+
+def import_dataset(
+    db: Session,
+    dataset_id: str,
+    filename: Optional[str],
+    fingerprints: List[str],
+    summary: Optional[ColumnSummaries],
+    records: List[Dict],
+    algorithm: Optional[str],
+    clusters: Dict[str, Dict[str, Dict[int, List[int]]]],
+    signatures: Optional[np.ndarray],
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]],
+    shapley_values: Dict[str, List[Dict[str, Any]]],
+    data_json: Optional[str] = None,
+    cluster_rows: Optional[ClusterRows] = None,
+) -> Tuple[str, bool]:
+    """
+    Store a dataset exported from another instance under its original ID, with its clusters, models and
+    Shapley values (see BundleService). Nothing is imported if the dataset, or one with the same content, exists.
+    The JSON of the records and the cluster rows are prepared here unless they are passed in.
+
+    Returns:
+        Tuple[str, bool]: ID of the dataset, and whether it was imported
+    """
+    if db.query(Dataset.id).filter(Dataset.id == dataset_id).first():
+        return dataset_id, False
+    for fingerprint in fingerprints:
+        existing_id = find_dataset_id(db, fingerprint)
+        if existing_id:
+            logger.info(f"Imported dataset {dataset_id} duplicates dataset {existing_id}")
+            return existing_id, False
+
+    db.add(Dataset(id=dataset_id, filename=filename, data=_stored_rows(records, data_json), summary=summary))
+    for fingerprint in fingerprints:
+        db.add(DatasetFingerprint(fingerprint=fingerprint, dataset_id=dataset_id))
+    db.flush()
+    if clusters:
+        save_clusters(db, dataset_id, clusters, algorithm, signatures, models, cluster_rows)
+    if shapley_values:
+        save_shapley_values_bulk(db, dataset_id, shapley_values)
+    db.commit()
+    return dataset_id, True
+
+
 def reset_datasets(db: Session) -> None:
     """Reset the datasets table."""
+    db.query(PipelineStage).delete()
     db.query(Dataset).delete()
     db.commit()
 
 
-def save_clusters(
-    db: Session, dataset_id: str, results: Dict[str, Dict[str, Dict[int, List[int]]]], algorithm: str
-) -> None:
+def compute_cluster_signatures(results: Dict[str, Dict[str, Dict[int, List[int]]]]) -> Optional[np.ndarray]:
     """
-    Save clusters to the database.
+    MinHash signatures of all clusters in iteration order, None if signatures are disabled.
     """
-    # Delete existing clusters for this dataset
-    cluster_groups = db.query(ClusterGroup).filter(ClusterGroup.dataset_id == dataset_id).all()
-    for group in cluster_groups:
-        db.delete(group)
-    db.commit()
+    if not CONFIG.MINHASH_PERMUTATIONS:
+        return None
+    all_indices = [
+        indices
+        for feature_pairs in results.values()
+        for clusters in feature_pairs.values()
+        for indices in clusters.values()
+    ]
+    return minhash_signatures_of(all_indices, CONFIG.MINHASH_PERMUTATIONS, CONFIG.MINHASH_SEED)
+
+
+def prepare_cluster_rows(
+    results: Dict[str, Dict[str, Dict[int, List[int]]]], signatures: Optional[np.ndarray] = None
+) -> ClusterRows:
+    """
+    Insert parameters of the clusters of each feature pair (in canonical order), with their indices
+    encoded as JSON and their MinHash signatures (computed if not given), so they can be prepared
+    outside the session.
+    """
+    if signatures is None:
+        signatures = compute_cluster_signatures(results)
+    signature_rows = iter(signatures if signatures is not None else [])
 
-    # Create new cluster groups and clusters
+    cluster_rows: ClusterRows = {}
     for feat1, feature_pairs in results.items():
         for feat2, clusters in feature_pairs.items():
-            cluster_group = ClusterGroup(dataset_id=dataset_id, feature1=feat1, feature2=feat2, algorithm=algorithm)
-            db.add(cluster_group)
-            db.flush()  # Generate ID without committing
-
+            rows = cluster_rows.setdefault(canonical_pair(feat1, feat2), [])
             for cluster_id, indices in clusters.items():
-                cluster = Cluster(cluster_group_id=cluster_group.id, cluster_id=cluster_id, data_point_indices=indices)
-                db.add(cluster)
+                signature = next(signature_rows, None)
+                rows.append(
+                    {
+                        "number": int(cluster_id),
+                        "indices": json.dumps(indices),
+                        "signature": signature.tobytes() if signature is not None else None,
+                    }
+                )
+    return cluster_rows
+
 
+def save_clusters(
+    db: Session,
+    dataset_id: str,
+    results: Dict[str, Dict[str, Dict[int, List[int]]]],
+    algorithm: str,
+    signatures: Optional[np.ndarray] = None,
+    models: Optional[Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]]] = None,
+    cluster_rows: Optional[ClusterRows] = None,
+    replace: bool = True,
+) -> bool:
+    """
+    Replace the clusters of a dataset, with their MinHash signatures (computed if not given) and the
+    fitted model of each feature pair (keyed by canonical pair, see ClusterModel.to_record).
+    The cluster rows are prepared from the results unless they are passed in (see prepare_cluster_rows).
+
+    With replace=False the clusters are only saved if the dataset exists and has none yet, checked in
+    the same transaction as the save.
+
+    Returns:
+        bool: Whether the clusters were saved
+    """
+    if cluster_rows is None:
+        cluster_rows = prepare_cluster_rows(results, signatures)
+
+    if not replace:
+        # write first, so the transaction holds the write lock when it looks for clusters saved meanwhile
+        claimed = (
+            db.query(Dataset)
+            .filter(Dataset.id == dataset_id)
+            .update({Dataset.filename: Dataset.filename}, synchronize_session=False)
+        )
+        if not claimed or db.query(ClusterGroup.id).filter(ClusterGroup.dataset_id == dataset_id).first():
+            db.rollback()
+            return False
+
+    # Delete existing clusters for this dataset, without loading them
+    group_ids = select(ClusterGroup.id).where(ClusterGroup.dataset_id == dataset_id)
+    db.query(Cluster).filter(Cluster.cluster_group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.query(ClusterGroup).filter(ClusterGroup.dataset_id == dataset_id).delete(synchronize_session=False)
+
+    # Create new cluster groups and clusters
+    for (feature1, feature2), rows in cluster_rows.items():
+        model_state, model_arrays = (models or {}).get((feature1, feature2), (None, None))
+        cluster_group = ClusterGroup(
+            dataset_id=dataset_id,
+            feature1=feature1,
+            feature2=feature2,
+            algorithm=algorithm,
+            model_state=model_state,
+            model_arrays=model_arrays,
+        )
+        db.add(cluster_group)
+        db.flush()  # Generate ID without committing
+        _insert_clusters(db, cluster_group.id, rows)
+
+    db.commit()
+    return True
+
+
+def _insert_clusters(db: Session, cluster_group_id: int, rows: List[Dict[str, Any]]) -> None:
+    if rows:
+        db.execute(_INSERT_CLUSTER, [{**row, "group_id": cluster_group_id} for row in rows])
+
+
+def update_clusters(
+    db: Session,
+    dataset_id: str,
+    results: Dict[str, Dict[str, Dict[int, List[int]]]],
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]],
+    signatures: Optional[np.ndarray] = None,
+    cluster_rows: Optional[ClusterRows] = None,
+) -> None:
+    """
+    Replace the clusters and model of existing feature pairs (in canonical order), leaving the
+    other pairs of the dataset as they are. MinHash signatures are computed if not given, and the
+    cluster rows prepared unless they are passed in (see prepare_cluster_rows).
+    """
+    if cluster_rows is None:
+        cluster_rows = prepare_cluster_rows(results, signatures)
+    if not _update_clusters(db, dataset_id, results, models, cluster_rows):
+        raise KeyError(f"Not every feature pair of {sorted(cluster_rows)} has clusters in dataset {dataset_id}")
     db.commit()
 
 
+def _update_clusters(
+    db: Session,
+    dataset_id: str,
+    results: Dict[str, Dict[str, Dict[int, List[int]]]],
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]],
+    cluster_rows: Optional[ClusterRows],
+) -> bool:
+    """Replace the clusters of existing feature pairs without committing, False if a pair has no clusters."""
+    if cluster_rows is None:
+        cluster_rows = prepare_cluster_rows(results)
+    groups = {
+        (group.feature1, group.feature2): group
+        for group in db.query(ClusterGroup).filter(ClusterGroup.dataset_id == dataset_id)
+    }
+    if any(pair not in groups for pair in cluster_rows):
+        return False
+
+    for pair, rows in cluster_rows.items():
+        cluster_group = groups[pair]
+        db.query(Cluster).filter(Cluster.cluster_group_id == cluster_group.id).delete()
+        cluster_group.model_state, cluster_group.model_arrays = models.get(pair, (None, None))
+        _insert_clusters(db, cluster_group.id, rows)
+    return True
+
+
 def get_all_clusters(db: Session, dataset_id: str) -> Dict[str, Dict[str, Dict[int, List[int]]]]:
     """
     Get all clusters for a dataset.
     """
     result = {}
 
-    cluster_groups = db.query(ClusterGroup).filter(ClusterGroup.dataset_id == dataset_id).all()
+    rows = (
+        db.query(ClusterGroup.feature1, ClusterGroup.feature2, Cluster.cluster_id, Cluster.data_point_indices)
+        .outerjoin(Cluster, Cluster.cluster_group_id == ClusterGroup.id)
+        .filter(ClusterGroup.dataset_id == dataset_id)
+    )
 
-    for group in cluster_groups:
-        if group.feature1 not in result:
-            result[group.feature1] = {}
+    for feature1, feature2, cluster_id, indices in rows:
+        feature_clusters = result.setdefault(feature1, {}).setdefault(feature2, {})
+        if cluster_id is not None:
+            feature_clusters[cluster_id] = indices
 
-        feature_clusters = {}
+    return result
 
-        clusters = db.query(Cluster).filter(Cluster.cluster_group_id == group.id).all()
 
-        for cluster in clusters:
-            feature_clusters[cluster.cluster_id] = cluster.data_point_indices
+def get_cluster_models(
+    db: Session, dataset_id: str
+) -> Dict[Tuple[str, str], Tuple[Optional[Dict[str, Any]], Optional[bytes]]]:
+    """
+    Get the stored model (state and packed arrays) of every clustered feature pair, see ClusterModel.from_record.
+    The state is None for pairs clustered before models were stored.
+    """
+    groups = db.query(
+        ClusterGroup.feature1, ClusterGroup.feature2, ClusterGroup.model_state, ClusterGroup.model_arrays
+    ).filter(ClusterGroup.dataset_id == dataset_id)
+    return {(group.feature1, group.feature2): (group.model_state, group.model_arrays) for group in groups}
 
-        result[group.feature1][group.feature2] = feature_clusters
 
-    return result
+def get_cluster_signatures(db: Session, dataset_id: str) -> Dict[Tuple[str, str, int], Optional[bytes]]:
+    """
+    Get the stored MinHash signatures of all clusters of a dataset, keyed by (feature1, feature2, cluster id).
+    """
+    rows = (
+        db.query(ClusterGroup.feature1, ClusterGroup.feature2, Cluster.cluster_id, Cluster.minhash)
+        .join(Cluster, Cluster.cluster_group_id == ClusterGroup.id)
+        .filter(ClusterGroup.dataset_id == dataset_id)
+    )
+    return {(feature1, feature2, cluster_id): minhash for feature1, feature2, cluster_id, minhash in rows}
+
+
+def get_clustered_feature_pairs(db: Session, dataset_id: str) -> List[Tuple[str, str]]:
+    """
+    Get the (feature1, feature2) pairs that have clusters, without loading the clusters.
+    """
+    groups = db.query(ClusterGroup.feature1, ClusterGroup.feature2).filter(ClusterGroup.dataset_id == dataset_id)
+    return [(group.feature1, group.feature2) for group in groups]
 
 
 def get_clusters_by_features(
     db: Session, dataset_id: str, feature1: str, feature2: str
 ) -> Optional[Dict[int, List[int]]]:
     """
-    Get clusters for a specific feature pair.
+    Get clusters for a specific feature pair, in either order.
     """
+    feature1, feature2 = canonical_pair(feature1, feature2)
     cluster_group = (
         db.query(ClusterGroup)
         .filter(
@@ -163,18 +579,6 @@ def get_clusters_by_features(
         .first()
     )
 
-    if not cluster_group:
-        # Try reverse order
-        cluster_group = (
-            db.query(ClusterGroup)
-            .filter(
-                ClusterGroup.dataset_id == dataset_id,
-                ClusterGroup.feature1 == feature2,
-                ClusterGroup.feature2 == feature1,
-            )
-            .first()
-        )
-
     if not cluster_group:
         return None
 
@@ -191,17 +595,31 @@ def save_shapley_values(db: Session, dataset_id: str, target_column: str, shaple
     """
     Save SHAPley values to the database.
     """
-    # Delete existing Shapley values for this dataset and target column
-    db.query(ShapleyValue).filter(
-        ShapleyValue.dataset_id == dataset_id, ShapleyValue.target_column == target_column
-    ).delete()
+    save_shapley_values_bulk(db, dataset_id, {target_column: shapley_values})
 
-    # Create new Shapley values
-    for item in shapley_values:
-        value = ShapleyValue(
-            dataset_id=dataset_id, target_column=target_column, feature=item["feature"], value=item["SHAP Value"]
-        )
-        db.add(value)
+
+def save_shapley_values_bulk(db: Session, dataset_id: str, shapley_values: Dict[str, List[Dict[str, Any]]]) -> None:
+    """
+    Save SHAPley values of several target columns with one delete, one bulk insert and one commit.
+    """
+    # Delete existing Shapley values for this dataset and these target columns
+    db.query(ShapleyValue).filter(
+        ShapleyValue.dataset_id == dataset_id, ShapleyValue.target_column.in_(list(shapley_values))
+    ).delete(synchronize_session=False)
+
+    db.bulk_insert_mappings(
+        ShapleyValue,
+        [
+            {
+                "dataset_id": dataset_id,
+                "target_column": target_column,
+                "feature": item["feature"],
+                "value": item["SHAP Value"],
+            }
+            for target_column, items in shapley_values.items()
+            for item in items
+        ],
+    )
 
     db.commit()
 
@@ -217,3 +635,48 @@ def get_shapley_values(db: Session, dataset_id: str, target_column: str) -> List
     )
 
     return [{"feature": val.feature, "SHAP Value": val.value} for val in values]
+
+
+def start_pipeline(db: Session, dataset_id: str, stages: List[str]) -> None:
+    """Mark the stages of the precompute pipeline of a dataset as pending, replacing the states of an earlier run."""
+    db.query(PipelineStage).filter(PipelineStage.dataset_id == dataset_id).delete(synchronize_session=False)
+    db.add_all([PipelineStage(dataset_id=dataset_id, stage=stage, status="pending") for stage in stages])
+    db.commit()
+
+
+def update_pipeline_stage(
+    db: Session,
+    dataset_id: str,
+    stage: str,
+    status: str,
+    detail: Optional[str] = None,
+    seconds: Optional[float] = None,
+) -> bool:
+    """
+    Update the state of a pipeline stage.
+
+    Returns:
+        bool: False if the stage no longer exists, i.e. the dataset was deleted
+    """
+    updated = (
+        db.query(PipelineStage)
+        .filter(PipelineStage.dataset_id == dataset_id, PipelineStage.stage == stage)
+        .update({PipelineStage.status: status, PipelineStage.detail: detail, PipelineStage.seconds: seconds})
+    )
+    db.commit()
+    return updated > 0
+
+
+def get_pipeline_stages(db: Session, dataset_id: str) -> List[Dict[str, Any]]:
+    """States of the precompute pipeline stages of a dataset."""
+    stages = db.query(PipelineStage).filter(PipelineStage.dataset_id == dataset_id).all()
+    return [
+        {
+            "stage": stage.stage,
+            "status": stage.status,
+            "detail": stage.detail,
+            "seconds": stage.seconds,
+            "updated_at": stage.updated_at.isoformat() if stage.updated_at else None,
+        }
+        for stage in stages
+    ]
@@ -0,0 +1,46 @@
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+from core.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# how a connection setting is applied, per dialect
+SETTING_STATEMENTS = {"sqlite": "PRAGMA {name}={value}", "postgresql": "SET {name} TO {value}"}
+CONNECT_ARGS = {"sqlite": {"check_same_thread": False}}
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """
+    Keyword arguments for create_engine/create_async_engine from the storage profile of the URL's dialect.
+    In-memory SQLite databases use a single shared connection, pool sizes do not apply to them.
+    """
+    parsed = make_url(url)
+    dialect = parsed.get_backend_name()
+    options: Dict[str, Any] = {"connect_args": dict(CONNECT_ARGS.get(dialect, {}))}
+    if not (dialect == "sqlite" and parsed.database in (None, "", ":memory:")):
+        options.update(CONFIG.DATABASE_POOL_OPTIONS.get(dialect, {}))
+    return options
+
+
+def configure_connections(engine: Engine) -> None:
+    """Apply the connection settings of the engine's dialect to every new connection."""
+    dialect = engine.dialect.name
+    settings = CONFIG.DATABASE_CONNECTION_SETTINGS.get(dialect, {})
+    if not settings:
+        return
+    statements = [SETTING_STATEMENTS[dialect].format(name=name, value=value) for name, value in settings.items()]
+
+    @event.listens_for(engine, "connect")
+    def apply_settings(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    logger.info(f"Applying {dialect} connection settings: {settings}")
@@ -0,0 +1,185 @@
+"""
+Versioned schema migrations.
+
+Each migration upgrades the schema by one version inside a transaction and is recorded in the
+schema_versions table. Databases created before versioning have no such table and start at
+version 0; migrations are written so they also apply to tables that already exist.
+
+Usage (from the backend directory):
+    python -m database.migrations upgrade [--to VERSION]
+    python -m database.migrations current
+    python -m database.migrations history
+"""
+
+import argparse
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import Table, bindparam, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from database.models import (
+    Base,
+    Cluster,
+    ClusterGroup,
+    Dataset,
+    DatasetFingerprint,
+    PipelineStage,
+    SchemaVersion,
+    ShapleyValue,
+)
+from database.models import engine as app_engine
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _create_tables(connection: Connection) -> None:
+    Base.metadata.create_all(connection)
+
+
+def _add_indexes(connection: Connection) -> None:
+    for table in (ClusterGroup.__table__, Cluster.__table__, ShapleyValue.__table__, DatasetFingerprint.__table__):
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _canonicalize_pairs(connection: Connection) -> None:
+    groups = connection.execute(select(ClusterGroup.id, ClusterGroup.feature1, ClusterGroup.feature2)).all()
+    swapped = [
+        {"group_id": group_id, "first": feature2, "second": feature1}
+        for group_id, feature1, feature2 in groups
+        if feature1 > feature2
+    ]
+    if swapped:
+        table = ClusterGroup.__table__
+        connection.execute(
+            update(table)
+            .where(table.c.id == bindparam("group_id"))
+            .values(feature1=bindparam("first"), feature2=bindparam("second")),
+            swapped,
+        )
+    logger.info(f"Stored {len(swapped)} of {len(groups)} feature pairs in canonical order")
+
+
+def _schema_v2(connection: Connection) -> None:
+    _add_indexes(connection)
+    _canonicalize_pairs(connection)
+
+
+def _add_column(connection: Connection, table: Table, name: str) -> None:
+    """Add a column of a model to an existing table, tables created from the models already have it."""
+    if name in {column["name"] for column in inspect(connection).get_columns(table.name)}:
+        return
+    column_type = table.c[name].type.compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{name}" {column_type}'))
+
+
+def _schema_v3(connection: Connection) -> None:
+    # signatures of existing clusters are computed when they are first used
+    _add_column(connection, Cluster.__table__, "minhash")
+
+
+def _schema_v4(connection: Connection) -> None:
+    # pairs clustered before have no model, appended rows are not assigned to them until they are recomputed
+    _add_column(connection, ClusterGroup.__table__, "model_state")
+
+
+def _schema_v5(connection: Connection) -> None:
+    # states stored with their arrays in the JSON are still read, see ClusterModel.from_record
+    _add_column(connection, ClusterGroup.__table__, "model_arrays")
+
+
+def _schema_v6(connection: Connection) -> None:
+    # summaries of existing datasets are computed when they are first requested
+    _add_column(connection, Dataset.__table__, "summary")
+
+
+def _schema_v7(connection: Connection) -> None:
+    # existing datasets have no pipeline states, their pipeline runs when it is requested
+    PipelineStage.__table__.create(connection, checkfirst=True)
+
+
+def _schema_v8(connection: Connection) -> None:
+    # legacy duplicates skipped by earlier backfills are recorded on the next startup
+    _add_column(connection, Dataset.__table__, "duplicate_of")
+
+
+def _schema_v9(connection: Connection) -> None:
+    # results cached before versions were stored are keyed without one and are not served again
+    _add_column(connection, Dataset.__table__, "version")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Create tables", _create_tables),
+    Migration(2, "Composite indexes, canonical feature pair order", _schema_v2),
+    Migration(3, "MinHash signatures of clusters", _schema_v3),
+    Migration(4, "Fitted cluster models", _schema_v4),
+    Migration(5, "Packed cluster model arrays", _schema_v5),
+    Migration(6, "Dataset column summaries", _schema_v6),
+    Migration(7, "Precompute pipeline stages", _schema_v7),
+    Migration(8, "Legacy duplicate datasets", _schema_v8),
+    Migration(9, "Dataset versions", _schema_v9),
+]
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(connection: Connection) -> int:
+    if not inspect(connection).has_table(SchemaVersion.__tablename__):
+        return 0
+    return connection.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """
+    Apply all migrations up to `target` (default: the latest version).
+
+    Returns:
+        List[int]: Versions that were applied
+    """
+    applied = []
+    for migration in MIGRATIONS:
+        if target is not None and migration.version > target:
+            break
+        with engine.begin() as connection:
+            if current_version(connection) >= migration.version:
+                continue
+            logger.info(f"Migrating schema to version {migration.version}: {migration.description}")
+            migration.apply(connection)
+            SchemaVersion.__table__.create(connection, checkfirst=True)
+            connection.execute(
+                insert(SchemaVersion.__table__).values(version=migration.version, description=migration.description)
+            )
+        applied.append(migration.version)
+    return applied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subparsers.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="target version (default: latest)")
+    subparsers.add_parser("current", help="print the current schema version")
+    subparsers.add_parser("history", help="list migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade(app_engine, args.to)
+        print(f"Applied versions: {applied}" if applied else "Schema is up to date")
+    with app_engine.connect() as connection:
+        version = current_version(connection)
+    if args.command == "current":
+        print(f"Schema version {version} (latest {SCHEMA_VERSION})")
+    elif args.command == "history":
+        for migration in MIGRATIONS:
+            status = "applied" if migration.version <= version else "pending"
+            print(f"{migration.version:>4}  {status:<8} {migration.description}")
+
+
+if __name__ == "__main__":
+    main()
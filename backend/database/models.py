@@ -1,11 +1,42 @@
-from sqlalchemy import JSON, Column, Float, ForeignKey, Integer, String, create_engine
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    create_engine,
+    func,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
 from core.config import CONFIG
+from database.engine import configure_connections, engine_options
 
-engine = create_engine(CONFIG.SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# async drivers for the sync database URLs, e.g. sqlite:///./app.db -> sqlite+aiosqlite:///./app.db
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite"}
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+engine = create_engine(CONFIG.SQLALCHEMY_DATABASE_URL, **engine_options(CONFIG.SQLALCHEMY_DATABASE_URL))
+configure_connections(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ASYNC_DATABASE_URL = CONFIG.SQLALCHEMY_ASYNC_DATABASE_URL or to_async_url(CONFIG.SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+configure_connections(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -17,7 +48,9 @@ def get_db():
         db.close()
 
 
-Base.metadata.create_all(bind=engine)  # Create tables
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
 
 class Dataset(Base):
@@ -26,19 +59,47 @@ class Dataset(Base):
     id = Column(String, primary_key=True, index=True)
     filename = Column(String)
     data = Column(JSON)  # Store the CSV data as JSON
+    summary = Column(JSON, nullable=True)  # column statistics and histograms, see utils.column_summary
+    # legacy dataset with the same content as this fingerprinted one, see backfill_dataset_fingerprints
+    duplicate_of = Column(String, nullable=True)
+    # number of times the rows were replaced (None: never), see db_service.get_dataset_version
+    version = Column(Integer, nullable=True)
 
     clusters = relationship("ClusterGroup", back_populates="dataset", cascade="all, delete-orphan")
     shapley_values = relationship("ShapleyValue", back_populates="dataset", cascade="all, delete-orphan")
+    fingerprints = relationship("DatasetFingerprint", back_populates="dataset", cascade="all, delete-orphan")
+    pipeline_stages = relationship("PipelineStage", back_populates="dataset", cascade="all, delete-orphan")
+
+
+class DatasetFingerprint(Base):
+    """
+    Maps content fingerprints to dataset IDs.
+    New datasets use their fingerprint as ID; datasets created before fingerprints were
+    introduced keep their legacy ID (sha256 of the JSON dump) and are reachable through this table.
+    """
+
+    __tablename__ = "dataset_fingerprints"
+
+    fingerprint = Column(String, primary_key=True, index=True)
+    dataset_id = Column(String, ForeignKey("datasets.id"), index=True)
+
+    dataset = relationship("Dataset", back_populates="fingerprints")
 
 
 class ClusterGroup(Base):
+    """Clusters of one feature pair, stored in canonical order: feature1 <= feature2 (see `canonical_pair`)."""
+
     __tablename__ = "cluster_groups"
+    __table_args__ = (Index("ix_cluster_groups_dataset_pair", "dataset_id", "feature1", "feature2"),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     dataset_id = Column(String, ForeignKey("datasets.id"))
     feature1 = Column(String)
     feature2 = Column(String)
     algorithm = Column(String)  # "kmeans" or "dbscan"
+    # fitted model used to assign new rows: JSON state and packed arrays, see ClusterModel.to_record
+    model_state = Column(JSON, nullable=True)
+    model_arrays = Column(LargeBinary, nullable=True)
 
     dataset = relationship("Dataset", back_populates="clusters")
     clusters = relationship("Cluster", back_populates="cluster_group", cascade="all, delete-orphan")
@@ -48,15 +109,17 @@ class Cluster(Base):
     __tablename__ = "clusters"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    cluster_group_id = Column(Integer, ForeignKey("cluster_groups.id"))
+    cluster_group_id = Column(Integer, ForeignKey("cluster_groups.id"), index=True)
     cluster_id = Column(Integer)  # This is the actual cluster ID from KMeans/DBSCAN
     data_point_indices = Column(JSON)  # Store the list of indices as JSON
+    minhash = Column(LargeBinary, nullable=True)  # MinHash signature of the indices (uint32 values), see utils.minhash
 
     cluster_group = relationship("ClusterGroup", back_populates="clusters")
 
 
 class ShapleyValue(Base):
     __tablename__ = "shapley_values"
+    __table_args__ = (Index("ix_shapley_values_dataset_target", "dataset_id", "target_column"),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     dataset_id = Column(String, ForeignKey("datasets.id"))
@@ -65,3 +128,28 @@ class ShapleyValue(Base):
     value = Column(Float)
 
     dataset = relationship("Dataset", back_populates="shapley_values")
+
+
+class PipelineStage(Base):
+    """State of a stage of the precompute pipeline of a dataset, see routers.precompute."""
+
+    __tablename__ = "pipeline_stages"
+
+    dataset_id = Column(String, ForeignKey("datasets.id"), primary_key=True)
+    stage = Column(String, primary_key=True)
+    status = Column(String)  # "pending", "running", "done", "skipped" or "failed"
+    detail = Column(String, nullable=True)  # why the stage was skipped or failed
+    seconds = Column(Float, nullable=True)  # time the stage took
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    dataset = relationship("Dataset", back_populates="pipeline_stages")
+
+
+class SchemaVersion(Base):
+    """Applied schema migrations, see database.migrations."""
+
+    __tablename__ = "schema_versions"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, server_default=func.now())
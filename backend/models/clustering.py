@@ -1,4 +1,4 @@
-from typing import Dict, List, Literal, Optional
+from typing import Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -20,6 +20,7 @@ class ClusteringRequest(BaseModel):
     params: KMeansParams | DBScanParams
     dataset_id: Optional[str] = None  # Optional dataset ID for persistence
     filename: Optional[str] = None  # Optional filename for saving dataset if not found
+    priority_features: Optional[List[str]] = None  # e.g. the selected features, their pairs are clustered first
 
 
 class ClusterGroup(BaseModel):
@@ -38,6 +39,8 @@ class ClusterSimilarity(BaseModel):
     feature2: str
     cluster_id: int
     similarity: float
+    estimate: Optional[float] = None  # MinHash estimate of the similarity (approximate requests only)
+    error_bound: Optional[float] = None  # the estimate is within this error at CONFIG.MINHASH_CONFIDENCE
 
 
 class SimilarityRequest(BaseModel):
@@ -45,6 +48,10 @@ class SimilarityRequest(BaseModel):
     selected_feature2: str
     selected_cluster_id: int
     dataset_id: str  # Required to lookup clusters
+    top_k: Optional[int] = Field(default=None, gt=0)  # return only the most similar clusters
+    # find the top matches with MinHash/LSH sketches, exact similarities are computed for the final top_k only
+    approximate: bool = False
+    max_error: Optional[float] = Field(default=None, gt=0, lt=1)  # error bound of the estimates, lower is slower
 
 
 class FeaturePairMatrixRequest(BaseModel):
@@ -55,3 +62,84 @@ class FeaturePairMatrixRequest(BaseModel):
     features: List[str]  # List of all features to include in the matrix
     aggregation: Literal["max", "avg", "min", "median"] = "max"  # Aggregation strategy
     reorder_method: Literal["none", "optimal", "average"] = "none"  # Matrix reordering method
+
+
+class PartitionSimilarityRequest(BaseModel):
+    dataset_id: str
+    pairs: Optional[List[Tuple[str, str]]] = None  # feature pairs to compare (default: all clustered pairs)
+
+
+class PartitionSimilarityResult(BaseModel):
+    pairs: List[Tuple[str, str]]
+    similarities: Dict[Literal["ari", "nmi", "max_jaccard"], List[List[float]]]  # pairs x pairs matrix per metric
+
+
+class PredictRequest(BaseModel):
+    dataset_id: str
+    rows: List[Dict[str, Optional[float | str]]]  # new rows, with values of the clustered features
+    pairs: Optional[List[Tuple[str, str]]] = None  # feature pairs to label the rows for (default: all with a model)
+
+
+class PredictResult(BaseModel):
+    pairs: List[Tuple[str, str]]
+    labels: List[List[Optional[int]]]  # pairs x rows cluster ids, None where the row lacks a value of the pair
+    outliers: List[List[bool]]  # pairs x rows, farther from the cluster than its fitted points (k-means) or noise
+
+
+class PairViewRequest(BaseModel):
+    dataset_id: str
+    feature1: str
+    feature2: str
+    mode: Literal["sample", "density"] = "sample"
+    resolution: Optional[int] = Field(default=None, gt=0)  # grid cells per axis (default: CONFIG.PAIR_VIEW_RESOLUTION)
+    max_points: Optional[int] = Field(default=None, gt=0)  # sample size (default: CONFIG.PAIR_VIEW_POINTS)
+
+
+class PairViewSeries(BaseModel):
+    cluster_id: Optional[int]  # None: points in no cluster of the pair
+    count: int  # points with this label
+    # mode "sample": the sampled points, each standing for `weights` points of its grid cell
+    indices: Optional[List[int]] = None
+    x: Optional[List[float]] = None
+    y: Optional[List[float]] = None
+    weights: Optional[List[float]] = None
+    # mode "density": points per occupied grid cell, cells are row-major (y * resolution + x)
+    cells: Optional[List[int]] = None
+    counts: Optional[List[int]] = None
+
+
+class PairViewResult(BaseModel):
+    feature1: str
+    feature2: str
+    mode: Literal["sample", "density"]
+    rows: int
+    resolution: int
+    extent: Tuple[float, float, float, float]  # x min, x max, y min, y max of the grid
+    series: List[PairViewSeries]  # one per cluster label
+
+
+class HeatmapTileRequest(BaseModel):
+    dataset_id: str
+    level: int = Field(default=0, ge=0)  # zoom level, 0: the whole dataset in one tile
+    tile_row: int = Field(default=0, ge=0)
+    tile_column: int = Field(default=0, ge=0)
+    statistic: Literal["mean", "median"] = "mean"  # aggregation of the rows of a block
+    order_by: Optional[Tuple[str, str]] = None  # feature pair whose clusters group the rows (default: dataset order)
+
+
+class HeatmapSegment(BaseModel):
+    cluster_id: Optional[int]  # None: rows in no cluster of the pair
+    start: int  # first row of the cluster in the reordered dataset
+    end: int
+
+
+class HeatmapTile(BaseModel):
+    rows: int
+    levels: List[int]  # rows per block of every zoom level, from the coarsest
+    level: int
+    tile_row: int
+    tile_column: int
+    first_block: int  # position of the tile's first block in its level
+    columns: List[str]
+    values: List[List[float]]  # blocks x columns, normalized per column to [0, 1]
+    clusters: Optional[List[HeatmapSegment]] = None  # with order_by, the clusters in row order
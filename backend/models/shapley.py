@@ -1,6 +1,6 @@
 from typing import Dict, List, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ShapValuesRequest(BaseModel):
@@ -10,4 +10,41 @@ class ShapValuesRequest(BaseModel):
         None  # Data to use if dataset_id doesn't exist
     )
     filename: Optional[str] = None  # Filename to use when saving data
+    latency_budget: Optional[float] = Field(default=None, gt=0)  # Seconds, enables sampled/approximate SHAP
     # feature_columns: List[str]
+
+
+class ShapBatchRequest(BaseModel):
+    target_columns: Optional[List[str]] = None  # None: every numeric column
+    dataset_id: Optional[str] = None  # Optional to allow data-only requests
+    data: Optional[List[Dict[str, Optional[Union[str, float, int, None]]]]] = (
+        None  # Data to use if dataset_id doesn't exist
+    )
+    filename: Optional[str] = None  # Filename to use when saving data
+
+
+class ShapInteractionRequest(BaseModel):
+    dataset_id: str
+    target_column: str
+    sample_rows: Optional[int] = Field(default=None, gt=0)  # Maximum rows explained, defaults to the configured size
+    latency_budget: Optional[float] = Field(default=None, gt=0)  # Seconds, defaults to the configured budget
+    clustered_only: bool = False  # Only return pairs that have been clustered
+
+
+class FeaturePairInteraction(BaseModel):
+    feature1: str
+    feature2: str
+    interaction: float
+    clustered: bool  # Whether clusters exist for this pair, see /clustering/get_by_features
+
+
+class ClusterMembershipBatchRequest(BaseModel):
+    dataset_id: str
+    feature1: str
+    feature2: str
+    exclude_pair_features: bool = False  # Explain membership with the other features only
+
+
+class ClusterMembershipRequest(ClusterMembershipBatchRequest):
+    cluster_id: int
+    shared_trees: bool = False  # Explain from one multiclass model shared by all clusters of the pair
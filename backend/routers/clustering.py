@@ -1,41 +1,260 @@
 # clustering ops namespace
 
-from typing import Dict, List, Optional
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from database.db_service import (
+from core.config import CONFIG
+from core.resources import governor
+from core.single_flight import in_flight
+from database.async_db_service import (
     create_dataset,
     get_all_clusters,
+    get_cluster_models,
+    get_cluster_signatures,
     get_clusters_by_features,
     get_dataset_data,
+    get_dataset_version,
     save_clusters,
 )
-from database.models import get_db
+from database.models import AsyncSessionLocal, get_async_db
 from models.clustering import (
     ClusteringRequest,
     ClusteringResult,
     ClusterSimilarity,
+    DBScanParams,
     FeaturePairMatrixRequest,
+    HeatmapSegment,
+    HeatmapTile,
+    HeatmapTileRequest,
+    KMeansParams,
+    PairViewRequest,
+    PairViewResult,
+    PartitionSimilarityRequest,
+    PartitionSimilarityResult,
+    PredictRequest,
+    PredictResult,
     SimilarityRequest,
 )
+from services.cluster_index import ClusterIndex
+from services.cluster_model import ClusterModel, ClusterModelSet
 from services.clustering_service import ClusteringService
+from services.shared_store import SharedEntry, shared_store
 from utils import get_logger
-from utils.data_utils import dataframe_to_dict_list, get_numeric_columns, sanitize_and_parse_dataset
+from utils.cache import hash_parameters, make_cache_key
+from utils.data_utils import canonical_pair, get_numeric_columns, sanitize_and_parse_dataset
+from utils.heatmap import build_pyramid, cluster_order, heatmap_tile, pyramid_block_sizes
+from utils.minhash import lsh_band_keys
 
 logger = get_logger(__name__)
 clustering_router = APIRouter(prefix="/clustering", tags=["clustering"])
 
+# shared store entries derived from the clusters of a dataset
+CLUSTER_ENTRIES = ("clusters", "sketches", "labels", "models")
+
+# model sets of the current "models" entries of the shared store, which keep their core point KD-tree,
+# of the CONFIG.CLUSTER_MODEL_SETS_MEMORY_ENTRIES datasets used last
+_model_sets: "OrderedDict[str, ClusterModelSet]" = OrderedDict()
+
+
+async def load_cluster_index(db: AsyncSession, dataset_id: str) -> Optional[ClusterIndex]:
+    """Clusters of a dataset as a ClusterIndex, decoded once and shared by all workers through the shared store."""
+    entry = shared_store.get(dataset_id, "clusters")
+    if entry is None:
+        clusters = await get_all_clusters(db, dataset_id)
+        if not clusters:
+            return None
+        index = await run_in_threadpool(ClusterIndex.from_clusters, clusters)
+        decoded = await run_in_threadpool(index.to_entry)  # with the digest of the clusters
+        entry = await run_in_threadpool(shared_store.put, dataset_id, "clusters", decoded.arrays, decoded.meta)
+    return ClusterIndex.from_entry(entry)
+
+
+async def load_cluster_labels(dataset_id: str, index: ClusterIndex) -> SharedEntry:
+    """Label vectors of all feature pairs, in the order of the ClusterIndex, see ClusterIndex.labels."""
+    entry = shared_store.get(dataset_id, "labels")
+    if entry is None:
+        labels, counts = await run_in_threadpool(index.labels)
+        arrays = {"labels": labels, "counts": counts}
+        entry = await run_in_threadpool(shared_store.put, dataset_id, "labels", arrays, {})
+    return entry
+
+
+async def load_cluster_sketches(db: AsyncSession, dataset_id: str, index: ClusterIndex) -> SharedEntry:
+    """MinHash signatures and LSH band keys of all clusters, in the order of the ClusterIndex."""
+    settings = {"num_perm": CONFIG.MINHASH_PERMUTATIONS, "seed": CONFIG.MINHASH_SEED, "bands": CONFIG.MINHASH_BANDS}
+    entry = shared_store.get(dataset_id, "sketches")
+    if entry is None or entry.meta != settings:
+        stored = await get_cluster_signatures(db, dataset_id)
+        signatures = await run_in_threadpool(index.signatures, stored, CONFIG.MINHASH_PERMUTATIONS, CONFIG.MINHASH_SEED)
+        arrays = {"signatures": signatures, "band_keys": lsh_band_keys(signatures, CONFIG.MINHASH_BANDS)}
+        entry = await run_in_threadpool(shared_store.put, dataset_id, "sketches", arrays, settings)
+    return entry
+
+
+async def load_cluster_models(db: AsyncSession, dataset_id: str) -> Optional[ClusterModelSet]:
+    """Fitted models of all feature pairs of a dataset that have one, shared by all workers through the shared store."""
+    entry = shared_store.get(dataset_id, "models")
+    if entry is None:
+        records = await get_cluster_models(db, dataset_id)
+        models = {pair: ClusterModel.from_record(*record) for pair, record in records.items() if record[0]}
+        if not models:
+            return None
+        packed = (await run_in_threadpool(ClusterModelSet.from_models, models)).to_entry()
+        entry = await run_in_threadpool(shared_store.put, dataset_id, "models", packed.arrays, packed.meta)
+
+    model_set = _model_sets.get(dataset_id)
+    if model_set is None or model_set.entry is not entry:
+        model_set = ClusterModelSet.from_entry(entry)
+        _model_sets[dataset_id] = model_set
+    _model_sets.move_to_end(dataset_id)
+    while len(_model_sets) > CONFIG.CLUSTER_MODEL_SETS_MEMORY_ENTRIES:
+        _model_sets.popitem(last=False)
+    return model_set
+
+
+async def load_numeric_columns(db: AsyncSession, dataset_id: str) -> Optional[SharedEntry]:
+    """Numeric columns of a dataset as clustered (see ClusteringService.numeric_values), shared by all workers."""
+    entry = shared_store.get(dataset_id, "numeric")
+    if entry is None:
+        raw_data = await get_dataset_data(db, dataset_id)
+        if not raw_data:
+            return None
+
+        df = await run_in_threadpool(sanitize_and_parse_dataset, raw_data)
+        values, columns = await run_in_threadpool(ClusteringService.numeric_values, df)
+        arrays, meta = {"values": values}, {"columns": columns}
+        entry = await run_in_threadpool(shared_store.put, dataset_id, "numeric", arrays, meta)
+    return entry
+
+
+async def load_heatmap_pyramid(
+    db: AsyncSession, dataset_id: str, numeric: SharedEntry, statistic: str, order_by: Optional[Tuple[str, str]]
+) -> SharedEntry:
+    """
+    Heatmap pyramid of a dataset (see utils.heatmap.build_pyramid), built once and shared by all workers.
+    With order_by, rows are grouped by the clusters of that feature pair and the pyramid follows their changes.
+    """
+    name, labels_digest, order = f"heatmap-{statistic}", None, None
+    if order_by is not None:
+        clusters = await load_cluster_index(db, dataset_id)
+        group = clusters.group(*order_by) if clusters else None
+        if group is None:
+            raise HTTPException(status_code=404, detail="No clusters found for the given feature pair")
+        labels = np.asarray((await load_cluster_labels(dataset_id, clusters)).arrays["labels"][group])
+        name = f"{name}-{hash_parameters(*canonical_pair(*order_by))[:16]}"
+        labels_digest = hashlib.blake2b(labels.tobytes(), digest_size=16).hexdigest()
+
+    entry = shared_store.get(dataset_id, name)
+    if entry is not None and entry.meta["labels"] == labels_digest:
+        return entry
+    if entry is not None:
+        shared_store.invalidate(dataset_id, name)  # ordered by clusters computed since
+
+    values = numeric.arrays["values"]
+    meta = {"labels": labels_digest, "clusters": None}
+    if order_by is not None:
+        cluster_ids = clusters.cluster_ids[clusters.group_slice(group)].tolist() + [None]
+        # rows appended after the clusters were computed are in none of them
+        labels = np.concatenate([labels, np.full(max(0, len(values) - len(labels)), len(cluster_ids) - 1)])
+        order, starts = cluster_order(labels[: len(values)], len(cluster_ids))
+        meta["clusters"] = [
+            {"cluster_id": cluster_id, "start": int(starts[label]), "end": int(starts[label + 1])}
+            for label, cluster_id in enumerate(cluster_ids)
+            if starts[label + 1] > starts[label]
+        ]
+
+    arrays = await governor.run(
+        "heatmap_pyramid",
+        build_pyramid,
+        values,
+        statistic,
+        CONFIG.HEATMAP_ZOOM_FACTOR,
+        CONFIG.HEATMAP_TILE_ROWS,
+        CONFIG.HEATMAP_BUILD_COLUMNS,
+        order,
+    )
+    if order is not None:
+        arrays["order"] = order
+    return await run_in_threadpool(shared_store.put, dataset_id, name, arrays, meta)
+
+
+def clustering_key(
+    dataset_id: str, data_version: Optional[int], columns: List[str], algorithm: str, params: Dict[str, Any]
+) -> str:
+    """Key of a clustering in flight (see cluster_and_save), the same for requests and the precompute pipeline."""
+    # priority_features only change the order pairs are clustered in, not the results
+    return make_cache_key(dataset_id, "clustering", data_version, columns, algorithm, params)
+
+
+async def cluster_and_save(
+    dataset_id: str,
+    df: pd.DataFrame,
+    columns: List[str],
+    algorithm: str,
+    params: KMeansParams | DBScanParams,
+    priority_features: Optional[List[str]] = None,
+    background: bool = False,
+) -> Tuple[Dict[str, Dict[str, Dict[int, List[int]]]], bool]:
+    """
+    Cluster the feature pairs of a dataset and store the clusters, run once for concurrent identical
+    computations (see clustering_key), with a session of its own as it may outlive the request that started it.
+    A background run (the precompute pipeline) is a background job of the governor and only stores the
+    clusters if the dataset has none by then.
+
+    Returns:
+        The clusters, and whether they were stored
+    """
+    models = {}
+
+    def collect_model(feat1: str, feat2: str, clusters: Dict[int, List[int]], model: ClusterModel) -> None:
+        models[(feat1, feat2)] = model.to_record()
+
+    run = governor.run_background if background else governor.run
+    try:
+        results = await run(
+            "pipeline_clustering" if background else "clustering",
+            ClusteringService.compute_feature_pairs_clusters,
+            data=df,
+            columns=columns,
+            algorithm=algorithm,
+            params=params,
+            priority_features=priority_features,
+            on_result=collect_model,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing dataset: {str(e)}")
+        raise HTTPException(status_code=422, detail=f"Error processing dataset: {str(e)}")
+
+    async with AsyncSessionLocal() as db:
+        saved = await save_clusters(db, dataset_id, results, algorithm, models, replace=not background)
+    if saved:
+        for entry_name in CLUSTER_ENTRIES:
+            shared_store.invalidate(dataset_id, entry_name)
+        ClusteringService.invalidate_cache(dataset_id)
+    return results, saved
+
 
 @clustering_router.post("/compute", response_model=List[ClusteringResult])
-async def compute_clusters(request: ClusteringRequest, db: Session = Depends(get_db)) -> List[ClusteringResult]:
+async def compute_clusters(
+    request: ClusteringRequest, db: AsyncSession = Depends(get_async_db)
+) -> List[ClusteringResult]:
     try:
         dataset_id = request.dataset_id if hasattr(request, "dataset_id") else None
         raw_data = None
 
+        data_version = None
         if dataset_id:
-            raw_data = get_dataset_data(db, dataset_id)
+            data_version = await get_dataset_version(db, dataset_id)  # read before the rows
+            raw_data = await get_dataset_data(db, dataset_id)
 
         if not raw_data:
             # check if data is provided in the request
@@ -58,26 +277,32 @@ async def compute_clusters(request: ClusteringRequest, db: Session = Depends(get
                     raise HTTPException(status_code=400, detail="No numeric columns found for clustering")
                 logger.info(f"No columns specified, using all numeric columns: {columns}")
 
-            # Convert back to list of dicts for processing
-            sanitized_data = dataframe_to_dict_list(df)
-
             if not dataset_id:
                 filename = (
                     request.filename
                     if hasattr(request, "filename") and request.filename
                     else "dataset_from_computation.csv"
                 )
-                dataset_id = create_dataset(db, sanitized_data, filename)
+                dataset_id = await create_dataset(db, df, filename)
+                data_version = await get_dataset_version(db, dataset_id)
                 logger.info(f"Created new dataset with ID {dataset_id}")
-
-            results = ClusteringService.compute_feature_pairs_clusters(
-                data=sanitized_data, columns=columns, algorithm=request.algorithm, params=request.params
-            )
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error sanitizing or processing dataset: {str(e)}")
+            logger.error(f"Error sanitizing dataset: {str(e)}")
             raise HTTPException(status_code=422, detail=f"Error processing dataset: {str(e)}")
 
-        save_clusters(db, dataset_id, results, request.algorithm)
+        key = clustering_key(dataset_id, data_version, columns, request.algorithm, request.params.model_dump())
+        results, _ = await in_flight.run(
+            key,
+            cluster_and_save,
+            dataset_id,
+            df,
+            columns,
+            request.algorithm,
+            request.params,
+            request.priority_features,
+        )
 
         formatted_results = []
         for feat1, feature_pairs in results.items():
@@ -86,14 +311,18 @@ async def compute_clusters(request: ClusteringRequest, db: Session = Depends(get
 
         return formatted_results
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error computing clusters: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @clustering_router.get("/get_all_clustered_feature_pairs", response_model=List[ClusteringResult])
-async def get_all_clustered_feature_pairs(dataset_id: str, db: Session = Depends(get_db)) -> List[ClusteringResult]:
-    clusters = get_all_clusters(db, dataset_id)
+async def get_all_clustered_feature_pairs(
+    dataset_id: str, db: AsyncSession = Depends(get_async_db)
+) -> List[ClusteringResult]:
+    clusters = await get_all_clusters(db, dataset_id)
     if not clusters:
         return []
 
@@ -106,21 +335,41 @@ async def get_all_clustered_feature_pairs(dataset_id: str, db: Session = Depends
 
 
 @clustering_router.post("/similarities", response_model=List[ClusterSimilarity])
-async def get_similarities(request: SimilarityRequest, db: Session = Depends(get_db)) -> List[ClusterSimilarity]:
+async def get_similarities(
+    request: SimilarityRequest, db: AsyncSession = Depends(get_async_db)
+) -> List[ClusterSimilarity]:
     try:
         dataset_id = request.dataset_id
         if not dataset_id:
             raise HTTPException(status_code=400, detail="dataset_id is required")
 
-        clusters = get_all_clusters(db, dataset_id)
+        clusters = await load_cluster_index(db, dataset_id)
         if not clusters:
             raise HTTPException(status_code=400, detail="No clusters found. Please compute clusters first.")
-        similarities = ClusteringService.get_cluster_similarities(
-            all_clusters=clusters,
-            selected_feature1=request.selected_feature1,
-            selected_feature2=request.selected_feature2,
-            selected_cluster_id=request.selected_cluster_id,
-        )
+
+        if request.approximate and CONFIG.MINHASH_PERMUTATIONS:
+            sketches = await load_cluster_sketches(db, dataset_id, clusters)
+            similarities = await run_in_threadpool(
+                ClusteringService.get_approximate_cluster_similarities,
+                clusters=clusters,
+                signatures=sketches.arrays["signatures"],
+                band_keys=sketches.arrays["band_keys"],
+                selected_feature1=request.selected_feature1,
+                selected_feature2=request.selected_feature2,
+                selected_cluster_id=request.selected_cluster_id,
+                top_k=request.top_k or CONFIG.SIMILARITY_DEFAULT_TOP_K,
+                max_error=request.max_error,
+            )
+        else:
+            similarities = await run_in_threadpool(
+                ClusteringService.get_cluster_similarities,
+                all_clusters=clusters,
+                selected_feature1=request.selected_feature1,
+                selected_feature2=request.selected_feature2,
+                selected_cluster_id=request.selected_cluster_id,
+            )
+            if request.top_k:
+                similarities = similarities[: request.top_k]
 
         return [ClusterSimilarity(**sim) for sim in similarities]
 
@@ -134,14 +383,14 @@ async def get_clusters_by_features_endpoint(
     dataset_id: str,
     feature1: str = Query(..., description="First feature name"),
     feature2: str = Query(..., description="Second feature name"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Optional[Dict[int, List[int]]]:
     """
     Get clusters for a specific feature pair.
     Returns a dictionary mapping cluster IDs to lists of data point indices.
     """
     try:
-        clusters = get_clusters_by_features(db, dataset_id, feature1, feature2)
+        clusters = await get_clusters_by_features(db, dataset_id, feature1, feature2)
         if not clusters:
             raise HTTPException(status_code=404, detail="No clusters found for the given feature pair")
         return clusters
@@ -152,13 +401,15 @@ async def get_clusters_by_features_endpoint(
 
 
 @clustering_router.post("/feature_pair_matrix")
-async def get_feature_pair_similarity_matrix(request: FeaturePairMatrixRequest, db: Session = Depends(get_db)):
+async def get_feature_pair_similarity_matrix(
+    request: FeaturePairMatrixRequest, db: AsyncSession = Depends(get_async_db)
+):
     """
     Get similarity matrix for a selected cluster across all feature pairs.
     Shows how the selected cluster compares to other clusters for each feature pair combination.
     """
     try:
-        clusters = get_all_clusters(db, request.dataset_id)
+        clusters = await load_cluster_index(db, request.dataset_id)
         if not clusters:
             raise HTTPException(status_code=400, detail="No clusters found. Please compute clusters first.")
 
@@ -177,3 +428,199 @@ async def get_feature_pair_similarity_matrix(request: FeaturePairMatrixRequest,
     except Exception as e:
         logger.error(f"Error computing feature pair similarity matrix: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@clustering_router.post("/partition_similarity", response_model=PartitionSimilarityResult)
+async def get_partition_similarity_matrix(
+    request: PartitionSimilarityRequest, db: AsyncSession = Depends(get_async_db)
+) -> PartitionSimilarityResult:
+    """
+    Compare the clusterings of feature pairs as whole partitions.
+    Returns ARI, NMI and mean best-match Jaccard matrices over all (or the requested) feature pairs.
+    """
+    try:
+        clusters = await load_cluster_index(db, request.dataset_id)
+        if not clusters:
+            raise HTTPException(status_code=400, detail="No clusters found. Please compute clusters first.")
+        labels = await load_cluster_labels(request.dataset_id, clusters)
+
+        result = await governor.run(
+            "partition_similarity",
+            ClusteringService.compute_partition_similarity_matrix,
+            dataset_id=request.dataset_id,
+            pairs=clusters.pairs,
+            labels=labels.arrays["labels"],
+            counts=labels.arrays["counts"],
+            selected_pairs=request.pairs,
+            clusters_digest=clusters.digest,
+        )
+        return PartitionSimilarityResult(**result)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error computing partition similarity matrix: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@clustering_router.post("/pair_view", response_model=PairViewResult)
+async def get_pair_view(request: PairViewRequest, db: AsyncSession = Depends(get_async_db)) -> PairViewResult:
+    """
+    Scatter plot data of a feature pair for large datasets: a density-preserving sample of the rows,
+    or the number of rows per grid cell, per cluster label. Views are cached until the clusters change.
+    """
+    try:
+        resolution = request.resolution or CONFIG.PAIR_VIEW_RESOLUTION
+        if resolution > CONFIG.PAIR_VIEW_MAX_RESOLUTION:
+            raise HTTPException(
+                status_code=422, detail=f"Resolution must be at most {CONFIG.PAIR_VIEW_MAX_RESOLUTION} cells per axis"
+            )
+        max_points = None
+        if request.mode == "sample":
+            max_points = request.max_points or CONFIG.PAIR_VIEW_POINTS
+            if max_points > CONFIG.PAIR_VIEW_MAX_POINTS:
+                raise HTTPException(
+                    status_code=422, detail=f"Samples are limited to {CONFIG.PAIR_VIEW_MAX_POINTS} points"
+                )
+
+        clusters = await load_cluster_index(db, request.dataset_id)
+        if not clusters:
+            raise HTTPException(status_code=400, detail="No clusters found. Please compute clusters first.")
+        group = clusters.group(request.feature1, request.feature2)
+        if group is None:
+            raise HTTPException(status_code=404, detail="No clusters found for the given feature pair")
+
+        cache_key = ClusteringService.pair_view_cache_key(
+            request.dataset_id,
+            clusters.digest,
+            request.feature1,
+            request.feature2,
+            request.mode,
+            resolution,
+            max_points,
+        )
+        view = ClusteringService.get_cached_pair_view(cache_key)
+        if view is None:
+            labels = await load_cluster_labels(request.dataset_id, clusters)
+            numeric = await load_numeric_columns(db, request.dataset_id)
+            if numeric is None:
+                raise HTTPException(status_code=404, detail=f"Dataset {request.dataset_id} not found")
+            columns = {col: i for i, col in enumerate(numeric.meta["columns"])}
+            missing = [col for col in (request.feature1, request.feature2) if col not in columns]
+            if missing:
+                raise HTTPException(status_code=422, detail=f"Columns are not numeric or not found: {missing}")
+
+            view = await governor.run(
+                "pair_view",
+                ClusteringService.compute_pair_view,
+                x=numeric.arrays["values"][:, columns[request.feature1]],
+                y=numeric.arrays["values"][:, columns[request.feature2]],
+                labels=labels.arrays["labels"][group],
+                cluster_ids=clusters.cluster_ids[clusters.group_slice(group)].tolist() + [None],
+                mode=request.mode,
+                resolution=resolution,
+                max_points=max_points,
+                cache_key=cache_key,
+            )
+
+        return PairViewResult(feature1=request.feature1, feature2=request.feature2, mode=request.mode, **view)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing pair view: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@clustering_router.post("/heatmap_tile", response_model=HeatmapTile)
+async def get_heatmap_tile(request: HeatmapTileRequest, db: AsyncSession = Depends(get_async_db)) -> HeatmapTile:
+    """
+    One tile of the Data Panel heatmap at a zoom level: blocks of consecutive rows aggregated by their
+    mean or median, normalized per column. Level 0 shows the whole dataset in one tile, each further
+    level CONFIG.HEATMAP_ZOOM_FACTOR times more blocks, the last one the rows themselves.
+    """
+    try:
+        numeric = await load_numeric_columns(db, request.dataset_id)
+        if numeric is None:
+            raise HTTPException(status_code=404, detail=f"Dataset {request.dataset_id} not found")
+        n_rows, n_columns = numeric.arrays["values"].shape
+        block_sizes = pyramid_block_sizes(n_rows, CONFIG.HEATMAP_ZOOM_FACTOR, CONFIG.HEATMAP_TILE_ROWS)
+        if request.level >= len(block_sizes):
+            raise HTTPException(status_code=422, detail=f"The dataset has {len(block_sizes)} zoom levels")
+        first_block = request.tile_row * CONFIG.HEATMAP_TILE_ROWS
+        first_column = request.tile_column * CONFIG.HEATMAP_TILE_COLUMNS
+        if first_block >= -(-n_rows // block_sizes[request.level]) or first_column >= n_columns:
+            raise HTTPException(status_code=404, detail="Tile outside of the dataset")
+
+        pyramid = await load_heatmap_pyramid(db, request.dataset_id, numeric, request.statistic, request.order_by)
+        columns = slice(first_column, min(first_column + CONFIG.HEATMAP_TILE_COLUMNS, n_columns))
+        values = heatmap_tile(
+            numeric.arrays["values"],
+            pyramid.arrays,
+            request.level,
+            first_block,
+            CONFIG.HEATMAP_TILE_ROWS,
+            columns,
+            block_sizes,
+        )
+        return HeatmapTile(
+            rows=n_rows,
+            levels=block_sizes,
+            level=request.level,
+            tile_row=request.tile_row,
+            tile_column=request.tile_column,
+            first_block=first_block,
+            columns=numeric.meta["columns"][columns],
+            values=np.round(values, 4).tolist(),
+            clusters=[HeatmapSegment(**segment) for segment in pyramid.meta["clusters"] or []] or None,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving heatmap tile: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@clustering_router.post("/predict", response_model=PredictResult)
+async def predict_clusters(request: PredictRequest, db: AsyncSession = Depends(get_async_db)) -> PredictResult:
+    """
+    Label new rows for the stored clusters of every feature pair, without refitting or storing anything.
+    Rows are assigned like appended rows, see ClusterModel.assign.
+    """
+    try:
+        model_set = await load_cluster_models(db, request.dataset_id)
+        if model_set is None:
+            raise HTTPException(status_code=400, detail="No cluster models found. Please compute clusters first.")
+
+        if request.pairs is None:
+            pairs = list(range(len(model_set.pairs)))
+        else:
+            positions = {pair: p for p, pair in enumerate(model_set.pairs)}
+            requested = [canonical_pair(*pair) for pair in request.pairs]
+            missing = [pair for pair in requested if pair not in positions]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"No cluster models found for feature pairs: {missing}")
+            pairs = [positions[pair] for pair in requested]
+
+        data = pd.DataFrame(request.rows, columns=model_set.features).apply(pd.to_numeric, errors="coerce")
+        labels, outliers, missing_values = await governor.run(
+            "cluster_predict",
+            model_set.predict,
+            data.to_numpy(dtype=np.float64),
+            pairs,
+            n_jobs=governor.threads_per_job,
+        )
+        return PredictResult(
+            pairs=[model_set.pairs[p] for p in pairs],
+            labels=[
+                [None if is_missing else label for label, is_missing in zip(pair_labels, pair_missing)]
+                for pair_labels, pair_missing in zip(labels.tolist(), missing_values.tolist())
+            ],
+            outliers=outliers.tolist(),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error predicting clusters: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
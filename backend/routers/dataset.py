@@ -1,23 +1,57 @@
-from typing import Dict, List
+import asyncio
+import os
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
-from database.db_service import create_dataset, delete_dataset, get_all_datasets, get_dataset_data, reset_datasets
-from database.models import get_db
+from core.config import CONFIG
+from core.resources import governor
+from database.async_db_service import (
+    append_dataset_rows,
+    create_dataset,
+    delete_dataset,
+    get_all_clusters,
+    get_all_datasets,
+    get_cluster_models,
+    get_cluster_signatures,
+    get_dataset_contents,
+    get_dataset_data,
+    get_dataset_summary,
+    get_dataset_version,
+    get_pipeline_stages,
+    import_dataset,
+    reset_datasets,
+)
+from database.models import get_async_db
 from models.dataset import CSVDataRequest
+from routers.precompute import PIPELINE_STAGES, ensure_dataset_summary, schedule_pipeline
+from services.bundle_service import BUNDLE_SUFFIX, BundleService
+from services.cluster_model import ClusterModel
+from services.clustering_service import ClusteringService
+from services.shapley_service import ShapleyService
+from services.shared_store import shared_store
 from utils import get_logger
-from utils.data_utils import dataframe_to_dict_list, sanitize_and_parse_dataset
+from utils.data_utils import read_and_sanitize_file, sanitize_dataset
 
 logger = get_logger(__name__)
 dataset_router = APIRouter(prefix="/dataset", tags=["dataset"])
 
+# appends in progress in this worker by dataset, a lock is dropped once no append holds or awaits it
+_append_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
 
 @dataset_router.get("/all")
-async def get_all_datasets_endpoint(db: Session = Depends(get_db)) -> Dict[str, List[Dict[str, str]]]:
+async def get_all_datasets_endpoint(db: AsyncSession = Depends(get_async_db)) -> Dict[str, List[Dict[str, str]]]:
     """Get all datasets with their IDs and filenames."""
     try:
-        datasets = get_all_datasets(db)
+        datasets = await get_all_datasets(db)
         return {"datasets": datasets}
     except Exception as e:
         logger.error(f"Error retrieving all datasets: {str(e)}")
@@ -25,40 +59,339 @@ async def get_all_datasets_endpoint(db: Session = Depends(get_db)) -> Dict[str,
 
 
 @dataset_router.post("/upload")
-async def upload_data(request: CSVDataRequest, db: Session = Depends(get_db)) -> Dict[str, str]:
+async def upload_data(request: CSVDataRequest, db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
     """Upload CSV data as JSON to the database."""
     try:
         try:
             logger.info(f"Sanitizing dataset with {len(request.data)} rows")
-            df = sanitize_and_parse_dataset(request.data)
-            sanitized_data = dataframe_to_dict_list(df)
+            df, report = await run_in_threadpool(sanitize_dataset, request.data)
             logger.info("Successfully sanitized dataset")
         except Exception as e:
             logger.error(f"Error sanitizing data: {str(e)}")
             raise HTTPException(status_code=422, detail=f"Error processing dataset: {str(e)}")
 
-        dataset_id = create_dataset(db, sanitized_data, request.filename)
-        return {"message": "Data uploaded successfully", "dataset_id": dataset_id}
+        dataset_id = await create_dataset(db, df, request.filename, report)
+        pipeline = await schedule_pipeline(db, dataset_id)
+        return {
+            "message": "Data uploaded successfully",
+            "dataset_id": dataset_id,
+            "sanitization": report,
+            "pipeline": pipeline,
+        }
     except Exception as e:
         logger.error(f"Error uploading data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@dataset_router.post("/upload_file")
+async def upload_file(
+    request: Request,
+    filename: str = Query(..., description="Name of the uploaded file"),
+    file_format: Optional[Literal["csv", "parquet"]] = Query(
+        None, description="File format, inferred from the filename extension if omitted"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict[str, Any]:
+    """
+    Upload a raw CSV or Parquet file as the request body.
+    The body is streamed to a temporary file and parsed in chunks instead of being held in memory.
+    """
+    file_format = file_format or Path(filename).suffix.lstrip(".").lower()
+    if file_format not in ("csv", "parquet"):
+        raise HTTPException(status_code=415, detail=f"Unsupported file format: {file_format or 'unknown'}")
+
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_format}", dir=CONFIG.UPLOAD_TMP_DIR)
+    try:
+        with tmp_file:
+            async for chunk in request.stream():
+                tmp_file.write(chunk)
+
+        try:
+            df, report = await run_in_threadpool(read_and_sanitize_file, tmp_file.name, file_format)
+        except Exception as e:
+            logger.error(f"Error sanitizing data: {str(e)}")
+            raise HTTPException(status_code=422, detail=f"Error processing dataset: {str(e)}")
+
+        dataset_id = await create_dataset(db, df, filename, report)
+        pipeline = await schedule_pipeline(db, dataset_id)
+        return {
+            "message": "Data uploaded successfully",
+            "dataset_id": dataset_id,
+            "sanitization": report,
+            "pipeline": pipeline,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading file: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        os.unlink(tmp_file.name)
+
+
+@dataset_router.post("/import_bundle")
+async def import_bundle(request: Request, db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
+    """
+    Import a dataset bundle (see export_bundle) sent as the request body. The dataset keeps its ID and
+    is served from the bundled clusters, models and derived data without recomputing them.
+    A dataset that already exists, or one with the same content, is not imported again.
+    """
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=BUNDLE_SUFFIX, dir=CONFIG.UPLOAD_TMP_DIR)
+    try:
+        with tmp_file:
+            async for chunk in request.stream():
+                tmp_file.write(chunk)
+
+        try:
+            bundle = await run_in_threadpool(BundleService.read_bundle, tmp_file.name)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid bundle: {str(e)}")
+
+        dataset_id, imported = await import_dataset(
+            db,
+            dataset_id=bundle.dataset_id,
+            filename=bundle.filename,
+            fingerprints=bundle.fingerprints,
+            summary=bundle.summary,
+            records=bundle.records,
+            algorithm=bundle.algorithm,
+            clusters=bundle.clusters,
+            signatures=bundle.signatures,
+            models=bundle.models,
+            shapley_values=bundle.shapley_values,
+        )
+        if imported:
+            ShapleyService.invalidate_cache(dataset_id)
+            ClusteringService.invalidate_cache(dataset_id)
+            await run_in_threadpool(BundleService.seed_shared_store, shared_store, dataset_id, bundle.entries)
+        message = "Dataset imported successfully" if imported else "Dataset already exists"
+        return {"message": message, "dataset_id": dataset_id, "imported": imported}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing bundle: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        os.unlink(tmp_file.name)
+
+
+@dataset_router.get("/{dataset_id}/bundle")
+async def export_bundle(dataset_id: str, db: AsyncSession = Depends(get_async_db)) -> FileResponse:
+    """
+    Export a dataset with its clusters, models, Shapley values and derived data as one file,
+    to be imported by another instance (see import_bundle and BundleService).
+    """
+    contents = await get_dataset_contents(db, dataset_id)
+    if contents is None:
+        raise HTTPException(status_code=404, detail=f"Dataset with ID {dataset_id} not found")
+
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=BUNDLE_SUFFIX, dir=CONFIG.UPLOAD_TMP_DIR)
+    tmp_file.close()
+    try:
+        records = await get_dataset_data(db, dataset_id)
+        clusters = await get_all_clusters(db, dataset_id)
+        signatures = await get_cluster_signatures(db, dataset_id)
+        models = await get_cluster_models(db, dataset_id)
+        await governor.run(
+            "bundle_export",
+            BundleService.write_bundle,
+            tmp_file.name,
+            contents,
+            records,
+            clusters,
+            signatures,
+            models,
+            shared_store.entries(dataset_id),
+        )
+    except Exception as e:
+        os.unlink(tmp_file.name)
+        logger.error(f"Error exporting dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return FileResponse(
+        tmp_file.name,
+        media_type="application/octet-stream",
+        filename=f"{Path(contents['filename'] or dataset_id).stem}{BUNDLE_SUFFIX}",
+        background=BackgroundTask(os.unlink, tmp_file.name),
+    )
+
+
+@dataset_router.post("/{dataset_id}/append")
+async def append_rows(
+    dataset_id: str, request: CSVDataRequest, db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, Any]:
+    """
+    Append rows to a dataset, keeping its ID and clusters.
+    The new rows are assigned to the stored clusters of every feature pair instead of clustering all
+    rows again; pairs whose clusters drifted are refitted, see ClusteringService.assign_appended_rows.
+    The rows and clusters are replaced together, appends to a dataset run one at a time in a worker
+    and an append that another worker overtook fails with 409.
+    """
+    lock = _append_locks.get(dataset_id)
+    if lock is None:
+        lock = _append_locks[dataset_id] = asyncio.Lock()
+    async with lock:
+        return await _append_rows(dataset_id, request, db)
+
+
+async def _append_rows(dataset_id: str, request: CSVDataRequest, db: AsyncSession) -> Dict[str, Any]:
+    try:
+        version = await get_dataset_version(db, dataset_id)  # read before the rows, see append_dataset_rows
+        data = await get_dataset_data(db, dataset_id) if version is not None else None
+        if not data:
+            raise HTTPException(status_code=404, detail=f"Dataset with ID {dataset_id} not found")
+        if not request.data:
+            raise HTTPException(status_code=400, detail="No rows to append")
+        unknown_columns = sorted({column for row in request.data for column in row} - set(data[0]))
+        if unknown_columns:
+            raise HTTPException(status_code=422, detail=f"Columns not found in dataset: {unknown_columns}")
+
+        try:
+            df, report = await run_in_threadpool(sanitize_dataset, data + request.data)
+        except Exception as e:
+            logger.error(f"Error sanitizing data: {str(e)}")
+            raise HTTPException(status_code=422, detail=f"Error processing dataset: {str(e)}")
+        # values filled at upload are no longer missing in the stored rows, keep counting them
+        previous = (await get_dataset_summary(db, dataset_id) or {}).get("columns", {})
+        missing = {col: previous.get(col, {}).get("missing", 0) + info["filled"] for col, info in report.items()}
+
+        records = await get_cluster_models(db, dataset_id)
+        models = {pair: ClusterModel.from_record(*record) for pair, record in records.items() if record[0]}
+        appended, results, model_records = {}, {}, {}
+        if models:
+            clusters = await get_all_clusters(db, dataset_id)
+            appended = await governor.run(
+                "cluster_append",
+                ClusteringService.assign_appended_rows,
+                data=df,
+                previous_rows=len(data),
+                clusters={(feat1, feat2): pair for feat1, pairs in clusters.items() for feat2, pair in pairs.items()},
+                models=models,
+            )
+            for (feat1, feat2), result in appended.items():
+                results.setdefault(feat1, {})[feat2] = result.clusters
+            model_records = {pair: result.model.to_record() for pair, result in appended.items()}
+        if not await append_dataset_rows(db, dataset_id, version, df, missing, results, model_records):
+            raise HTTPException(
+                status_code=409, detail=f"Dataset {dataset_id} was changed or deleted meanwhile, please retry"
+            )
+
+        ShapleyService.invalidate_cache(dataset_id)
+        ClusteringService.invalidate_cache(dataset_id)
+        shared_store.invalidate(dataset_id)
+
+        return {
+            "message": "Rows appended successfully",
+            "dataset_id": dataset_id,
+            "rows": len(df),
+            "appended": len(request.data),
+            "sanitization": report,
+            "clusters": [
+                {"feature1": feat1, "feature2": feat2, "drift": result.drift, "refit": result.refit}
+                for (feat1, feat2), result in appended.items()
+            ],
+            # clustered before models were stored: the new rows are in none of their clusters until they are recomputed
+            "unassigned_pairs": [pair for pair, record in records.items() if not record[0]],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error appending rows: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @dataset_router.get("/reset")
-async def reset_db(db: Session = Depends(get_db)):
+async def reset_db(db: AsyncSession = Depends(get_async_db)):
     """Reset the datasets table."""
     try:
-        reset_datasets(db)
+        await reset_datasets(db)
+        ShapleyService.invalidate_cache()
+        ClusteringService.invalidate_cache()
+        shared_store.clear()
         return {"message": "Datasets table reset successfully"}
     except Exception as e:
         logger.error(f"Error resetting datasets: {str(e)}")
 
 
+@dataset_router.get("/{dataset_id}/summary")
+async def get_dataset_summary_endpoint(
+    dataset_id: str,
+    bins: Optional[int] = Query(None, description="Histogram resolution to return (default: all)"),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict[str, Any]:
+    """
+    Column statistics and histograms of a dataset, computed at upload (see utils.column_summary),
+    so views that only show distributions do not need to load the rows.
+    """
+    try:
+        if bins is not None and bins not in CONFIG.SUMMARY_HISTOGRAM_BINS:
+            raise HTTPException(
+                status_code=422, detail=f"Histograms are available with {list(CONFIG.SUMMARY_HISTOGRAM_BINS)} bins"
+            )
+
+        summary = await ensure_dataset_summary(db, dataset_id)
+        if summary is None:
+            raise HTTPException(status_code=404, detail=f"Dataset with ID {dataset_id} not found")
+
+        if bins is not None:
+            columns = {}
+            for col, info in summary["columns"].items():
+                if "histograms" in info:
+                    info = {**info, "histograms": {str(bins): info["histograms"][str(bins)]}}
+                columns[col] = info
+            summary = {**summary, "histogram_bins": [bins], "columns": columns}
+        return {"dataset_id": dataset_id, **summary}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving dataset summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@dataset_router.get("/{dataset_id}/pipeline")
+async def get_pipeline_status(dataset_id: str, db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
+    """
+    States of the precompute pipeline of a dataset (see routers.precompute): "pending", "running",
+    "done", "skipped" (with the reason as detail) or "failed" (with the error) per stage.
+    Views can use the precomputed data of a stage once it is done.
+    """
+    try:
+        stages = await get_pipeline_stages(db, dataset_id)
+        if not stages:
+            raise HTTPException(status_code=404, detail=f"No precompute pipeline ran for dataset {dataset_id}")
+        stages.sort(key=lambda stage: PIPELINE_STAGES.index(stage["stage"]))
+        finished = all(stage["status"] in ("done", "skipped", "failed") for stage in stages)
+        return {"dataset_id": dataset_id, "stages": stages, "finished": finished}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving pipeline status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@dataset_router.post("/{dataset_id}/pipeline")
+async def run_pipeline(dataset_id: str, db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
+    """
+    Run the precompute pipeline of a dataset again, e.g. for datasets uploaded before it existed or
+    whose pipeline was interrupted. Stages whose data exists are skipped.
+    """
+    try:
+        if await ensure_dataset_summary(db, dataset_id) is None:
+            raise HTTPException(status_code=404, detail=f"Dataset with ID {dataset_id} not found")
+        stages = await schedule_pipeline(db, dataset_id)
+        return {"dataset_id": dataset_id, "pipeline": stages}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting pipeline: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @dataset_router.get("/{dataset_id}")
-async def get_dataset(dataset_id: str, db: Session = Depends(get_db)):
+async def get_dataset(dataset_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a dataset by its ID."""
     try:
-        data = get_dataset_data(db, dataset_id)
+        data = await get_dataset_data(db, dataset_id)
         if not data:
             raise HTTPException(status_code=404, detail=f"Dataset with ID {dataset_id} not found")
 
@@ -91,12 +424,15 @@ async def get_dataset(dataset_id: str, db: Session = Depends(get_db)):
 
 
 @dataset_router.delete("/{dataset_id}")
-async def delete_dataset_endpoint(dataset_id: str, db: Session = Depends(get_db)) -> Dict[str, str]:
+async def delete_dataset_endpoint(dataset_id: str, db: AsyncSession = Depends(get_async_db)) -> Dict[str, str]:
     """Delete a dataset and all its related data."""
     try:
-        success = delete_dataset(db, dataset_id)
+        success = await delete_dataset(db, dataset_id)
         if not success:
             raise HTTPException(status_code=404, detail=f"Dataset with ID {dataset_id} not found")
+        ShapleyService.invalidate_cache(dataset_id)
+        ClusteringService.invalidate_cache(dataset_id)
+        shared_store.invalidate(dataset_id)
 
         return {"message": "Dataset and all related data deleted successfully"}
     except HTTPException:
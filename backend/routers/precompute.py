@@ -0,0 +1,204 @@
+# precompute pipeline: data derived from uploaded datasets, computed in the background
+
+import asyncio
+import json
+import time
+from typing import List, Optional, Set
+
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from core.config import CONFIG
+from core.resources import governor
+from core.single_flight import in_flight
+from database.async_db_service import (
+    get_clustered_feature_pairs,
+    get_dataset_data,
+    get_dataset_summary,
+    get_dataset_version,
+    get_shapley_values,
+    save_dataset_summary,
+    save_shapley_values_bulk,
+    start_pipeline,
+    update_pipeline_stage,
+)
+from database.models import AsyncSessionLocal
+from models.clustering import KMeansParams
+from routers.clustering import (
+    cluster_and_save,
+    clustering_key,
+    load_cluster_index,
+    load_cluster_labels,
+    load_cluster_models,
+    load_cluster_sketches,
+    load_numeric_columns,
+)
+from services.shapley_service import ShapleyService
+from utils import get_logger
+from utils.column_summary import ColumnSummaries, summarize_columns
+from utils.data_utils import get_numeric_columns, sanitize_and_parse_dataset
+
+logger = get_logger(__name__)
+
+# stages in the order they run, later stages use what earlier ones computed
+PIPELINE_STAGES = ("summary", "clusters", "shapley", "similarity")
+
+# datasets whose pipeline is scheduled or running in this process
+_scheduled: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+# pipelines run one at a time, their jobs are background jobs of the governor
+_pipeline_lock = asyncio.Lock()
+
+
+async def ensure_dataset_summary(db: AsyncSession, dataset_id: str) -> Optional[ColumnSummaries]:
+    """
+    Column summary of a dataset, computed and stored if the dataset has none yet (uploaded before
+    summaries were stored) or one with other histogram resolutions. None if the dataset does not exist.
+    """
+    summary = await get_dataset_summary(db, dataset_id)
+    if summary is None or summary.get("histogram_bins") != list(CONFIG.SUMMARY_HISTOGRAM_BINS):
+        data = await get_dataset_data(db, dataset_id)
+        if not data:
+            return None
+        missing = {col: info.get("missing", 0) for col, info in (summary or {}).get("columns", {}).items()}
+        df = await run_in_threadpool(pd.DataFrame, data)
+        summary = await run_in_threadpool(summarize_columns, df, missing)
+        await save_dataset_summary(db, dataset_id, summary)
+    return summary
+
+
+class PrecomputeRun:
+    """
+    The stages of one pipeline run over a dataset, each a method named after it. A stage returns
+    None when done, or why it was skipped. The sanitized rows are loaded once for all stages.
+    """
+
+    def __init__(self, db: AsyncSession, dataset_id: str) -> None:
+        self.db = db
+        self.dataset_id = dataset_id
+        self._df: Optional[pd.DataFrame] = None
+        self.data_version: Optional[int] = None
+
+    async def dataframe(self) -> pd.DataFrame:
+        if self._df is None:
+            self.data_version = await get_dataset_version(self.db, self.dataset_id)  # read before the rows
+            raw_data = await get_dataset_data(self.db, self.dataset_id)
+            if not raw_data:
+                raise LookupError(f"Dataset with ID {self.dataset_id} not found")
+            self._df = await governor.run_background("pipeline_sanitize", sanitize_and_parse_dataset, raw_data)
+        return self._df
+
+    async def summary(self) -> Optional[str]:
+        """Column summary, and the numeric columns as the views read them (see load_numeric_columns)."""
+        if await ensure_dataset_summary(self.db, self.dataset_id) is None:
+            raise LookupError(f"Dataset with ID {self.dataset_id} not found")
+        await load_numeric_columns(self.db, self.dataset_id)
+        return None
+
+    async def clusters(self) -> Optional[str]:
+        """K-means clusters with default parameters of the pairs of the first numeric columns."""
+        if await get_clustered_feature_pairs(self.db, self.dataset_id):
+            return "Dataset has clusters"
+        df = await self.dataframe()
+        columns = get_numeric_columns(df)[: CONFIG.PIPELINE_CLUSTER_COLUMNS]
+        if len(columns) < 2:
+            return "Fewer than two numeric columns"
+
+        # coalesced with a request computing the same clusters meanwhile, which then stores them
+        params = KMeansParams()
+        key = clustering_key(self.dataset_id, self.data_version, columns, "kmeans", params.model_dump())
+        _, saved = await in_flight.run(
+            key, cluster_and_save, self.dataset_id, df, columns, "kmeans", params, background=True
+        )
+        if not saved:
+            return "Dataset was clustered by a request meanwhile"
+        return None
+
+    async def shapley(self) -> Optional[str]:
+        """Shapley values of the likely target columns, see ShapleyService.likely_targets."""
+        df = await self.dataframe()
+        targets = ShapleyService.likely_targets(df, CONFIG.PIPELINE_SHAP_TARGETS)
+        if not targets:
+            return "No numeric target column"
+        targets = [target for target in targets if not await get_shapley_values(self.db, self.dataset_id, target)]
+        if not targets:
+            return "Shapley values of the likely targets exist"
+
+        shap_values = await governor.run_background(
+            "pipeline_shap",
+            ShapleyService.compute_shapley_values_batch,
+            df,
+            targets,
+            dataset_id=self.dataset_id,
+            data_version=self.data_version,
+        )
+        if await get_dataset_version(self.db, self.dataset_id) != self.data_version:
+            return "Rows were appended meanwhile"
+        records = {target: json.loads(values.to_json(orient="records")) for target, values in shap_values.items()}
+        await save_shapley_values_bulk(self.db, self.dataset_id, records)
+        return None
+
+    async def similarity(self) -> Optional[str]:
+        """Decoded clusters, label vectors, MinHash sketches and models that similarity requests read."""
+        index = await load_cluster_index(self.db, self.dataset_id)
+        if index is None:
+            return "Dataset has no clusters"
+        await load_cluster_labels(self.dataset_id, index)
+        await load_cluster_sketches(self.db, self.dataset_id, index)
+        await load_cluster_models(self.db, self.dataset_id)
+        return None
+
+
+async def _run_pipeline(dataset_id: str, stages: List[str]) -> None:
+    remaining = list(stages)
+    async with AsyncSessionLocal() as db:
+        try:
+            async with _pipeline_lock:
+                run = PrecomputeRun(db, dataset_id)
+                while remaining:
+                    stage = remaining[0]
+                    if not await update_pipeline_stage(db, dataset_id, stage, "running"):
+                        logger.info(f"Dataset {dataset_id} was deleted, stopping its pipeline")
+                        return
+                    started = time.monotonic()
+                    try:
+                        skipped = await getattr(run, stage)()
+                        status, detail = ("skipped", skipped) if skipped else ("done", None)
+                    except Exception as e:
+                        logger.error(f"Pipeline stage {stage} of dataset {dataset_id} failed: {str(e)}")
+                        status, detail = "failed", str(e)
+                    await update_pipeline_stage(db, dataset_id, stage, status, detail, time.monotonic() - started)
+                    remaining.pop(0)
+        except asyncio.CancelledError:
+            for stage in remaining:
+                await update_pipeline_stage(db, dataset_id, stage, "failed", "Interrupted by shutdown")
+            raise
+        finally:
+            _scheduled.discard(dataset_id)
+
+
+async def schedule_pipeline(db: AsyncSession, dataset_id: str) -> List[str]:
+    """
+    Run the configured stages of the precompute pipeline (CONFIG.PIPELINE_STAGES) of a dataset in the
+    background, unless they already run in this process. Their states are stored (see get_pipeline_stages)
+    so any worker can report which data is ready.
+
+    Returns:
+        List[str]: The stages that will run
+    """
+    stages = [stage for stage in PIPELINE_STAGES if stage in CONFIG.PIPELINE_STAGES]
+    if stages and dataset_id not in _scheduled:
+        await start_pipeline(db, dataset_id, stages)
+        _scheduled.add(dataset_id)
+        task = asyncio.create_task(_run_pipeline(dataset_id, stages), name=f"pipeline-{dataset_id}")
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    return stages
+
+
+async def cancel_pipelines() -> None:
+    """Cancel the pipelines still running or scheduled, their unfinished stages are marked as failed."""
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
@@ -1,24 +1,120 @@
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.db_service import create_dataset, get_dataset_data, get_shapley_values, save_shapley_values
-from database.models import get_db
-from models.shapley import ShapValuesRequest
+from core.resources import governor
+from core.single_flight import in_flight
+from database.async_db_service import (
+    create_dataset,
+    get_clustered_feature_pairs,
+    get_clusters_by_features,
+    get_dataset_data,
+    get_dataset_version,
+    get_shapley_values,
+    save_shapley_values,
+    save_shapley_values_bulk,
+)
+from database.models import AsyncSessionLocal, get_async_db
+from models.shapley import (
+    ClusterMembershipBatchRequest,
+    ClusterMembershipRequest,
+    FeaturePairInteraction,
+    ShapBatchRequest,
+    ShapInteractionRequest,
+    ShapValuesRequest,
+)
 from services.shapley_service import ShapleyService
 from utils import get_logger
-from utils.data_utils import sanitize_and_parse_dataset
+from utils.cache import make_cache_key
+from utils.data_utils import canonical_pair, sanitize_and_parse_dataset
 
 logger = get_logger(__name__)
 shapley_router = APIRouter(prefix="/shapley", tags=["shapley"])
 
 
+async def _compute_and_save_shap(
+    dataset_id: str,
+    data_version: Optional[int],
+    data_df: pd.DataFrame,
+    target_column: str,
+    latency_budget: Optional[float],
+) -> List[Dict[str, Any]]:
+    """
+    Compute and store the Shapley values of a target column, run once for concurrent identical requests
+    (see compute_shap_values), with a session of its own as it may outlive the request that started it.
+    Importances estimated within a latency budget are only cached, the stored ones are always exact and
+    describe the current rows: they are not stored if rows were appended meanwhile.
+    """
+    if latency_budget:
+        shap_values = await governor.run(
+            "shap",
+            ShapleyService.compute_shapley_values_budgeted,
+            data_df,
+            target_column,
+            latency_budget,
+            dataset_id=dataset_id,
+            data_version=data_version,
+        )
+        return json.loads(shap_values.to_json(orient="records"))
+
+    shap_values = await governor.run(
+        "shap",
+        ShapleyService.compute_shapley_values_from_df,
+        data_df,
+        target_column,
+        dataset_id=dataset_id,
+        data_version=data_version,
+    )
+    shap_values_records = json.loads(shap_values.to_json(orient="records"))
+    async with AsyncSessionLocal() as db:
+        if await get_dataset_version(db, dataset_id) == data_version:
+            await save_shapley_values(db, dataset_id, target_column, shap_values_records)
+    return shap_values_records
+
+
+async def _compute_and_save_shap_batch(
+    dataset_id: str, data_version: Optional[int], data_df: pd.DataFrame, target_columns: Optional[List[str]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Compute and store the Shapley values of several target columns, see _compute_and_save_shap."""
+    try:
+        shap_values = await governor.run(
+            "shap_batch",
+            ShapleyService.compute_shapley_values_batch,
+            data_df,
+            target_columns,
+            dataset_id=dataset_id,
+            data_version=data_version,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    shap_values_records = {
+        target: json.loads(values.to_json(orient="records")) for target, values in shap_values.items()
+    }
+    async with AsyncSessionLocal() as db:
+        if await get_dataset_version(db, dataset_id) == data_version:
+            await save_shapley_values_bulk(db, dataset_id, shap_values_records)
+    return shap_values_records
+
+
 @shapley_router.post("/compute_shap_values")
-async def compute_shap_values(request: ShapValuesRequest, db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
+async def compute_shap_values(
+    request: ShapValuesRequest, db: AsyncSession = Depends(get_async_db)
+) -> List[Dict[str, Any]]:
     try:
-        raw_data = get_dataset_data(db, request.dataset_id)
+        # the version is read before the rows, results of newer rows may be cached under it but not the reverse
+        data_version = await get_dataset_version(db, request.dataset_id) if request.dataset_id else None
+        if data_version is not None and not request.data:
+            cached_values = ShapleyService.get_cached_shapley_values(
+                request.dataset_id, request.target_column, request.latency_budget, data_version
+            )
+            if cached_values is not None:
+                return json.loads(cached_values.to_json(orient="records"))
+
+        raw_data = await get_dataset_data(db, request.dataset_id)
 
         if not raw_data:
             if not request.data:
@@ -42,7 +138,8 @@ async def compute_shap_values(request: ShapValuesRequest, db: Session = Depends(
                     if hasattr(request, "filename") and request.filename
                     else "dataset_from_shapley.csv"
                 )
-                request.dataset_id = create_dataset(db, json.loads(data_df.to_json(orient="records")), filename)
+                request.dataset_id = await create_dataset(db, data_df, filename)
+                data_version = await get_dataset_version(db, request.dataset_id)
                 logger.info(f"Created new dataset with ID {request.dataset_id}")
         except Exception as e:
             logger.error(f"Error sanitizing data: {str(e)}")
@@ -51,25 +148,220 @@ async def compute_shap_values(request: ShapValuesRequest, db: Session = Depends(
         if request.target_column not in data_df.columns:
             raise HTTPException(status_code=400, detail=f"Target column {request.target_column} not found in data")
 
-        shapley_service = ShapleyService()
-        shap_values = shapley_service.compute_shapley_values_from_df(data_df, request.target_column)
+        key = make_cache_key(request.dataset_id, "shap", data_version, request.target_column, request.latency_budget)
+        return await in_flight.run(
+            key,
+            _compute_and_save_shap,
+            request.dataset_id,
+            data_version,
+            data_df,
+            request.target_column,
+            request.latency_budget,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing Shapley values: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        shap_values_records = json.loads(shap_values.to_json(orient="records"))
 
-        save_shapley_values(db, request.dataset_id, request.target_column, shap_values_records)
+@shapley_router.post("/compute_shap_values_batch")
+async def compute_shap_values_batch(
+    request: ShapBatchRequest, db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Compute Shapley values for several target columns (default: all numeric columns) in one job."""
+    try:
+        data_version = await get_dataset_version(db, request.dataset_id) if request.dataset_id else None
+        if data_version is not None and not request.data and request.target_columns:
+            cached_values = {
+                target: ShapleyService.get_cached_shapley_values(request.dataset_id, target, data_version=data_version)
+                for target in request.target_columns
+            }
+            if all(values is not None for values in cached_values.values()):
+                return {
+                    target: json.loads(values.to_json(orient="records")) for target, values in cached_values.items()
+                }
+
+        raw_data = await get_dataset_data(db, request.dataset_id)
 
-        return shap_values_records
+        if not raw_data:
+            if not request.data:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Dataset with ID {request.dataset_id} not found and no data provided in the request",
+                )
+
+            logger.info(f"Dataset {request.dataset_id} not found, using data from request")
+            raw_data = request.data
+
+        try:
+            logger.info(f"Sanitizing dataset with {len(raw_data)} rows")
+            data_df = sanitize_and_parse_dataset(raw_data)
+
+            if not request.dataset_id or request.data:
+                filename = request.filename or "dataset_from_shapley.csv"
+                request.dataset_id = await create_dataset(db, data_df, filename)
+                data_version = await get_dataset_version(db, request.dataset_id)
+                logger.info(f"Created new dataset with ID {request.dataset_id}")
+        except Exception as e:
+            logger.error(f"Error sanitizing data: {str(e)}")
+            raise HTTPException(status_code=422, detail=f"Error processing dataset: {str(e)}")
+
+        missing = [col for col in request.target_columns or [] if col not in data_df.columns]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Target columns {missing} not found in data")
+
+        targets = sorted(request.target_columns) if request.target_columns is not None else None
+        key = make_cache_key(request.dataset_id, "shap_batch", data_version, targets)
+        return await in_flight.run(
+            key, _compute_and_save_shap_batch, request.dataset_id, data_version, data_df, request.target_columns
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error computing Shapley values: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@shapley_router.post("/interactions", response_model=List[FeaturePairInteraction])
+async def compute_interactions(
+    request: ShapInteractionRequest, db: AsyncSession = Depends(get_async_db)
+) -> List[FeaturePairInteraction]:
+    """Rank feature pairs by SHAP interaction strength for a target, flagging the pairs that have clusters."""
+    try:
+        data_version = await get_dataset_version(db, request.dataset_id)
+        if data_version is None:
+            raise HTTPException(status_code=404, detail=f"Dataset with ID {request.dataset_id} not found")
+        interactions = ShapleyService.get_cached_interaction_strengths(
+            request.dataset_id, request.target_column, request.sample_rows, request.latency_budget, data_version
+        )
+        if interactions is None:
+            raw_data = await get_dataset_data(db, request.dataset_id)
+            if not raw_data:
+                raise HTTPException(status_code=404, detail=f"Dataset with ID {request.dataset_id} not found")
+
+            data_df = sanitize_and_parse_dataset(raw_data)
+            if request.target_column not in data_df.columns:
+                raise HTTPException(status_code=400, detail=f"Target column {request.target_column} not found in data")
+
+            try:
+                interactions = await governor.run(
+                    "shap_interactions",
+                    ShapleyService.compute_interaction_strengths,
+                    data_df,
+                    request.target_column,
+                    dataset_id=request.dataset_id,
+                    sample_rows=request.sample_rows,
+                    latency_budget=request.latency_budget,
+                    data_version=data_version,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        # pairs are reported in canonical order, like in get_all_clusters
+        clustered_pairs = set(await get_clustered_feature_pairs(db, request.dataset_id))
+        results = []
+        for feature1, feature2, interaction in interactions.itertuples(index=False):
+            feature1, feature2 = canonical_pair(feature1, feature2)
+            clustered = (feature1, feature2) in clustered_pairs
+            if clustered or not request.clustered_only:
+                results.append(
+                    FeaturePairInteraction(
+                        feature1=feature1, feature2=feature2, interaction=interaction, clustered=clustered
+                    )
+                )
+        return results
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing SHAP interactions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _load_cluster_membership_inputs(
+    db: AsyncSession, request: ClusterMembershipBatchRequest
+) -> Tuple[pd.DataFrame, Dict[int, List[int]], Optional[List[str]]]:
+    raw_data = await get_dataset_data(db, request.dataset_id)
+    if not raw_data:
+        raise HTTPException(status_code=404, detail=f"Dataset with ID {request.dataset_id} not found")
+
+    clusters = await get_clusters_by_features(db, request.dataset_id, request.feature1, request.feature2)
+    if not clusters:
+        raise HTTPException(status_code=404, detail="No clusters found for the given feature pair")
+
+    exclude_features = [request.feature1, request.feature2] if request.exclude_pair_features else None
+    return sanitize_and_parse_dataset(raw_data), clusters, exclude_features
+
+
+@shapley_router.post("/cluster_membership")
+async def explain_cluster_membership(
+    request: ClusterMembershipRequest, db: AsyncSession = Depends(get_async_db)
+) -> List[Dict[str, Any]]:
+    """Explain which features drive membership of a cluster of a feature pair."""
+    try:
+        data_df, clusters, exclude_features = await _load_cluster_membership_inputs(db, request)
+        if request.cluster_id not in clusters:
+            raise HTTPException(status_code=404, detail=f"Cluster {request.cluster_id} not found")
+
+        try:
+            membership = await governor.run(
+                "cluster_membership",
+                ShapleyService.explain_cluster_membership,
+                data_df,
+                clusters,
+                request.cluster_id,
+                dataset_id=request.dataset_id,
+                exclude_features=exclude_features,
+                shared_trees=request.shared_trees,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return json.loads(membership.to_json(orient="records"))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error explaining cluster membership: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@shapley_router.post("/cluster_membership_batch")
+async def explain_cluster_memberships(
+    request: ClusterMembershipBatchRequest, db: AsyncSession = Depends(get_async_db)
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Explain membership of every cluster of a feature pair with one shared model."""
+    try:
+        data_df, clusters, exclude_features = await _load_cluster_membership_inputs(db, request)
+
+        try:
+            memberships = await governor.run(
+                "cluster_membership_batch",
+                ShapleyService.explain_all_cluster_memberships,
+                data_df,
+                clusters,
+                dataset_id=request.dataset_id,
+                exclude_features=exclude_features,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return {
+            cluster_id: json.loads(membership.to_json(orient="records"))
+            for cluster_id, membership in memberships.items()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error explaining cluster memberships: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @shapley_router.get("/get_shapley_values/{dataset_id}/{target_column}")
 async def get_shapley_values_endpoint(
-    dataset_id: str, target_column: str, db: Session = Depends(get_db)
+    dataset_id: str, target_column: str, db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict[str, Any]]:
     try:
-        values = get_shapley_values(db, dataset_id, target_column)
+        values = await get_shapley_values(db, dataset_id, target_column)
         if not values:
             raise HTTPException(status_code=404, detail=f"Shapley values for target column {target_column} not found")
 
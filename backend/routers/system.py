@@ -0,0 +1,29 @@
+# system ops namespace
+
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from core.resources import governor
+from core.single_flight import in_flight
+from utils.lazy_import import import_status
+
+system_router = APIRouter(prefix="/system", tags=["system"])
+
+
+@system_router.get("/resources")
+async def get_resource_utilization() -> Dict[str, Any]:
+    """Current CPU job slots, queue and thread budget usage."""
+    return governor.stats()
+
+
+@system_router.get("/in_flight")
+async def get_computations_in_flight() -> Dict[str, Any]:
+    """Keys of the computations in flight, and how many requests joined one instead of computing it again."""
+    return in_flight.stats()
+
+
+@system_router.get("/imports")
+async def get_import_status() -> Dict[str, bool]:
+    """Whether each lazily imported ML library has been loaded, by warm-up or first use."""
+    return import_status()
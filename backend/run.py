@@ -1,4 +1,6 @@
 #!/usr/bin/env python
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request
@@ -8,7 +10,47 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from core.config import CONFIG
-from routers import clustering, dataset, shapley
+from core.middleware import RequestSizeLimitMiddleware
+from core.resources import governor
+from database.db_service import backfill_dataset_fingerprints
+from database.migrations import upgrade
+from database.models import SessionLocal, async_engine, engine
+from routers import clustering, dataset, shapley, system
+from routers.precompute import cancel_pipelines
+from services.shared_store import shared_store
+from utils import get_logger
+from utils.lazy_import import warm_up
+
+logger = get_logger(__name__)
+
+
+def warm_up_ml() -> None:
+    timings = warm_up()
+    # native thread pools of the libraries just loaded (e.g. OpenMP) start with the core count
+    governor.apply_process_limits()
+    logger.info(f"ML libraries warmed up in {sum(timings.values()):.2f}s: {timings}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    governor.apply_process_limits()
+    upgrade(engine)
+
+    # map datasets stored before content fingerprints were introduced
+    db = SessionLocal()
+    try:
+        backfill_dataset_fingerprints(db)
+    finally:
+        db.close()
+
+    if CONFIG.ML_WARMUP:
+        # daemon thread, so shutting down does not wait for imports still running
+        threading.Thread(target=warm_up_ml, name="ml-warmup", daemon=True).start()
+    yield
+    await cancel_pipelines()
+    governor.shutdown()
+    shared_store.close()
+    await async_engine.dispose()
 
 
 def create_app() -> FastAPI:
@@ -16,9 +58,12 @@ def create_app() -> FastAPI:
         title=CONFIG.API_TITLE,
         version=CONFIG.API_VERSION,
         description=CONFIG.API_DESCRIPTION,
-        max_request_size=CONFIG.MAX_REQUEST_SIZE,
+        lifespan=lifespan,
     )
 
+    # Reject request bodies above the configured size, including streamed uploads
+    app.add_middleware(RequestSizeLimitMiddleware, max_size=CONFIG.MAX_REQUEST_SIZE)
+
     # Configure CORS
     app.add_middleware(
         CORSMiddleware,
@@ -50,6 +95,7 @@ def create_app() -> FastAPI:
     app.include_router(shapley.shapley_router)
     app.include_router(clustering.clustering_router)
     app.include_router(dataset.dataset_router)
+    app.include_router(system.system_router)
 
     return app
 
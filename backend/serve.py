@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Production entry point: runs the API in several uvicorn worker processes on one port.
+
+Before the workers start, the schema is migrated, stored datasets are backfilled and the
+dataset bundles in BUNDLE_IMPORT_DIR are imported once, so workers do not race on it. The
+workers share a store of decoded clusters and normalized data (see services.shared_store) in a
+directory created here and removed on shutdown. The CPU thread budget is split between the
+workers unless CPU_THREAD_BUDGET is set.
+
+Usage (from the backend directory):
+    python serve.py [--workers N] [--host HOST] [--port PORT]
+"""
+
+import argparse
+import os
+import shutil
+from pathlib import Path
+
+import uvicorn
+from sqlalchemy.orm import Session
+
+from core.config import CONFIG
+from database.db_service import backfill_dataset_fingerprints, import_dataset
+from database.migrations import upgrade
+from database.models import SessionLocal, engine
+from services.bundle_service import BUNDLE_SUFFIX, BundleService
+from services.shared_store import SharedArrayStore, create_store_directory, remove_stale_store_directories
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def import_bundles(db: Session, store: SharedArrayStore) -> None:
+    """Import the dataset bundles in CONFIG.BUNDLE_IMPORT_DIR, and seed the shared store with their derived data."""
+    for path in sorted(Path(CONFIG.BUNDLE_IMPORT_DIR).glob(f"*{BUNDLE_SUFFIX}")):
+        try:
+            bundle = BundleService.read_bundle(path)
+            dataset_id, imported = import_dataset(
+                db,
+                dataset_id=bundle.dataset_id,
+                filename=bundle.filename,
+                fingerprints=bundle.fingerprints,
+                summary=bundle.summary,
+                records=bundle.records,
+                algorithm=bundle.algorithm,
+                clusters=bundle.clusters,
+                signatures=bundle.signatures,
+                models=bundle.models,
+                shapley_values=bundle.shapley_values,
+            )
+            if imported:
+                BundleService.seed_shared_store(store, dataset_id, bundle.entries)
+            logger.info(f"{'Imported' if imported else 'Skipped'} bundle {path.name} of dataset {dataset_id}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not import bundle {path}: {str(e)}")
+
+
+def prepare_database(store: SharedArrayStore) -> None:
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        backfill_dataset_fingerprints(db)
+        if CONFIG.BUNDLE_IMPORT_DIR:
+            import_bundles(db, store)
+    finally:
+        db.close()
+    # workers open their own connections
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=CONFIG.SERVER_WORKERS)
+    parser.add_argument("--host", default=CONFIG.HOST)
+    parser.add_argument("--port", type=int, default=CONFIG.PORT)
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    remove_stale_store_directories()
+    store_directory = create_store_directory()
+    prepare_database(SharedArrayStore(str(store_directory)))
+
+    # workers are spawned as new interpreters and read their settings from the environment
+    os.environ["SHARED_STORE_DIR"] = str(store_directory)
+    if "CPU_THREAD_BUDGET" not in os.environ:
+        os.environ["CPU_THREAD_BUDGET"] = str(max(1, CONFIG.CPU_THREAD_BUDGET // workers))
+
+    logger.info(f"Starting {workers} workers on {args.host}:{args.port}, shared store {store_directory}")
+    try:
+        uvicorn.run(
+            "run:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            timeout_graceful_shutdown=CONFIG.SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+        )
+    finally:
+        shutil.rmtree(store_directory, ignore_errors=True)
+        logger.info(f"Removed shared store {store_directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.cluster_index import ClusterIndex
+from services.cluster_model import ClusterModel, ClusterModelSet
+from services.clustering_service import ClusteringService
+from services.shared_store import SharedArrayStore, SharedEntry, check_name
+from utils.bundle import read_bundle, write_bundle
+from utils.column_summary import ColumnSummaries
+from utils.data_utils import dataframe_to_dict_list, sanitize_and_parse_dataset
+from utils.fingerprint import fingerprint_dataframe
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BUNDLE_SUFFIX = ".bundle"
+
+
+class DatasetBundle(NamedTuple):
+    """Everything stored about a dataset, as read from a bundle file (see BundleService)."""
+
+    dataset_id: str
+    filename: Optional[str]
+    fingerprints: List[str]
+    summary: Optional[ColumnSummaries]
+    records: List[Dict[str, Any]]
+    algorithm: Optional[str]
+    clusters: Dict[str, Dict[str, Dict[int, List[int]]]]
+    signatures: Optional[np.ndarray]  # MinHash signatures of the clusters, in iteration order
+    models: Dict[Tuple[str, str], Tuple[Dict[str, Any], bytes]]
+    shapley_values: Dict[str, List[Dict[str, Any]]]
+    entries: Dict[str, SharedEntry]  # shared store entries derived from the dataset
+
+
+class BundleService:
+    """
+    Export and import of a dataset with everything derived from it, as one file (see utils.bundle).
+
+    The rows are stored column by column, numeric columns as arrays and the others as codes into a
+    list of values. The clusters are stored as the arrays of their ClusterIndex, next to their MinHash
+    signatures and the packed models of the feature pairs; SHAP values and the column summary are part
+    of the header. The shared store entries of the dataset (decoded clusters, label vectors, models,
+    numeric matrix, heatmap pyramids, ...) are included, the ones every view needs are built if missing.
+    An import maps the file and writes these entries straight to the shared store, so the dataset is
+    served without decoding or recomputing anything.
+    """
+
+    @staticmethod
+    def write_bundle(
+        path: str | Path,
+        contents: Dict[str, Any],
+        records: List[Dict[str, Any]],
+        clusters: Dict[str, Dict[str, Dict[int, List[int]]]],
+        signatures: Dict[Tuple[str, str, int], Optional[bytes]],
+        models: Dict[Tuple[str, str], Tuple[Optional[Dict[str, Any]], Optional[bytes]]],
+        entries: Dict[str, SharedEntry],
+    ) -> int:
+        """
+        Write a dataset bundle.
+
+        Args:
+            contents: The dataset without rows and clusters, see db_service.get_dataset_contents
+            records, clusters, signatures, models: As stored, see the db_service getters
+            entries: Shared store entries of the dataset
+
+        Returns:
+            int: Size of the bundle in bytes
+        """
+        arrays: Dict[str, np.ndarray] = {}
+        df = pd.DataFrame(records)
+        columns = []
+        for i, col in enumerate(df.columns):
+            values = df[col]
+            if values.dtype.kind in "biuf":
+                arrays[f"column/{i}"] = values.to_numpy()
+                columns.append({"name": col})
+            else:
+                codes, uniques = pd.factorize(values, use_na_sentinel=True)
+                arrays[f"column/{i}"] = codes.astype(np.int32)
+                columns.append({"name": col, "values": uniques.tolist()})
+
+        entries = dict(entries)
+        index = ClusterIndex.from_clusters(clusters)
+        entries["clusters"] = index.to_entry()
+        if "labels" not in entries and index.pairs:
+            labels, counts = index.labels()
+            entries["labels"] = SharedEntry({}, {"labels": labels, "counts": counts})
+        fitted = {pair: ClusterModel.from_record(*record) for pair, record in models.items() if record[0]}
+        if "models" not in entries and fitted:
+            entries["models"] = ClusterModelSet.from_models(fitted).to_entry()
+        if "numeric" not in entries and len(df):
+            values, numeric_columns = ClusteringService.numeric_values(sanitize_and_parse_dataset(records))
+            entries["numeric"] = SharedEntry({"columns": numeric_columns}, {"values": values})
+        for name, entry in entries.items():
+            for key, array in entry.arrays.items():
+                arrays[f"entry/{name}/{key}"] = array
+
+        stored = [
+            signatures.get((feature1, feature2, int(cluster_id)))
+            for g, (feature1, feature2) in enumerate(index.pairs)
+            for cluster_id in index.cluster_ids[index.group_slice(g)]
+        ]
+        if stored and all(signature is not None for signature in stored):
+            arrays["signatures"] = np.stack([np.frombuffer(signature, dtype=np.uint32) for signature in stored])
+
+        model_states, model_offsets, model_arrays = [], [0], []
+        for pair in index.pairs:
+            state, packed = models.get(pair, (None, None))
+            model_states.append(state)
+            model_arrays.append(np.frombuffer(packed or b"", dtype=np.uint8))
+            model_offsets.append(model_offsets[-1] + len(model_arrays[-1]))
+        arrays["model_arrays"] = np.concatenate(model_arrays) if model_arrays else np.empty(0, dtype=np.uint8)
+        arrays["model_offsets"] = np.asarray(model_offsets, dtype=np.int64)
+
+        header = {
+            "dataset": {
+                "id": contents["id"],
+                "filename": contents["filename"],
+                "fingerprints": contents["fingerprints"],
+                "summary": contents["summary"],
+            },
+            "rows": len(df),
+            "columns": columns,
+            "algorithm": contents["algorithm"],
+            "model_states": model_states,
+            "shapley_values": contents["shapley_values"],
+            "entries": {name: {"meta": entry.meta, "arrays": list(entry.arrays)} for name, entry in entries.items()},
+        }
+        size = write_bundle(path, header, arrays)
+        logger.info(f"Wrote bundle of dataset {contents['id']} ({size} bytes) to {path}")
+        return size
+
+    @staticmethod
+    def read_bundle(path: str | Path) -> DatasetBundle:
+        """
+        Read a dataset bundle. The arrays stay mapped from the file, only the rows and clusters
+        the database stores as JSON are decoded.
+
+        Raises:
+            ValueError: If the file is not a valid bundle
+        """
+        header, arrays = read_bundle(path)
+        try:
+            dataset = header["dataset"]
+            # the ID and the entry names become paths of the shared store
+            dataset_id = check_name(dataset["id"])
+            df = pd.DataFrame(index=range(header["rows"]))
+            for i, column in enumerate(header["columns"]):
+                values = arrays[f"column/{i}"]
+                if "values" in column:
+                    # codes of -1 are missing values, they pick the None appended to the values
+                    values = np.array(column["values"] + [None], dtype=object)[values]
+                df[column["name"]] = values
+
+            entries = {
+                check_name(name): SharedEntry(
+                    entry["meta"], {check_name(key): arrays[f"entry/{name}/{key}"] for key in entry["arrays"]}
+                )
+                for name, entry in header["entries"].items()
+            }
+            # the digest keys cached results, it is computed from the clusters rather than taken from the file
+            entries["clusters"].meta.pop("digest", None)
+            index = ClusterIndex.from_entry(entries["clusters"])
+            entries["clusters"] = index.to_entry()
+            clusters: Dict[str, Dict[str, Dict[int, List[int]]]] = {}
+            models = {}
+            model_offsets = arrays["model_offsets"]
+            for g, (feature1, feature2) in enumerate(index.pairs):
+                pair_clusters = clusters.setdefault(feature1, {}).setdefault(feature2, {})
+                group = index.group_slice(g)
+                for k in range(group.start, group.stop):
+                    points = index.indices[index.offsets[k] : index.offsets[k + 1]]
+                    pair_clusters[int(index.cluster_ids[k])] = points.tolist()
+                if header["model_states"][g]:
+                    packed = arrays["model_arrays"][model_offsets[g] : model_offsets[g + 1]].tobytes()
+                    models[(feature1, feature2)] = (header["model_states"][g], packed)
+            records = dataframe_to_dict_list(df)
+            return DatasetBundle(
+                dataset_id=dataset_id,
+                filename=dataset["filename"],
+                # the fingerprint an upload of the rows gets, a file cannot claim to hold other content
+                fingerprints=[fingerprint_dataframe(sanitize_and_parse_dataset(records))],
+                summary=dataset["summary"],
+                records=records,
+                algorithm=header["algorithm"],
+                clusters=clusters,
+                signatures=arrays.get("signatures"),
+                models=models,
+                shapley_values=header["shapley_values"],
+                entries=entries,
+            )
+        except KeyError as e:
+            raise ValueError(f"Bundle is incomplete, {str(e)} is missing")
+        except (AttributeError, IndexError, TypeError) as e:
+            raise ValueError(f"Bundle is malformed: {str(e)}")
+
+    @staticmethod
+    def seed_shared_store(store: SharedArrayStore, dataset_id: str, entries: Dict[str, SharedEntry]) -> None:
+        """Publish the shared store entries of an imported dataset, replacing any left from an earlier copy."""
+        store.invalidate(dataset_id)
+        for name, entry in entries.items():
+            store.put(dataset_id, name, dict(entry.arrays), entry.meta)
@@ -0,0 +1,175 @@
+import hashlib
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.shared_store import SharedEntry
+from utils.data_utils import canonical_pair
+from utils.minhash import minhash_signatures_of
+
+
+class ClusterIndex:
+    """
+    The clusters of all feature pairs of a dataset as flat arrays.
+
+    Cluster k holds the data point indices `indices[offsets[k]:offsets[k + 1]]` and has the id
+    `cluster_ids[k]`; the clusters of pair g are `group_offsets[g]` to `group_offsets[g + 1]`.
+    The arrays can be stored in the shared store and memory-mapped by every worker, and Jaccard
+    similarities against all clusters are computed with a few vectorized operations. The digest
+    identifies the clusters in the cache keys of results derived from them.
+    """
+
+    def __init__(
+        self,
+        pairs: List[Tuple[str, str]],
+        group_offsets: np.ndarray,
+        cluster_ids: np.ndarray,
+        offsets: np.ndarray,
+        indices: np.ndarray,
+        digest: Optional[str] = None,
+    ) -> None:
+        self.pairs = pairs
+        self.group_offsets = group_offsets
+        self.cluster_ids = cluster_ids
+        self.offsets = offsets
+        self.indices = indices
+        self.n_points = int(indices.max()) + 1 if len(indices) else 0
+        self._groups = {pair: g for g, pair in enumerate(pairs)}
+        self._digest = digest
+
+    @classmethod
+    def from_clusters(cls, clusters: Dict[str, Dict[str, Dict[int, List[int]]]]) -> "ClusterIndex":
+        """Build the index from clusters keyed feature1 -> feature2 -> cluster id -> point indices."""
+        pairs, group_sizes, cluster_ids, sizes, points = [], [], [], [], []
+        for feature1, feature_pairs in clusters.items():
+            for feature2, pair_clusters in feature_pairs.items():
+                pairs.append(canonical_pair(feature1, feature2))
+                group_sizes.append(len(pair_clusters))
+                for cluster_id, cluster_points in pair_clusters.items():
+                    cluster_ids.append(int(cluster_id))
+                    sizes.append(len(cluster_points))
+                    points.append(np.asarray(cluster_points, dtype=np.int64))
+        return cls(
+            pairs,
+            np.concatenate([[0], np.cumsum(group_sizes, dtype=np.int64)]),
+            np.asarray(cluster_ids, dtype=np.int64),
+            np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)]),
+            np.concatenate(points) if points else np.empty(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_entry(cls, entry: SharedEntry) -> "ClusterIndex":
+        arrays = entry.arrays
+        return cls(
+            [tuple(pair) for pair in entry.meta["pairs"]],
+            arrays["group_offsets"],
+            arrays["cluster_ids"],
+            arrays["offsets"],
+            arrays["indices"],
+            entry.meta.get("digest"),  # entries of bundles exported before digests have none
+        )
+
+    def to_entry(self) -> SharedEntry:
+        arrays = {
+            "group_offsets": self.group_offsets,
+            "cluster_ids": self.cluster_ids,
+            "offsets": self.offsets,
+            "indices": self.indices,
+        }
+        return SharedEntry({"pairs": [list(pair) for pair in self.pairs], "digest": self.digest}, arrays)
+
+    @property
+    def digest(self) -> str:
+        """Digest of the pairs and their clusters, computed once when the index is built."""
+        if self._digest is None:
+            digest = hashlib.blake2b(json.dumps(self.pairs).encode(), digest_size=16)
+            for array in (self.group_offsets, self.cluster_ids, self.offsets, self.indices):
+                digest.update(np.ascontiguousarray(array, dtype=np.int64))
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    def group(self, feature1: str, feature2: str) -> Optional[int]:
+        """Position of a feature pair (in either order), None if it has no clusters."""
+        return self._groups.get(canonical_pair(feature1, feature2))
+
+    def group_slice(self, group: int) -> slice:
+        return slice(int(self.group_offsets[group]), int(self.group_offsets[group + 1]))
+
+    def cluster_groups(self) -> np.ndarray:
+        """Feature pair position of each cluster."""
+        return np.repeat(np.arange(len(self.pairs)), np.diff(self.group_offsets))
+
+    def labels(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Label vector of every feature pair: the position of each point's cluster within the pair,
+        and one extra label for points in none of its clusters.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: labels of shape (pairs, points) and the number of labels per pair
+        """
+        counts = np.diff(self.group_offsets) + 1
+        dtype = np.int16 if not len(counts) or counts.max() <= np.iinfo(np.int16).max else np.int32
+        labels = np.repeat((counts - 1).astype(dtype)[:, None], self.n_points, axis=1)
+        sizes = np.diff(self.offsets)
+        groups = self.cluster_groups()
+        local_positions = np.arange(len(self.cluster_ids)) - self.group_offsets[groups]
+        labels[np.repeat(groups, sizes), self.indices] = np.repeat(local_positions, sizes)
+        return labels, counts
+
+    def position(self, feature1: str, feature2: str, cluster_id: int) -> Optional[int]:
+        """Position k of a cluster, None if the pair or the cluster does not exist."""
+        group = self.group(feature1, feature2)
+        if group is None:
+            return None
+        clusters = self.group_slice(group)
+        positions = np.flatnonzero(self.cluster_ids[clusters] == cluster_id)
+        if not len(positions):
+            return None
+        return clusters.start + int(positions[0])
+
+    def points(self, feature1: str, feature2: str, cluster_id: int) -> Optional[np.ndarray]:
+        """Point indices of a cluster, None if the pair or the cluster does not exist."""
+        k = self.position(feature1, feature2, cluster_id)
+        if k is None:
+            return None
+        return self.indices[self.offsets[k] : self.offsets[k + 1]]
+
+    def signatures(self, stored: Dict[Tuple[str, str, int], Optional[bytes]], num_perm: int, seed: int) -> np.ndarray:
+        """
+        MinHash signatures of all clusters, in cluster order. Stored signatures (keyed by feature1,
+        feature2, cluster id) are used where they match num_perm, the others are computed.
+        """
+        signatures = np.empty((len(self.cluster_ids), num_perm), dtype=np.uint32)
+        missing = []
+        for group, (feature1, feature2) in enumerate(self.pairs):
+            clusters = self.group_slice(group)
+            for k in range(clusters.start, clusters.stop):
+                signature = stored.get((feature1, feature2, int(self.cluster_ids[k])))
+                if signature is not None and len(signature) == num_perm * 4:
+                    signatures[k] = np.frombuffer(signature, dtype=np.uint32)
+                else:
+                    missing.append(k)
+        if missing:
+            sets = [self.indices[self.offsets[k] : self.offsets[k + 1]] for k in missing]
+            signatures[missing] = minhash_signatures_of(sets, num_perm, seed)
+        return signatures
+
+    def jaccard(self, points: np.ndarray, clusters: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Jaccard index of a set of point indices with every cluster (or the given clusters), in cluster order."""
+        selected = np.zeros(max(self.n_points, int(points.max()) + 1 if len(points) else 0), dtype=bool)
+        selected[points] = True
+        if clusters is not None:
+            n_selected = int(selected.sum())
+            similarities = np.zeros(len(clusters), dtype=np.float64)
+            for i, k in enumerate(clusters):
+                cluster_points = self.indices[self.offsets[k] : self.offsets[k + 1]]
+                intersection = int(selected[cluster_points].sum())
+                union = n_selected + len(cluster_points) - intersection
+                similarities[i] = intersection / union if union > 0 else 0.0
+            return similarities
+
+        hits = np.concatenate([[0], np.cumsum(selected[self.indices], dtype=np.int64)])
+        intersection = hits[self.offsets[1:]] - hits[self.offsets[:-1]]
+        union = int(selected.sum()) + np.diff(self.offsets) - intersection
+        return np.divide(intersection, union, out=np.zeros(len(union), dtype=np.float64), where=union > 0)
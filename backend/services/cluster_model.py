@@ -0,0 +1,324 @@
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+
+from core.config import CONFIG
+from models.clustering import DBScanParams, KMeansParams
+from services.shared_store import SharedEntry
+from utils.lazy_import import lazy_import
+
+# imported on first use, see utils.lazy_import
+sklearn_cluster = lazy_import("sklearn.cluster")
+spatial = lazy_import("scipy.spatial")
+
+NOISE = -1  # DBSCAN label of points in no cluster
+
+
+def _compact_floats(values: np.ndarray) -> np.ndarray:
+    as_float32 = values.astype(np.float32)
+    return as_float32 if np.array_equal(as_float32, values) else values.astype(np.float64)
+
+
+def _compact_ints(values: np.ndarray) -> np.ndarray:
+    fits = not len(values) or (values.min() >= np.iinfo(np.int16).min and values.max() <= np.iinfo(np.int16).max)
+    return values.astype(np.int16 if fits else np.int64)
+
+
+def _pack(arrays: Dict[str, np.ndarray]) -> Tuple[Dict[str, List[Any]], bytes]:
+    """Concatenate the raw bytes of the arrays, the layout lists the dtype and shape of each array in order."""
+    layout = {name: [array.dtype.str, list(array.shape)] for name, array in arrays.items()}
+    return layout, b"".join(np.ascontiguousarray(array).tobytes() for array in arrays.values())
+
+
+def _unpack(layout: Dict[str, List[Any]], packed: bytes) -> Dict[str, np.ndarray]:
+    arrays, offset = {}, 0
+    for name, (dtype, shape) in layout.items():
+        dtype, count = np.dtype(dtype), int(np.prod(shape))
+        arrays[name] = np.frombuffer(packed, dtype=dtype, count=count, offset=offset).reshape(shape)
+        offset += count * dtype.itemsize
+    return arrays
+
+
+def nearest_centroids(
+    x: np.ndarray, y: np.ndarray, centroid_x: np.ndarray, centroid_y: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nearest centroid of each point and the squared distance to it. Point coordinates (...) are compared
+    with centroid coordinates (..., k) of broadcastable leading shape; padding centroids at infinity
+    are never nearest.
+    """
+    dx = x[..., None] - centroid_x
+    dy = y[..., None] - centroid_y
+    squared = dx * dx
+    squared += dy * dy
+    nearest = squared.argmin(axis=-1)
+    return nearest, np.take_along_axis(squared, nearest[..., None], axis=-1)[..., 0]
+
+
+class ClusterModel:
+    """
+    What is needed to assign new points of a feature pair to its existing clusters.
+
+    k-means keeps its centroids: a point belongs to the nearest one, and is an outlier if it is
+    farther from it than CONFIG.CLUSTERING_OUTLIER_QUANTILE of the centroid's fitted points.
+    DBSCAN keeps its core points: a point belongs to the cluster of the nearest core point within
+    eps, and is noise (an outlier) otherwise. New points never become core points themselves, so
+    clusters they would grow or merge are only found by a refit.
+
+    The drift of a model is the outlier rate of the points assigned since it was fitted, minus
+    the outlier rate of the fitted points.
+    """
+
+    def __init__(
+        self,
+        algorithm: Literal["kmeans", "dbscan"],
+        params: Dict[str, Any],
+        centers: np.ndarray,
+        center_labels: np.ndarray,
+        radii: Optional[np.ndarray],
+        outlier_rate: float,
+        fitted_rows: int,
+        assigned_rows: int = 0,
+        assigned_outliers: int = 0,
+    ) -> None:
+        self.algorithm = algorithm
+        self.params = params
+        self.centers = centers  # centroids (k-means) or core points (DBSCAN)
+        self.center_labels = center_labels
+        self.radii = radii  # outlier distance of each centroid (k-means only)
+        self.outlier_rate = outlier_rate
+        self.fitted_rows = fitted_rows
+        self.assigned_rows = assigned_rows
+        self.assigned_outliers = assigned_outliers
+
+    @classmethod
+    def fit(
+        cls, algorithm: Literal["kmeans", "dbscan"], params: KMeansParams | DBScanParams, data: np.ndarray
+    ) -> Tuple["ClusterModel", np.ndarray]:
+        """Cluster the points of a feature pair, returns the model and the label of every point."""
+        if algorithm == "kmeans":
+            kmeans = sklearn_cluster.KMeans(n_clusters=params.k, max_iter=params.max_iterations, n_init="auto")
+            labels = kmeans.fit_predict(data)
+            centers = kmeans.cluster_centers_
+            distances = np.linalg.norm(data - centers[labels], axis=1)
+            radii = np.zeros(len(centers))
+            for label in np.unique(labels):
+                radii[label] = np.quantile(distances[labels == label], CONFIG.CLUSTERING_OUTLIER_QUANTILE)
+            outliers = int((distances > radii[labels]).sum())
+            center_labels = np.arange(len(centers))
+        elif algorithm == "dbscan":
+            dbscan = sklearn_cluster.DBSCAN(eps=params.eps, min_samples=params.min_samples)
+            labels = dbscan.fit_predict(data)
+            centers = data[dbscan.core_sample_indices_]
+            center_labels = labels[dbscan.core_sample_indices_]
+            radii = None
+            outliers = int((labels == NOISE).sum())
+        else:
+            raise ValueError(f"Unknown clustering algorithm: {algorithm}")
+
+        outlier_rate = outliers / max(len(data), 1)
+        return cls(algorithm, params.model_dump(), centers, center_labels, radii, outlier_rate, len(data)), labels
+
+    @classmethod
+    def from_record(cls, state: Dict[str, Any], arrays: Optional[bytes]) -> "ClusterModel":
+        """Model from its stored state and packed arrays, see `to_record`."""
+        if arrays is None:
+            unpacked = state  # arrays stored in the JSON state before they were packed
+        else:
+            unpacked = _unpack(state["arrays"], arrays)
+        radii = unpacked.get("radii")
+        return cls(
+            state["algorithm"],
+            state["params"],
+            np.asarray(unpacked["centers"], dtype=np.float64).reshape(-1, 2),
+            np.asarray(unpacked["center_labels"], dtype=np.int64),
+            np.asarray(radii, dtype=np.float64) if radii is not None else None,
+            state["outlier_rate"],
+            state["fitted_rows"],
+            state.get("assigned_rows", 0),
+            state.get("assigned_outliers", 0),
+        )
+
+    def to_record(self) -> Tuple[Dict[str, Any], bytes]:
+        """
+        JSON serializable state and the arrays packed into bytes, stored with the cluster group.
+
+        Duplicate DBSCAN core points are stored once, and core points and labels in the smallest
+        dtype that holds them exactly (sanitized data is float32 where that is lossless).
+        """
+        centers, center_labels = self.centers, self.center_labels
+        if self.algorithm == "dbscan" and len(centers):
+            centers, first = np.unique(centers, axis=0, return_index=True)
+            center_labels = center_labels[first]
+        arrays = {"centers": _compact_floats(centers), "center_labels": _compact_ints(center_labels)}
+        if self.radii is not None:
+            arrays["radii"] = self.radii
+        layout, packed = _pack(arrays)
+        state = {
+            "algorithm": self.algorithm,
+            "params": self.params,
+            "outlier_rate": self.outlier_rate,
+            "fitted_rows": self.fitted_rows,
+            "assigned_rows": self.assigned_rows,
+            "assigned_outliers": self.assigned_outliers,
+            "arrays": layout,
+        }
+        return state, packed
+
+    def parameters(self) -> KMeansParams | DBScanParams:
+        return KMeansParams(**self.params) if self.algorithm == "kmeans" else DBScanParams(**self.params)
+
+    def assign(self, data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Labels of new points and which of them are outliers, see the class docstring."""
+        if not len(data):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+        if self.algorithm == "kmeans":
+            centers = self.centers
+            nearest, squared_distances = nearest_centroids(data[:, 0], data[:, 1], centers[:, 0], centers[:, 1])
+            return self.center_labels[nearest], squared_distances > self.radii[nearest] ** 2
+
+        if not len(self.centers):
+            return np.full(len(data), NOISE, dtype=np.int64), np.ones(len(data), dtype=bool)
+        distances, nearest = spatial.cKDTree(self.centers).query(data)
+        outliers = distances > self.params["eps"]
+        return np.where(outliers, NOISE, self.center_labels[nearest]), outliers
+
+    def record_assigned(self, outliers: np.ndarray) -> None:
+        self.assigned_rows += len(outliers)
+        self.assigned_outliers += int(outliers.sum())
+
+    @property
+    def drift(self) -> float:
+        if not self.assigned_rows:
+            return 0.0
+        return self.assigned_outliers / self.assigned_rows - self.outlier_rate
+
+    def needs_refit(self) -> bool:
+        return self.assigned_rows >= CONFIG.CLUSTERING_DRIFT_MIN_ROWS and self.drift > CONFIG.CLUSTERING_DRIFT_THRESHOLD
+
+
+class ClusterModelSet:
+    """
+    The models of all clustered feature pairs of a dataset as flat arrays, to label new rows for
+    every pair at once. The arrays can be stored in the shared store and memory-mapped by every worker.
+
+    k-means centroids are padded to the largest k, so the nearest centroids of all k-means pairs are
+    one broadcast computation over row blocks. DBSCAN core points are concatenated per pair; each pair
+    gets a KD-tree when it is first queried, kept for later requests.
+    """
+
+    def __init__(
+        self, pairs: List[Tuple[str, str]], arrays: Dict[str, np.ndarray], entry: Optional[SharedEntry] = None
+    ) -> None:
+        self.pairs = pairs
+        self.features = sorted({feature for pair in pairs for feature in pair})
+        self.arrays = arrays
+        self.entry = entry  # shared store entry the arrays are mapped from
+        self._trees: Dict[int, Any] = {}
+
+    @classmethod
+    def from_models(cls, models: Dict[Tuple[str, str], ClusterModel]) -> "ClusterModelSet":
+        pairs = list(models)
+        kmeans = [p for p, pair in enumerate(pairs) if models[pair].algorithm == "kmeans"]
+        dbscan = [p for p, pair in enumerate(pairs) if models[pair].algorithm == "dbscan"]
+
+        max_k = max((len(models[pairs[p]].centers) for p in kmeans), default=0)
+        centroids = np.full((len(kmeans), max_k, 2), np.inf)
+        radii = np.zeros((len(kmeans), max_k))
+        for slot, p in enumerate(kmeans):
+            model = models[pairs[p]]
+            centroids[slot, : len(model.centers)] = model.centers
+            radii[slot, : len(model.centers)] = model.radii
+
+        core_models = [models[pairs[p]] for p in dbscan]
+        sizes = [len(model.centers) for model in core_models]
+        arrays = {
+            "kmeans_pairs": np.asarray(kmeans, dtype=np.int64),
+            "centroids": centroids,
+            "radii": radii,
+            "dbscan_pairs": np.asarray(dbscan, dtype=np.int64),
+            "eps": np.asarray([model.params["eps"] for model in core_models], dtype=np.float64),
+            "core_offsets": np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)]),
+            "core_points": np.concatenate([model.centers for model in core_models] or [np.empty((0, 2))]),
+            "core_labels": np.concatenate([model.center_labels for model in core_models] or [np.empty(0, np.int64)]),
+        }
+        return cls(pairs, arrays)
+
+    @classmethod
+    def from_entry(cls, entry: SharedEntry) -> "ClusterModelSet":
+        return cls([tuple(pair) for pair in entry.meta["pairs"]], entry.arrays, entry)
+
+    def to_entry(self) -> SharedEntry:
+        return SharedEntry({"pairs": [list(pair) for pair in self.pairs]}, self.arrays)
+
+    def _core_tree(self, slot: int) -> Any:
+        tree = self._trees.get(slot)
+        if tree is None:
+            offsets = self.arrays["core_offsets"]
+            tree = spatial.cKDTree(self.arrays["core_points"][offsets[slot] : offsets[slot + 1]])
+            self._trees[slot] = tree
+        return tree
+
+    def predict(
+        self, data: np.ndarray, pairs: Optional[List[int]] = None, n_jobs: int = 1
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Label rows for the given pairs (positions in `pairs`, default all) without refitting, see ClusterModel.assign.
+
+        Args:
+            data: rows x `features` matrix, NaN where a row has no value
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: labels, outliers and missing (a row lacks a value
+            of the pair, its label is meaningless), each of shape (pairs, rows)
+        """
+        pairs = list(range(len(self.pairs))) if pairs is None else pairs
+        positions = {feature: j for j, feature in enumerate(self.features)}
+        n_rows = len(data)
+        labels = np.full((len(pairs), n_rows), NOISE, dtype=np.int64)
+        outliers = np.zeros((len(pairs), n_rows), dtype=bool)
+        missing = np.zeros((len(pairs), n_rows), dtype=bool)
+        rows_of = {p: i for i, p in enumerate(pairs)}
+
+        columns = data.T
+        for algorithm in ("kmeans", "dbscan"):
+            slots = [slot for slot, p in enumerate(self.arrays[f"{algorithm}_pairs"]) if int(p) in rows_of]
+            if not slots or not n_rows:
+                continue
+            selected = self.arrays[f"{algorithm}_pairs"][slots]
+            out = np.asarray([rows_of[int(p)] for p in selected], dtype=np.int64)
+            # coordinates of the rows for each selected pair, pairs x rows
+            x = columns[[positions[self.pairs[p][0]] for p in selected]]
+            y = columns[[positions[self.pairs[p][1]] for p in selected]]
+            valid = ~(np.isnan(x) | np.isnan(y))
+            missing[out] = ~valid
+
+            if algorithm == "kmeans":
+                centroids = self.arrays["centroids"][slots]
+                centroid_x, centroid_y = (np.ascontiguousarray(centroids[:, None, :, axis]) for axis in (0, 1))
+                squared_radii = self.arrays["radii"][slots] ** 2
+                x, y = np.nan_to_num(x), np.nan_to_num(y)
+                pair_labels = np.empty(x.shape, dtype=np.int64)
+                pair_outliers = np.empty(x.shape, dtype=bool)
+                chunk = max(1, CONFIG.CLUSTER_PREDICT_CHUNK_ELEMENTS // max(1, squared_radii.size))
+                for start in range(0, n_rows, chunk):
+                    block = slice(start, start + chunk)
+                    nearest, squared_distances = nearest_centroids(x[:, block], y[:, block], centroid_x, centroid_y)
+                    pair_labels[:, block] = nearest
+                    pair_outliers[:, block] = squared_distances > np.take_along_axis(squared_radii, nearest, axis=1)
+                labels[out], outliers[out] = pair_labels, pair_outliers
+                continue
+
+            offsets, core_labels = self.arrays["core_offsets"], self.arrays["core_labels"]
+            for slot, row, slot_x, slot_y, slot_valid in zip(slots, out, x, y, valid):
+                slot_labels = core_labels[offsets[slot] : offsets[slot + 1]]
+                outliers[row, slot_valid] = True
+                if not len(slot_labels) or not slot_valid.any():
+                    continue
+                points = np.column_stack([slot_x[slot_valid], slot_y[slot_valid]])
+                distances, nearest = self._core_tree(slot).query(points, workers=n_jobs)
+                is_outlier = distances > self.arrays["eps"][slot]
+                labels[row, slot_valid] = np.where(is_outlier, NOISE, slot_labels[nearest])
+                outliers[row, slot_valid] = is_outlier
+
+        return labels, outliers, missing
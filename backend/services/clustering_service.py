@@ -1,28 +1,233 @@
-from typing import Any, Dict, List, Literal, Union
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Literal, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
-from scipy.cluster.hierarchy import leaves_list, linkage, optimal_leaf_ordering
-from scipy.spatial.distance import squareform
-from sklearn.cluster import DBSCAN, KMeans
 
+from core.config import CONFIG
+from core.resources import governor
 from models.clustering import DBScanParams, KMeansParams
+from services.cluster_index import ClusterIndex
+from services.cluster_model import ClusterModel
+from utils.cache import ResultCache, make_cache_key
+from utils.data_utils import canonical_pair, get_numeric_columns
+from utils.lazy_import import lazy_import
 from utils.logger import get_logger
+from utils.minhash import estimate_error, estimate_jaccard, permutations_for_error
+from utils.pair_view import density_sample, density_tiles, grid_cells
+
+# imported on first use, see utils.lazy_import
+distance = lazy_import("scipy.spatial.distance")
+hierarchy = lazy_import("scipy.cluster.hierarchy")
 
 logger = get_logger(__name__)
 
+PARTITION_METRICS = ("ari", "nmi", "max_jaccard")
+
+# partition similarity matrices, keyed by (dataset id, feature pairs)
+partition_similarity_cache = ResultCache(
+    "partition_similarity",
+    CONFIG.PARTITION_SIMILARITY_CACHE_MEMORY_ENTRIES,
+    CONFIG.PARTITION_SIMILARITY_CACHE_MAX_DISK_BYTES,
+)
+
+# downsampled scatter views of feature pairs, keyed by (dataset id, pair, mode, resolution, sample size)
+pair_view_cache = ResultCache(
+    "pair_view",
+    CONFIG.PAIR_VIEW_CACHE_MEMORY_ENTRIES,
+    CONFIG.PAIR_VIEW_CACHE_MAX_DISK_BYTES,
+)
+
+# label vectors of a process pool worker, see ClusteringService.compute_partition_similarity_matrix
+_worker_labels: Optional[np.ndarray] = None
+
+
+def _init_partition_worker(labels_path: str) -> None:
+    global _worker_labels
+    _worker_labels = np.load(labels_path, mmap_mode="r")
+
+
+def _partition_scores(contingency: np.ndarray) -> Tuple[float, float, float]:
+    """Adjusted Rand index, normalized mutual information (arithmetic mean) and mean best-match Jaccard index."""
+    n = contingency.sum()
+    rows = contingency.sum(axis=1)
+    columns = contingency.sum(axis=0)
+
+    sum_pairs = (contingency * (contingency - 1)).sum() / 2
+    row_pairs = (rows * (rows - 1)).sum() / 2
+    column_pairs = (columns * (columns - 1)).sum() / 2
+    expected = row_pairs * column_pairs / (n * (n - 1) / 2) if n > 1 else 0.0
+    maximum = (row_pairs + column_pairs) / 2
+    ari = (sum_pairs - expected) / (maximum - expected) if maximum != expected else 1.0
+
+    nonzero = contingency > 0
+    joint = contingency[nonzero] / n
+    outer = np.outer(rows, columns)[nonzero] / n**2
+    mutual_information = float((joint * np.log(joint / outer)).sum())
+    row_entropy = -float(np.sum(rows[rows > 0] / n * np.log(rows[rows > 0] / n)))
+    column_entropy = -float(np.sum(columns[columns > 0] / n * np.log(columns[columns > 0] / n)))
+    mean_entropy = (row_entropy + column_entropy) / 2
+    nmi = mutual_information / mean_entropy if mean_entropy > 0 else 1.0
+
+    union = rows[:, None] + columns[None, :] - contingency
+    jaccard = np.divide(contingency, union, out=np.zeros(contingency.shape), where=union > 0)
+    best_row_match = jaccard.max(axis=1)[rows > 0].mean()
+    best_column_match = jaccard.max(axis=0)[columns > 0].mean()
+    return float(ari), float(min(max(nmi, 0.0), 1.0)), float((best_row_match + best_column_match) / 2)
+
+
+def _partition_block(
+    i: int, others: np.ndarray, counts: np.ndarray, labels: Optional[np.ndarray] = None
+) -> Tuple[int, np.ndarray, np.ndarray]:
+    """
+    Scores of partition i against the partitions `others`. All contingency tables of the block come
+    from one np.bincount over combined labels: table t occupies bins offsets[t] to offsets[t + 1].
+    """
+    labels = _worker_labels if labels is None else labels
+    other_counts = counts[others]
+    offsets = np.concatenate([[0], np.cumsum(counts[i] * other_counts)])
+    combined = labels[i].astype(np.int64)[None, :] * other_counts[:, None] + labels[others] + offsets[:-1, None]
+    tables = np.bincount(combined.ravel(), minlength=offsets[-1])
+    scores = np.array(
+        [
+            _partition_scores(tables[offsets[t] : offsets[t + 1]].reshape(counts[i], other_counts[t]))
+            for t in range(len(others))
+        ]
+    )
+    return i, others, scores
+
+
+def _numeric_matrix(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """The columns as a float64 matrix, values that are not numeric replaced by the column mean (0 if there is none)."""
+    missing_columns = [col for col in columns if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Columns not found in dataset: {missing_columns}")
+
+    df_numeric = df[columns].apply(pd.to_numeric, errors="coerce")
+
+    # Handle any remaining NaN values by replacing with column means
+    for col in df_numeric.columns:
+        if df_numeric[col].isna().any():
+            mean_val = df_numeric[col].mean()
+            if pd.isna(mean_val):  # All values are NaN
+                df_numeric[col] = df_numeric[col].fillna(0)
+            else:
+                df_numeric[col] = df_numeric[col].fillna(mean_val)
+
+    return df_numeric.values.astype(np.float64)
+
+
+def _group_labels(labels: np.ndarray, offset: int = 0) -> Dict[int, List[int]]:
+    """Point indices (plus offset) of each label, labels in order of first occurrence."""
+    cluster_groups: Dict[int, List[int]] = {}
+    for idx, cluster in enumerate(labels.tolist()):
+        cluster_groups.setdefault(cluster, []).append(idx + offset)
+    return cluster_groups
+
+
+class AppendedPair(NamedTuple):
+    clusters: Dict[int, List[int]]
+    model: ClusterModel
+    drift: float
+    refit: bool
+
+
+class FeaturePairPlan(NamedTuple):
+    order: List[Tuple[int, int]]  # column positions of the pairs to cluster, in priority order
+    aliases: Dict[Tuple[int, int], Tuple[int, int]]  # pair -> equivalent pair whose result it shares
+    skipped: List[Tuple[int, int]]
+
 
 class ClusteringService:
+    @staticmethod
+    def plan_feature_pairs(
+        dataset: np.ndarray, columns: List[str], priority_features: Optional[List[str]] = None
+    ) -> FeaturePairPlan:
+        """
+        Decide which feature pairs to cluster, and in which order, from cheap column statistics.
+
+        One sweep over the data finds constant columns (range 0), identical columns (by hash of
+        their values, then compared) and the correlations of all columns. Pairs of two constant
+        columns are skipped. Pairs that are equivalent for clustering, because they differ only by
+        an identical column or by which constant column they use, are aliased to the first such
+        pair. The remaining pairs are ordered: both features in priority_features, one of them,
+        the others, and last near-perfectly correlated pairs (skipped with
+        CONFIG.CLUSTERING_SKIP_CORRELATED_PAIRS), whose points lie on a line.
+        """
+        n_columns = len(columns)
+        constant = np.ptp(dataset, axis=0) == 0 if len(dataset) else np.ones(n_columns, dtype=bool)
+
+        # representative of each column: the first identical column, all constant columns are equivalent
+        representative = list(range(n_columns))
+        first_by_hash: Dict[bytes, int] = {}
+        constant_columns = np.flatnonzero(constant)
+        for j in range(n_columns):
+            if constant[j]:
+                representative[j] = int(constant_columns[0])
+                continue
+            digest = hashlib.blake2b(np.ascontiguousarray(dataset[:, j]).tobytes(), digest_size=16).digest()
+            first = first_by_hash.setdefault(digest, j)
+            if first != j and np.array_equal(dataset[:, first], dataset[:, j]):
+                representative[j] = first
+
+        std = dataset.std(axis=0)
+        scaled = (dataset - dataset.mean(axis=0)) / np.where(constant, 1.0, std)
+        correlation = np.abs(scaled.T @ scaled) / max(len(dataset), 1)
+
+        priority = set(priority_features or [])
+        computed, aliases, skipped = [], {}, []
+        equivalent: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for i in range(n_columns):
+            for j in range(i + 1, n_columns):
+                if constant[i] and constant[j]:
+                    skipped.append((i, j))
+                    continue
+                key = tuple(sorted((representative[i], representative[j])))
+                if key in equivalent:
+                    aliases[(i, j)] = equivalent[key]
+                    continue
+                equivalent[key] = (i, j)
+
+                correlated = not constant[i] and not constant[j]
+                correlated = correlated and correlation[i, j] >= CONFIG.CLUSTERING_CORRELATION_THRESHOLD
+                if correlated and CONFIG.CLUSTERING_SKIP_CORRELATED_PAIRS:
+                    skipped.append((i, j))
+                    continue
+                tier = 3 if correlated else 2 - (columns[i] in priority) - (columns[j] in priority)
+                computed.append((tier, (i, j)))
+
+        # aliases of skipped pairs are skipped too
+        skipped_pairs = set(skipped)
+        for pair, source in list(aliases.items()):
+            if source in skipped_pairs:
+                skipped.append(pair)
+                del aliases[pair]
+
+        order = [pair for _, pair in sorted(computed, key=lambda item: item[0])]
+        logger.info(
+            f"Feature pair plan: {len(order)} to cluster, {len(aliases)} aliased, {len(skipped)} skipped "
+            f"({int(constant.sum())} constant columns, {n_columns - len(set(representative))} duplicate columns)"
+        )
+        return FeaturePairPlan(order, aliases, skipped)
+
     @staticmethod
     def compute_feature_pairs_clusters(
-        data: List[Dict[str, Union[float, str, None]]],
+        data: List[Dict[str, Union[float, str, None]]] | pd.DataFrame,
         columns: List[str],
         algorithm: Literal["kmeans", "dbscan"],
         params: KMeansParams | DBScanParams,
+        priority_features: Optional[List[str]] = None,
+        on_result: Optional[Callable[[str, str, Dict[int, List[int]], ClusterModel], None]] = None,
     ) -> Dict[str, Dict[str, Dict[int, List[int]]]]:
         """
         Compute clusters for each feature pair.
         Uses pandas DataFrame for more robust data handling.
+
+        Pairs are clustered in the order of `plan_feature_pairs`, pairs with priority_features first,
+        and `on_result(feature1, feature2, clusters, model)` is called as each pair is done. The results
+        are returned in column order.
         """
         logger.info(f"Computing clusters for {len(data)} data points with {len(columns)} columns")
 
@@ -31,111 +236,194 @@ class ClusteringService:
         else:
             df = data
 
-        missing_columns = [col for col in columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Columns not found in dataset: {missing_columns}")
-
-        df_numeric = df[columns].apply(pd.to_numeric, errors="coerce")
-
-        # Handle any remaining NaN values by replacing with column means
-        for col in df_numeric.columns:
-            if df_numeric[col].isna().any():
-                mean_val = df_numeric[col].mean()
-                if pd.isna(mean_val):  # All values are NaN
-                    df_numeric[col] = df_numeric[col].fillna(0)
-                else:
-                    df_numeric[col] = df_numeric[col].fillna(mean_val)
-
-        # Get numpy array for clustering
-        dataset = df_numeric.values
+        dataset = _numeric_matrix(df, columns)
+
+        plan = ClusteringService.plan_feature_pairs(dataset, columns, priority_features)
+        aliases_by_source: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for pair, source in plan.aliases.items():
+            aliases_by_source.setdefault(source, []).append(pair)
+
+        pair_clusters: Dict[Tuple[int, int], Dict[int, List[int]]] = {}
+        for i, j in plan.order:
+            col1, col2 = columns[i], columns[j]
+            feature_pair_data = dataset[:, [i, j]]
+
+            # Skip if data contains NaN: Sanity check only - this should not happen due to our preprocessing
+            if np.isnan(feature_pair_data).any():
+                logger.warning(f"Skipping {col1} and {col2} due to NaN values")
+                continue
+
+            try:
+                model, labels = ClusterModel.fit(algorithm, params, feature_pair_data)
+                cluster_groups = _group_labels(labels)
+            except Exception as e:
+                logger.error(f"Error clustering {col1} and {col2}: {str(e)}")
+                # Continue with other feature pairs instead of failing completely
+                continue
+
+            # equivalent pairs share the result
+            for pair in [(i, j)] + aliases_by_source.get((i, j), []):
+                pair_clusters[pair] = cluster_groups
+                if on_result:
+                    on_result(*canonical_pair(columns[pair[0]], columns[pair[1]]), cluster_groups, model)
 
         results = {}
+        for i, j in sorted(pair_clusters):
+            feature1, feature2 = canonical_pair(columns[i], columns[j])
+            results.setdefault(feature1, {})[feature2] = pair_clusters[(i, j)]
 
-        for i, col1 in enumerate(columns):
-            results[col1] = {}
-            for j, col2 in enumerate(columns):
-                # Skip same feature
-                if i >= j:
-                    continue
+        return results
 
-                feature_pair_data = dataset[:, [i, j]]
+    @staticmethod
+    def assign_appended_rows(
+        data: pd.DataFrame,
+        previous_rows: int,
+        clusters: Dict[Tuple[str, str], Dict[int, List[int]]],
+        models: Dict[Tuple[str, str], ClusterModel],
+    ) -> Dict[Tuple[str, str], AppendedPair]:
+        """
+        Add the rows of `data` from `previous_rows` on to the stored clusters of each feature pair.
 
-                # Skip if data contains NaN: Sanity check only - this should not happen due to our preprocessing
-                if np.isnan(feature_pair_data).any():
-                    logger.warning(f"Skipping {col1} and {col2} due to NaN values")
-                    continue
+        The new rows are assigned by the pair's model (see ClusterModel.assign), so the existing
+        clusters keep their points and ids. A pair whose drift over the rows assigned since its last
+        fit exceeds CONFIG.CLUSTERING_DRIFT_THRESHOLD is clustered again from all rows instead.
 
-                try:
-                    if algorithm == "kmeans":
-                        kmeans = KMeans(n_clusters=params.k, max_iter=params.max_iterations, n_init="auto")
-                        clusters = kmeans.fit_predict(feature_pair_data)
-                    elif algorithm == "dbscan":
-                        dbscan = DBSCAN(eps=params.eps, min_samples=params.min_samples)
-                        clusters = dbscan.fit_predict(feature_pair_data)
-
-                    cluster_groups = {}
-                    for idx, cluster in enumerate(clusters):
-                        cluster_label = int(cluster)
-                        if cluster_label not in cluster_groups:
-                            cluster_groups[cluster_label] = []
-                        cluster_groups[cluster_label].append(idx)
-
-                    results[col1][col2] = cluster_groups
-
-                except Exception as e:
-                    logger.error(f"Error clustering {col1} and {col2}: {str(e)}")
-                    # Continue with other feature pairs instead of failing completely
-                    continue
+        Args:
+            clusters: stored clusters of each pair (canonical feature order), cluster id -> point indices
+            models: fitted model of each pair, pairs without one are left unchanged
+        """
+        features = sorted({feature for pair in models for feature in pair})
+        dataset = _numeric_matrix(data, features)
+        positions = {feature: j for j, feature in enumerate(features)}
 
+        results = {}
+        for (feature1, feature2), model in models.items():
+            pair_data = dataset[:, [positions[feature1], positions[feature2]]]
+            labels, outliers = model.assign(pair_data[previous_rows:])
+            model.record_assigned(outliers)
+            drift = model.drift
+
+            if model.needs_refit():
+                logger.info(f"Refitting {feature1} and {feature2}: drift {drift:.3f} over {model.assigned_rows} rows")
+                model, labels = ClusterModel.fit(model.algorithm, model.parameters(), pair_data)
+                results[(feature1, feature2)] = AppendedPair(_group_labels(labels), model, drift, True)
+                continue
+
+            stored = clusters.get((feature1, feature2), {})
+            pair_clusters = {cluster_id: list(indices) for cluster_id, indices in stored.items()}
+            for cluster_id, indices in _group_labels(labels, offset=previous_rows).items():
+                pair_clusters.setdefault(cluster_id, []).extend(indices)
+            results[(feature1, feature2)] = AppendedPair(pair_clusters, model, drift, False)
+
+        logger.info(
+            f"Assigned {len(data) - previous_rows} appended rows to {len(results)} feature pairs, "
+            f"{sum(result.refit for result in results.values())} refitted"
+        )
         return results
 
-    @staticmethod
-    def _calculate_jaccard_index(set1: List[int], set2: List[int]) -> float:
-        intersection = len(set(set1) & set(set2))
-        union = len(set(set1) | set(set2))
-        return intersection / union if union > 0 else 0.0
-
     @staticmethod
     def get_cluster_similarities(
-        all_clusters: Dict[str, Dict[str, Dict[int, List[int]]]],
+        all_clusters: ClusterIndex | Dict[str, Dict[str, Dict[int, List[int]]]],
         selected_feature1: str,
         selected_feature2: str,
         selected_cluster_id: int,
     ) -> List[Dict[str, Any]]:
-        results = []
-
-        # both orderings: TODO: restructure to store feature pairs ordered s.t. we dont need to check all permutations if we expand to more than 2 features in the future
-        selected_cluster_points = (
-            all_clusters.get(selected_feature1, {}).get(selected_feature2, {}).get(selected_cluster_id, [])
-        )
-        if not selected_cluster_points and selected_feature2 in all_clusters:
-            selected_cluster_points = (
-                all_clusters.get(selected_feature2, {}).get(selected_feature1, {}).get(selected_cluster_id, [])
-            )
+        if not isinstance(all_clusters, ClusterIndex):
+            all_clusters = ClusterIndex.from_clusters(all_clusters)
 
-        if not selected_cluster_points:
+        selected_cluster_points = all_clusters.points(selected_feature1, selected_feature2, selected_cluster_id)
+        if selected_cluster_points is None or not len(selected_cluster_points):
             return []  # No matching cluster found
 
-        for feat1, feature_pairs in all_clusters.items():
-            for feat2, clusters in feature_pairs.items():
-                # Skip comparing with itself - check both possible orderings
-                if (feat1 == selected_feature1 and feat2 == selected_feature2) or (
-                    feat1 == selected_feature2 and feat2 == selected_feature1
-                ):
-                    continue
-
-                for cluster_id, cluster_points in clusters.items():
-                    similarity = ClusteringService._calculate_jaccard_index(selected_cluster_points, cluster_points)
+        # Jaccard index with every cluster at once
+        similarities = all_clusters.jaccard(selected_cluster_points).tolist()
+        cluster_ids = all_clusters.cluster_ids.tolist()
+        selected_group = all_clusters.group(selected_feature1, selected_feature2)
 
-                    results.append(
-                        {"feature1": feat1, "feature2": feat2, "cluster_id": cluster_id, "similarity": similarity}
-                    )
+        results = []
+        for group, (feat1, feat2) in enumerate(all_clusters.pairs):
+            # Skip comparing with itself
+            if group == selected_group:
+                continue
+
+            for k in range(*all_clusters.group_slice(group).indices(len(cluster_ids))):
+                results.append(
+                    {"feature1": feat1, "feature2": feat2, "cluster_id": cluster_ids[k], "similarity": similarities[k]}
+                )
 
         return sorted(results, key=lambda x: x["similarity"], reverse=True)
 
+    @staticmethod
+    def get_approximate_cluster_similarities(
+        clusters: ClusterIndex,
+        signatures: np.ndarray,
+        band_keys: np.ndarray,
+        selected_feature1: str,
+        selected_feature2: str,
+        selected_cluster_id: int,
+        top_k: int,
+        max_error: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        The top_k clusters most similar to the selected one, found with MinHash signatures.
+
+        Candidates share an LSH band with the selected cluster (all clusters if that yields fewer than
+        top_k). Their Jaccard indices are estimated from the first signature values needed for
+        `max_error` at CONFIG.MINHASH_CONFIDENCE (all values by default), and every candidate whose
+        estimate is within twice the error bound of the k-th best is re-ranked by its exact Jaccard index.
+        Results have exact similarities plus the estimate and its error bound.
+        """
+        selected = clusters.position(selected_feature1, selected_feature2, selected_cluster_id)
+        if selected is None:
+            return []  # No matching cluster found
+        selected_cluster_points = clusters.indices[clusters.offsets[selected] : clusters.offsets[selected + 1]]
+        if not len(selected_cluster_points):
+            return []
+
+        num_perm = signatures.shape[1]
+        if max_error:
+            num_perm = min(num_perm, permutations_for_error(max_error, CONFIG.MINHASH_CONFIDENCE))
+        error_bound = estimate_error(num_perm, CONFIG.MINHASH_CONFIDENCE)
+
+        # Skip comparing with the clusters of the selected pair
+        groups = clusters.cluster_groups()
+        others = groups != groups[selected]
+        candidates = others & (band_keys == band_keys[selected]).any(axis=1)
+        if candidates.sum() < top_k:
+            candidates = others
+        positions = np.flatnonzero(candidates)
+        if not len(positions):
+            return []
+
+        estimates = estimate_jaccard(signatures[positions], signatures[selected], num_perm)
+        order = np.argsort(-estimates, kind="stable")
+        kth_estimate = estimates[order[min(top_k, len(order)) - 1]]
+        rerank = order[estimates[order] >= kth_estimate - 2 * error_bound][: max(top_k, CONFIG.SIMILARITY_MAX_RERANK)]
+        exact = clusters.jaccard(selected_cluster_points, positions[rerank])
+        logger.info(
+            f"Approximate similarities: {len(positions)} candidates, {len(rerank)} re-ranked, "
+            f"error bound {error_bound:.3f} from {num_perm} signature values"
+        )
+
+        results = []
+        for i in np.argsort(-exact, kind="stable")[:top_k]:
+            k = int(positions[rerank[i]])
+            feat1, feat2 = clusters.pairs[groups[k]]
+            results.append(
+                {
+                    "feature1": feat1,
+                    "feature2": feat2,
+                    "cluster_id": int(clusters.cluster_ids[k]),
+                    "similarity": float(exact[i]),
+                    "estimate": float(estimates[rerank[i]]),
+                    "error_bound": error_bound,
+                }
+            )
+        return results
+
     @staticmethod
     def compute_feature_pair_similarity_matrix(
-        clusters: Dict[str, Dict[str, Dict[int, List[int]]]],
+        clusters: ClusterIndex | Dict[str, Dict[str, Dict[int, List[int]]]],
         selected_feature1: str,
         selected_feature2: str,
         selected_cluster_id: int,
@@ -152,19 +440,21 @@ class ClusteringService:
             aggregation: Strategy for aggregating similarities ('max', 'avg', 'min', 'median')
         """
         try:
-            # Get the selected cluster data points - handle both orderings
-            selected_cluster_points = None
+            if not isinstance(clusters, ClusterIndex):
+                clusters = ClusterIndex.from_clusters(clusters)
 
-            if selected_feature1 in clusters and selected_feature2 in clusters[selected_feature1]:
-                selected_cluster_points = clusters[selected_feature1][selected_feature2].get(selected_cluster_id)
-            elif selected_feature2 in clusters and selected_feature1 in clusters[selected_feature2]:
-                selected_cluster_points = clusters[selected_feature2][selected_feature1].get(selected_cluster_id)
+            # Get the selected cluster data points
+            selected_cluster_points = clusters.points(selected_feature1, selected_feature2, selected_cluster_id)
 
             if selected_cluster_points is None:
                 raise ValueError(
-                    f"Selected cluster {selected_cluster_id} not found for feature pair ({selected_feature1}, {selected_feature2}). Available feature pairs: {list(clusters.keys())}"
+                    f"Selected cluster {selected_cluster_id} not found for feature pair ({selected_feature1}, {selected_feature2}). Available feature pairs: {clusters.pairs}"
                 )
 
+            # Similarities between the selected cluster and all clusters, aggregated per feature pair below
+            cluster_similarities = clusters.jaccard(selected_cluster_points)
+            aggregate = {"max": np.max, "avg": np.mean, "min": np.min, "median": np.median}.get(aggregation, np.max)
+
             # Initialize the matrix
             n_features = len(features)
             similarities = []
@@ -179,48 +469,13 @@ class ClusteringService:
                         # Diagonal - self similarity
                         similarity = 1.0
                     else:
-                        # Calculate similarities between selected cluster and all clusters of this feature pair
-                        similarities_for_pair = []
-
-                        # Check if this feature pair has clusters
-                        if feature1 in clusters and feature2 in clusters[feature1]:
-                            feature_pair_clusters = clusters[feature1][feature2]
-                        elif feature2 in clusters and feature1 in clusters[feature2]:
-                            feature_pair_clusters = clusters[feature2][feature1]
-                        else:
+                        group = clusters.group(feature1, feature2)
+                        if group is None:
                             # No clusters found for this feature pair
                             similarity = 0.0
-                            row.append(similarity)
-                            if similarity < min_similarity:
-                                min_similarity = similarity
-                            if similarity > max_similarity:
-                                max_similarity = similarity
-                            continue
-
-                        # Calculate similarity with each cluster in this feature pair
-                        for cluster_id, cluster_points in feature_pair_clusters.items():
-                            sim = ClusteringService._calculate_jaccard_index(selected_cluster_points, cluster_points)
-                            similarities_for_pair.append(sim)
-
-                        # Apply aggregation strategy
-                        if not similarities_for_pair:
-                            similarity = 0.0
-                        elif aggregation == "max":
-                            similarity = max(similarities_for_pair)
-                        elif aggregation == "avg":
-                            similarity = sum(similarities_for_pair) / len(similarities_for_pair)
-                        elif aggregation == "min":
-                            similarity = min(similarities_for_pair)
-                        elif aggregation == "median":
-                            sorted_sims = sorted(similarities_for_pair)
-                            n = len(sorted_sims)
-                            if n % 2 == 0:
-                                similarity = (sorted_sims[n // 2 - 1] + sorted_sims[n // 2]) / 2
-                            else:
-                                similarity = sorted_sims[n // 2]
                         else:
-                            # Default to max if unknown aggregation method
-                            similarity = max(similarities_for_pair)
+                            similarities_for_pair = cluster_similarities[clusters.group_slice(group)]
+                            similarity = float(aggregate(similarities_for_pair)) if len(similarities_for_pair) else 0.0
 
                     row.append(similarity)
                     if i != j:  # Ignore self-similarity for min/max calculation
@@ -277,6 +532,195 @@ class ClusteringService:
             logger.error(f"Error computing feature pair similarity matrix: {str(e)}")
             raise
 
+    @staticmethod
+    def compute_partition_similarity_matrix(
+        dataset_id: Optional[str],
+        pairs: List[Tuple[str, str]],
+        labels: np.ndarray,
+        counts: np.ndarray,
+        selected_pairs: Optional[List[Tuple[str, str]]] = None,
+        n_jobs: Optional[int] = None,
+        clusters_digest: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Compare the clusterings of feature pairs as whole partitions.
+
+        For every two feature pairs the contingency table of their label vectors (see
+        ClusterIndex.labels) is built with np.bincount, O(points) per comparison. The adjusted Rand
+        index, normalized mutual information and mean best-match Jaccard index are derived from it.
+        Comparisons are made in blocks of at most CONFIG.PARTITION_SIMILARITY_CHUNK_ELEMENTS labels,
+        by n_jobs threads or, with CONFIG.PARTITION_SIMILARITY_PROCESSES > 1 and memory-mapped
+        labels, a process pool. With a dataset_id, results are cached per dataset, clusters (their
+        digest, see ClusterIndex.digest) and selected pairs.
+
+        Returns:
+            Dict with the compared "pairs" and a pairs x pairs matrix per metric in "similarities"
+        """
+        positions = {pair: g for g, pair in enumerate(pairs)}
+        if selected_pairs:
+            selected_pairs = list(dict.fromkeys(canonical_pair(*pair) for pair in selected_pairs))
+            unknown = [pair for pair in selected_pairs if pair not in positions]
+            if unknown:
+                raise ValueError(f"No clusters found for feature pairs: {unknown}")
+        else:
+            selected_pairs = list(pairs)
+
+        cache_key = (
+            make_cache_key(dataset_id, "partition_similarity", clusters_digest, selected_pairs) if dataset_id else None
+        )
+        matrices = partition_similarity_cache.get(cache_key) if cache_key else None
+        if matrices is None:
+            selected = np.array([positions[pair] for pair in selected_pairs], dtype=np.int64)
+            n_selected = len(selected)
+            rows_per_block = max(1, CONFIG.PARTITION_SIMILARITY_CHUNK_ELEMENTS // max(labels.shape[1], 1))
+            blocks = [
+                (i, np.arange(start, min(start + rows_per_block, n_selected)))
+                for i in range(n_selected)
+                for start in range(i + 1, n_selected, rows_per_block)
+            ]
+
+            matrices = np.ones((len(PARTITION_METRICS), n_selected, n_selected))
+            processes = CONFIG.PARTITION_SIMILARITY_PROCESSES
+            if processes > 1 and len(blocks) > 1 and isinstance(labels, np.memmap):
+                # workers map the label vectors from the shared store instead of receiving copies
+                with ProcessPoolExecutor(
+                    max_workers=min(processes, len(blocks)),
+                    initializer=_init_partition_worker,
+                    initargs=(labels.filename,),
+                ) as executor:
+                    results = list(
+                        executor.map(
+                            _partition_block,
+                            [selected[i] for i, _ in blocks],
+                            [selected[others] for _, others in blocks],
+                            repeat(counts),
+                        )
+                    )
+            else:
+                with ThreadPoolExecutor(max_workers=n_jobs or governor.threads_per_job) as executor:
+                    results = list(
+                        executor.map(
+                            _partition_block,
+                            [selected[i] for i, _ in blocks],
+                            [selected[others] for _, others in blocks],
+                            repeat(counts),
+                            repeat(labels),
+                        )
+                    )
+
+            for (i, others), (_, _, scores) in zip(blocks, results):
+                matrices[:, i, others] = scores.T
+                matrices[:, others, i] = scores.T
+            logger.info(f"Compared {n_selected} partitions in {len(blocks)} blocks")
+            if cache_key:
+                partition_similarity_cache.put(cache_key, matrices)
+
+        return {
+            "pairs": selected_pairs,
+            "similarities": {metric: matrices[m].tolist() for m, metric in enumerate(PARTITION_METRICS)},
+        }
+
+    @staticmethod
+    def numeric_values(df: pd.DataFrame) -> Tuple[np.ndarray, List[str]]:
+        """Numeric columns of a dataset as clustered: a column-major matrix, missing values filled by _numeric_matrix."""
+        columns = get_numeric_columns(df)
+        return np.asfortranarray(_numeric_matrix(df, columns)), columns
+
+    @staticmethod
+    def pair_view_cache_key(
+        dataset_id: str,
+        clusters_digest: str,
+        feature1: str,
+        feature2: str,
+        mode: str,
+        resolution: int,
+        max_points: Optional[int],
+    ) -> str:
+        """Key of a pair view of the clusters with the given digest, see ClusterIndex.digest."""
+        return make_cache_key(
+            dataset_id, "pair_view", clusters_digest, feature1, feature2, mode, resolution, max_points
+        )
+
+    @staticmethod
+    def get_cached_pair_view(cache_key: str) -> Optional[Dict[str, Any]]:
+        return pair_view_cache.get(cache_key)
+
+    @staticmethod
+    def compute_pair_view(
+        x: np.ndarray,
+        y: np.ndarray,
+        labels: np.ndarray,
+        cluster_ids: List[Optional[int]],
+        mode: Literal["sample", "density"],
+        resolution: int,
+        max_points: int,
+        cache_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Downsampled scatter plot of a feature pair, for plots of datasets too large to draw every point.
+
+        Mode "sample" returns a density-preserving sample of at most max_points points, stratified by
+        cluster label and grid cell (see utils.pair_view.density_sample). Mode "density" returns the
+        number of points per label and occupied cell of a resolution x resolution grid.
+
+        Args:
+            x, y: Values of the two features for every row
+            labels: Label of every row, a position in cluster_ids (see ClusterIndex.labels)
+            cluster_ids: Cluster id of each label, None for points in no cluster
+            cache_key: With a key (see pair_view_cache_key), the view is cached
+
+        Returns:
+            Dict with "rows", "resolution", the grid "extent" and one entry per label in "series"
+        """
+        # rows appended after the clusters were computed are in none of them
+        if len(labels) < len(x):
+            labels = np.concatenate([labels, np.full(len(x) - len(labels), len(cluster_ids) - 1, dtype=labels.dtype)])
+        labels = labels[: len(x)]
+
+        cells, extent = grid_cells(x, y, resolution)
+        label_counts = np.bincount(labels, minlength=len(cluster_ids))
+        series = [
+            {"cluster_id": cluster_id, "count": int(label_counts[label])}
+            for label, cluster_id in enumerate(cluster_ids)
+            if label_counts[label]
+        ]
+        label_series = {label: s for label, s in zip(np.flatnonzero(label_counts).tolist(), series)}
+
+        if mode == "density":
+            tiles = density_tiles(labels, cells, resolution)
+            bounds = np.searchsorted(tiles["label"], np.arange(len(cluster_ids) + 1))
+            for label, s in label_series.items():
+                part = slice(bounds[label], bounds[label + 1])
+                s.update({"cells": tiles["cell"][part].tolist(), "counts": tiles["count"][part].tolist()})
+        else:
+            sample = density_sample(labels, cells, resolution, max_points, CONFIG.PAIR_VIEW_SEED)
+            for label, s in label_series.items():
+                rows = sample["label"] == label
+                indices = sample["index"][rows]
+                s.update(
+                    {
+                        "indices": indices.tolist(),
+                        "x": x[indices].tolist(),
+                        "y": y[indices].tolist(),
+                        "weights": sample["weight"][rows].tolist(),
+                    }
+                )
+
+        result = {"rows": len(x), "resolution": resolution, "extent": extent, "series": series}
+        if cache_key:
+            pair_view_cache.put(cache_key, result)
+        return result
+
+    @classmethod
+    def invalidate_cache(cls, dataset_id: Optional[str] = None) -> None:
+        """Drop cached partition similarities and pair views of a dataset, or of all datasets."""
+        if dataset_id:
+            partition_similarity_cache.invalidate(dataset_id)
+            pair_view_cache.invalidate(dataset_id)
+        else:
+            partition_similarity_cache.clear()
+            pair_view_cache.clear()
+
     @staticmethod
     def reorder_feature_pair_matrix(
         similarities: List[List[float]], features: List[str], method: str = "optimal"
@@ -331,18 +775,18 @@ class ClusteringService:
                     }
 
                 # Convert to condensed distance matrix format required by linkage
-                condensed_distances = squareform(distance_matrix, checks=False)
+                condensed_distances = distance.squareform(distance_matrix, checks=False)
                 logger.info(
                     f"Condensed distances shape: {condensed_distances.shape}, unique values: {len(np.unique(condensed_distances))}"
                 )
 
                 # Perform hierarchical clustering using average linkage
-                linkage_matrix = linkage(condensed_distances, method="average")
+                linkage_matrix = hierarchy.linkage(condensed_distances, method="average")
                 logger.info(f"Linkage matrix shape: {linkage_matrix.shape}")
 
                 # Use optimal leaf ordering to minimize distance between adjacent leaves
-                optimal_linkage = optimal_leaf_ordering(linkage_matrix, condensed_distances)
-                order = leaves_list(optimal_linkage).tolist()
+                optimal_linkage = hierarchy.optimal_leaf_ordering(linkage_matrix, condensed_distances)
+                order = hierarchy.leaves_list(optimal_linkage).tolist()
 
                 logger.info(f"Original order: {list(range(n))}")
                 logger.info(f"Optimal order: {order}")
@@ -1,37 +1,95 @@
-from typing import Union
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-import lightgbm as lgb
 import numpy as np
 import pandas as pd
-import shap
-import xgboost
 
 from core.config import CONFIG
+from core.resources import governor
+from services.shared_store import shared_store
+from utils.cache import ResultCache, make_cache_key
+from utils.lazy_import import lazy_import
+from utils.logger import get_logger
+
+# imported on first use, see utils.lazy_import
+lgb = lazy_import("lightgbm")
+shap = lazy_import("shap")
+xgboost = lazy_import("xgboost")
+
+logger = get_logger(__name__)
+
+# fitted models and SHAP importances, keyed by (dataset id, target, model type, model parameters)
+shap_model_cache = ResultCache(
+    "shap_models", CONFIG.SHAP_MODEL_CACHE_MEMORY_ENTRIES, CONFIG.SHAP_MODEL_CACHE_MAX_DISK_BYTES
+)
+shap_values_cache = ResultCache(
+    "shap_values", CONFIG.SHAP_VALUES_CACHE_MEMORY_ENTRIES, CONFIG.SHAP_VALUES_CACHE_MAX_DISK_BYTES
+)
+
+# column names that usually hold what a dataset is about, see ShapleyService.likely_targets
+TARGET_NAMES = {"target", "label", "class", "y", "outcome", "response"}
+
+# explainer of a process pool worker, see ShapleyService._explain_rows
+_worker_explainer: Optional["shap.TreeExplainer"] = None
+
+
+def _init_explain_worker(model: Any) -> None:
+    global _worker_explainer
+    _worker_explainer = shap.TreeExplainer(model)
+
+
+def _explain_chunk(
+    X: pd.DataFrame, approximate: bool, explainer: Optional["shap.TreeExplainer"] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-feature sums of |SHAP| and of SHAP^2 over the rows of X."""
+    explainer = explainer or _worker_explainer
+    abs_values = np.abs(explainer.shap_values(X, approximate=approximate, check_additivity=False))
+    return abs_values.sum(axis=0), np.square(abs_values).sum(axis=0)
+
+
+def _interaction_chunk(X: pd.DataFrame, explainer: Optional["shap.TreeExplainer"] = None) -> np.ndarray:
+    """Sum of |SHAP interaction values| over the rows of X, a features x features matrix."""
+    explainer = explainer or _worker_explainer
+    return np.abs(explainer.shap_interaction_values(X)).sum(axis=0)
 
 
 class ShapleyService:
     @classmethod
-    def get_shap_model(cls):
+    def get_shap_model(cls, n_jobs: Optional[int] = None, classifier: bool = False):
+        """
+        Create an unfitted model, n_jobs limits the threads used for training and prediction
+        (default: the per-job share of the CPU, see core.resources).
+        With classifier=True the classifier counterpart with the same parameters is returned.
+        """
+        n_jobs = n_jobs or governor.threads_per_job
         if CONFIG.SHAP_MODEL == "xgboost":
-            return xgboost.XGBRFRegressor(
+            model_class = xgboost.XGBRFClassifier if classifier else xgboost.XGBRFRegressor
+            return model_class(
                 n_estimators=CONFIG.SHAP_MODEL_PARAMETERS["xgboost"]["n_estimators"],
                 learning_rate=CONFIG.SHAP_MODEL_PARAMETERS["xgboost"]["learning_rate"],
                 max_depth=CONFIG.SHAP_MODEL_PARAMETERS["xgboost"]["max_depth"],
                 random_state=CONFIG.SHAP_MODEL_PARAMETERS["xgboost"]["random_state"],
+                n_jobs=n_jobs,
             )
         elif CONFIG.SHAP_MODEL == "lightgbm":
-            return lgb.LGBMRegressor(
+            model_class = lgb.LGBMClassifier if classifier else lgb.LGBMRegressor
+            return model_class(
                 n_estimators=CONFIG.SHAP_MODEL_PARAMETERS["lightgbm"]["n_estimators"],
                 learning_rate=CONFIG.SHAP_MODEL_PARAMETERS["lightgbm"]["learning_rate"],
                 max_depth=CONFIG.SHAP_MODEL_PARAMETERS["lightgbm"]["max_depth"],
                 random_state=CONFIG.SHAP_MODEL_PARAMETERS["lightgbm"]["random_state"],
+                n_jobs=n_jobs,
             )
         else:
             raise ValueError(f"Model {CONFIG.SHAP_MODEL} not supported")
 
     @classmethod
     def normalize_data(cls, data: pd.DataFrame) -> pd.DataFrame:
-        numeric_data = data.select_dtypes(include=["number"])
+        numeric_data = data.select_dtypes(include=["number"]).astype(np.float64)
         # z-score normalization
         normalized_data = (numeric_data - numeric_data.mean()) / numeric_data.std()
         normalized_data = normalized_data.fillna(0)
@@ -42,12 +100,87 @@ class ShapleyService:
 
         return normalized_data
 
+    @classmethod
+    def get_normalized_data(cls, data_df: pd.DataFrame, dataset_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Normalized data of a dataset, computed once and shared by all models trained on it.
+        The numeric matrix lives in the shared store, so all workers use the same memory-mapped copy.
+        """
+        if not dataset_id:
+            return cls.normalize_data(data_df)
+        entry = shared_store.get(dataset_id, "normalized")
+        if entry is None:
+            normalized_data = cls.normalize_data(data_df)
+            numeric_columns = data_df.select_dtypes(include=["number"]).columns.tolist()
+            entry = shared_store.put(
+                dataset_id,
+                "normalized",
+                {"values": np.asfortranarray(normalized_data[numeric_columns].to_numpy())},
+                {"columns": numeric_columns},
+            )
+
+        normalized_data = pd.DataFrame(entry.arrays["values"], columns=entry.meta["columns"], copy=False)
+        for col in data_df.select_dtypes(exclude=["number"]).columns:
+            normalized_data[col] = data_df[col]
+        return normalized_data
+
+    @classmethod
+    def get_cache_key(cls, dataset_id: str, data_version: Optional[int], target_column: str, *variant: Any) -> str:
+        """Key of a model or result of a target, per version of the dataset's rows (see get_dataset_version)."""
+        return make_cache_key(
+            dataset_id,
+            data_version,
+            target_column,
+            CONFIG.SHAP_MODEL,
+            CONFIG.SHAP_MODEL_PARAMETERS.get(CONFIG.SHAP_MODEL),
+            *variant,
+        )
+
+    @classmethod
+    def get_cached_shapley_values(
+        cls,
+        dataset_id: str,
+        target_column: str,
+        latency_budget: Optional[float] = None,
+        data_version: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        """
+        Return SHAP importances computed earlier with the current model settings, if any.
+        With a latency budget, exact importances are preferred over sampled ones computed with the same budget,
+        and come with the "CI Lower"/"CI Upper" columns of compute_shapley_values_budgeted (see with_exact_bounds).
+        """
+        cached_values = shap_values_cache.get(cls.get_cache_key(dataset_id, data_version, target_column))
+        if latency_budget is None:
+            return cached_values
+        if cached_values is not None:
+            return cls.with_exact_bounds(cached_values)
+        budget_key = cls.get_cache_key(dataset_id, data_version, target_column, "budget", latency_budget)
+        return shap_values_cache.get(budget_key)
+
+    @staticmethod
+    def with_exact_bounds(shap_importance: pd.DataFrame) -> pd.DataFrame:
+        """Exact importances with the columns of budgeted ones, their bounds are the values themselves."""
+        return shap_importance.assign(
+            **{"CI Lower": shap_importance["SHAP Value"], "CI Upper": shap_importance["SHAP Value"]}
+        )
+
+    @classmethod
+    def invalidate_cache(cls, dataset_id: Optional[str] = None) -> None:
+        """Drop cached models and SHAP values of a dataset, or of all datasets."""
+        for cache in (shap_model_cache, shap_values_cache):
+            if dataset_id:
+                cache.invalidate(dataset_id)
+            else:
+                cache.clear()
+
     @classmethod
     def compute_shap_values(
-        cls, model: Union[xgboost.XGBRFRegressor, lgb.LGBMRegressor], X: pd.DataFrame, y: pd.Series
+        cls, model: Union["xgboost.XGBRFRegressor", "lgb.LGBMRegressor"], X: pd.DataFrame, y: Optional[pd.Series] = None
     ) -> pd.DataFrame:
+        """Fit the model on the numeric columns of X (unless y is None, i.e. it is already fitted) and explain it."""
         X_numeric = X.select_dtypes(include=["number"])
-        model.fit(X_numeric, y)
+        if y is not None:
+            model.fit(X_numeric, y)
         explainer = shap.TreeExplainer(model)
         shap_values = explainer.shap_values(X_numeric)
 
@@ -60,11 +193,355 @@ class ShapleyService:
         return shap_importance
 
     @classmethod
-    def compute_shapley_values_from_df(cls, data_df: pd.DataFrame, target_column: str) -> pd.DataFrame:
-        """Compute Shapley values from a DataFrame."""
+    def compute_shapley_values_from_df(
+        cls,
+        data_df: pd.DataFrame,
+        target_column: str,
+        dataset_id: Optional[str] = None,
+        data_version: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Compute Shapley values from a DataFrame.
+        With a dataset_id, the fitted model and the resulting importances are cached per version of its rows.
+        """
+        cache_key = cls.get_cache_key(dataset_id, data_version, target_column) if dataset_id else None
+        if cache_key:
+            cached_values = shap_values_cache.get(cache_key)
+            if cached_values is not None:
+                logger.info(f"Using cached SHAP values for {target_column} of dataset {dataset_id}")
+                return cached_values
+
+        normalized_data = cls.get_normalized_data(data_df, dataset_id)
+        shap_importance = cls._explain_target(normalized_data, target_column, cache_key)
+        if cache_key:
+            shap_values_cache.put(cache_key, shap_importance)
+        return shap_importance
+
+    @classmethod
+    def compute_shapley_values_budgeted(
+        cls,
+        data_df: pd.DataFrame,
+        target_column: str,
+        latency_budget: float,
+        dataset_id: Optional[str] = None,
+        data_version: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Estimate mean |SHAP| per feature within a latency budget (in seconds).
+
+        The model is fitted on at most CONFIG.SHAP_BUDGET_FIT_ROWS random rows. A pilot of
+        CONFIG.SHAP_BUDGET_PILOT_ROWS rows measures the cost per explained row, and the remaining
+        budget decides how many further random rows are explained. If fewer than
+        CONFIG.SHAP_BUDGET_MIN_EXACT_ROWS rows could be explained exactly, approximate (Saabas)
+        attributions are used instead. With CONFIG.SHAP_EXPLAIN_PROCESSES > 1 the rows are explained
+        in chunks across processes; pool startup is not part of the estimate.
+
+        Returns the importances with "CI Lower"/"CI Upper" bounds at CONFIG.SHAP_CONFIDENCE_LEVEL,
+        from the normal approximation with finite population correction. The bounds reflect the
+        sampling error only, not the bias of approximate attributions.
+        """
+        start = time.perf_counter()
+        cache_key = (
+            cls.get_cache_key(dataset_id, data_version, target_column, "budget", latency_budget) if dataset_id else None
+        )
+
+        normalized_data = cls.get_normalized_data(data_df, dataset_id)
+        X = normalized_data.drop(columns=[target_column]).select_dtypes(include=["number"])
+        y = normalized_data[target_column]
+        if X.empty:
+            raise ValueError("No numerical columns found in the dataset")
+
+        n_rows = len(X)
+        order = np.random.default_rng(0).permutation(n_rows)
+        model = cls._get_subsample_model(X, y, order, target_column, dataset_id, data_version)
+        explainer = shap.TreeExplainer(model)
+        processes = max(1, min(CONFIG.SHAP_EXPLAIN_PROCESSES, governor.threads_per_job))
+        pilot_rows = min(n_rows, CONFIG.SHAP_BUDGET_PILOT_ROWS)
+
+        def explain_pilot(approximate: bool) -> Tuple[np.ndarray, np.ndarray, int]:
+            pilot_start = time.perf_counter()
+            sums, squares = _explain_chunk(X.iloc[order[:pilot_rows]], approximate, explainer)
+            row_cost = (time.perf_counter() - pilot_start) / pilot_rows
+            remaining = latency_budget - (time.perf_counter() - start)
+            return sums, squares, pilot_rows + max(int(remaining * processes / row_cost), 0)
+
+        approximate = False
+        sums, squares, affordable_rows = explain_pilot(approximate)
+        if affordable_rows < min(n_rows, CONFIG.SHAP_BUDGET_MIN_EXACT_ROWS):
+            approximate = True
+            sums, squares, affordable_rows = explain_pilot(approximate)
+
+        sample_rows = min(n_rows, affordable_rows)
+        if sample_rows > pilot_rows:
+            chunk_sums, chunk_squares = cls._explain_rows(
+                model, explainer, X, order[pilot_rows:sample_rows], approximate, processes
+            )
+            sums += chunk_sums
+            squares += chunk_squares
+
+        means = sums / sample_rows
+        variances = np.maximum(squares - sample_rows * means**2, 0) / max(sample_rows - 1, 1)
+        standard_errors = np.sqrt(variances / sample_rows * (1 - sample_rows / n_rows))
+        margin = NormalDist().inv_cdf(0.5 + CONFIG.SHAP_CONFIDENCE_LEVEL / 2) * standard_errors
+
+        shap_importance = pd.DataFrame(
+            {
+                "feature": X.columns,
+                "SHAP Value": means,
+                "CI Lower": np.maximum(means - margin, 0),
+                "CI Upper": means + margin,
+            }
+        ).sort_values(by="SHAP Value", ascending=False)
+
+        logger.info(
+            f"Explained {sample_rows}/{n_rows} rows for {target_column} "
+            f"({'approximate' if approximate else 'exact'}) in {time.perf_counter() - start:.2f}s"
+        )
+        if cache_key:
+            shap_values_cache.put(cache_key, shap_importance)
+        return shap_importance
+
+    @classmethod
+    def _interactions_cache_key(
+        cls,
+        dataset_id: Optional[str],
+        data_version: Optional[int],
+        target_column: str,
+        sample_rows: Optional[int],
+        latency_budget: Optional[float],
+    ) -> Optional[str]:
+        if not dataset_id:
+            return None
+        sample_rows = sample_rows or CONFIG.SHAP_INTERACTION_SAMPLE_ROWS
+        latency_budget = latency_budget or CONFIG.SHAP_INTERACTION_LATENCY_BUDGET
+        return cls.get_cache_key(dataset_id, data_version, target_column, "interactions", sample_rows, latency_budget)
+
+    @classmethod
+    def get_cached_interaction_strengths(
+        cls,
+        dataset_id: str,
+        target_column: str,
+        sample_rows: Optional[int] = None,
+        latency_budget: Optional[float] = None,
+        data_version: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        """Return interaction strengths computed earlier with the same parameters, if any."""
+        cache_key = cls._interactions_cache_key(dataset_id, data_version, target_column, sample_rows, latency_budget)
+        return shap_values_cache.get(cache_key) if cache_key else None
+
+    @classmethod
+    def compute_interaction_strengths(
+        cls,
+        data_df: pd.DataFrame,
+        target_column: str,
+        dataset_id: Optional[str] = None,
+        sample_rows: Optional[int] = None,
+        latency_budget: Optional[float] = None,
+        data_version: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Rank feature pairs by the mean absolute SHAP interaction value of the model for the target.
+
+        Interaction values cost O(features^2) per row, so they are computed on a random sample of
+        at most `sample_rows` rows (default: CONFIG.SHAP_INTERACTION_SAMPLE_ROWS). A pilot of
+        CONFIG.SHAP_INTERACTION_PILOT_ROWS rows measures the cost per row and the sample is cut to
+        what fits in `latency_budget` seconds (default: CONFIG.SHAP_INTERACTION_LATENCY_BUDGET).
+        The rest is explained in chunks across CONFIG.SHAP_EXPLAIN_PROCESSES processes. The model
+        is the one used for budgeted SHAP values. The strength of a pair is mean |phi_ij| + mean |phi_ji|.
+
+        Returns a DataFrame with columns feature1, feature2 and interaction, strongest pair first.
+        """
+        start = time.perf_counter()
+        sample_rows = sample_rows or CONFIG.SHAP_INTERACTION_SAMPLE_ROWS
+        latency_budget = latency_budget or CONFIG.SHAP_INTERACTION_LATENCY_BUDGET
+        cache_key = cls._interactions_cache_key(dataset_id, data_version, target_column, sample_rows, latency_budget)
+        if cache_key:
+            cached_interactions = shap_values_cache.get(cache_key)
+            if cached_interactions is not None:
+                return cached_interactions
+
+        normalized_data = cls.get_normalized_data(data_df, dataset_id)
+        X = normalized_data.drop(columns=[target_column]).select_dtypes(include=["number"])
+        y = normalized_data[target_column]
+        if X.shape[1] < 2:
+            raise ValueError("At least two numerical feature columns are required")
+
+        order = np.random.default_rng(0).permutation(len(X))
+        model = cls._get_subsample_model(X, y, order, target_column, dataset_id, data_version)
+        explainer = shap.TreeExplainer(model)
+        processes = max(1, min(CONFIG.SHAP_EXPLAIN_PROCESSES, governor.threads_per_job))
+
+        pilot_rows = min(len(X), sample_rows, CONFIG.SHAP_INTERACTION_PILOT_ROWS)
+        pilot_start = time.perf_counter()
+        totals = _interaction_chunk(X.iloc[order[:pilot_rows]], explainer)
+        row_cost = (time.perf_counter() - pilot_start) / pilot_rows
+        remaining = latency_budget - (time.perf_counter() - start)
+        explained_rows = min(len(X), sample_rows, pilot_rows + max(int(remaining * processes / row_cost), 0))
+
+        rows = order[pilot_rows:explained_rows]
+        chunk_rows = CONFIG.SHAP_INTERACTION_CHUNK_ROWS
+        chunks = [X.iloc[rows[i : i + chunk_rows]] for i in range(0, len(rows), chunk_rows)]
+        if processes > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(processes, len(chunks)), initializer=_init_explain_worker, initargs=(model,)
+            ) as executor:
+                totals = totals + sum(executor.map(_interaction_chunk, chunks))
+        else:
+            totals = totals + sum(_interaction_chunk(chunk, explainer) for chunk in chunks)
+
+        strengths = (totals + totals.T) / explained_rows
+        i, j = np.triu_indices(X.shape[1], k=1)
+        interactions = pd.DataFrame(
+            {"feature1": X.columns[i], "feature2": X.columns[j], "interaction": strengths[i, j]}
+        ).sort_values(by="interaction", ascending=False, ignore_index=True)
+
+        logger.info(
+            f"Computed interactions of {X.shape[1]} features for {target_column} on {explained_rows} rows "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        if cache_key:
+            shap_values_cache.put(cache_key, interactions)
+        return interactions
+
+    @classmethod
+    def _get_subsample_model(
+        cls,
+        X: pd.DataFrame,
+        y: pd.Series,
+        order: np.ndarray,
+        target_column: str,
+        dataset_id: Optional[str],
+        data_version: Optional[int],
+    ) -> Any:
+        """Model fitted on the first CONFIG.SHAP_BUDGET_FIT_ROWS rows of `order`, a cached full model is preferred."""
+        fit_rows = min(len(X), CONFIG.SHAP_BUDGET_FIT_ROWS)
+        cache_key = None
+        if dataset_id:
+            full_key = cls.get_cache_key(dataset_id, data_version, target_column)
+            model = shap_model_cache.get(full_key)
+            if model is not None:
+                return model
+            if fit_rows == len(X):
+                cache_key = full_key
+            else:
+                cache_key = cls.get_cache_key(dataset_id, data_version, target_column, "fit_rows", fit_rows)
+            model = shap_model_cache.get(cache_key)
+            if model is not None:
+                return model
+
         model = cls.get_shap_model()
-        normalized_data = cls.normalize_data(data_df)
+        rows = np.sort(order[:fit_rows])
+        model.fit(X.iloc[rows], y.iloc[rows])
+        if cache_key:
+            shap_model_cache.put(cache_key, model)
+        return model
+
+    @classmethod
+    def _explain_rows(
+        cls,
+        model: Any,
+        explainer: "shap.TreeExplainer",
+        X: pd.DataFrame,
+        rows: np.ndarray,
+        approximate: bool,
+        processes: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Sums of |SHAP| and SHAP^2 over the given rows, explained in chunks and optionally in a process pool."""
+        chunk_rows = CONFIG.SHAP_EXPLAIN_CHUNK_ROWS
+        chunks = [X.iloc[rows[i : i + chunk_rows]] for i in range(0, len(rows), chunk_rows)]
+        if processes > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(processes, len(chunks)), initializer=_init_explain_worker, initargs=(model,)
+            ) as executor:
+                results = list(executor.map(_explain_chunk, chunks, repeat(approximate)))
+        else:
+            results = [_explain_chunk(chunk, approximate, explainer) for chunk in chunks]
+        return sum(result[0] for result in results), sum(result[1] for result in results)
 
+    @classmethod
+    def compute_shapley_values_batch(
+        cls,
+        data_df: pd.DataFrame,
+        target_columns: Optional[List[str]] = None,
+        dataset_id: Optional[str] = None,
+        data_version: Optional[int] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Compute Shapley values for several target columns (default: all numeric columns) in one job.
+
+        The data is normalized once and shared by all models. Targets that are not cached are
+        trained concurrently by up to CONFIG.SHAP_BATCH_WORKERS threads, each model limited to its
+        share of the job's threads so the CPU is not oversubscribed.
+        """
+        numeric_columns = data_df.select_dtypes(include=["number"]).columns.tolist()
+        if target_columns is None:
+            target_columns = numeric_columns
+        non_numeric = [col for col in target_columns if col not in numeric_columns]
+        if non_numeric:
+            raise ValueError(f"Target columns must be numeric: {non_numeric}")
+        if len(numeric_columns) < 2:
+            raise ValueError("At least two numerical columns are required")
+
+        results: Dict[str, pd.DataFrame] = {}
+        cache_keys = {}
+        for target_column in target_columns:
+            if dataset_id:
+                cache_keys[target_column] = cls.get_cache_key(dataset_id, data_version, target_column)
+            else:
+                cache_keys[target_column] = None
+            cached_values = shap_values_cache.get(cache_keys[target_column]) if dataset_id else None
+            if cached_values is not None:
+                results[target_column] = cached_values
+
+        pending = [col for col in target_columns if col not in results]
+        if pending:
+            normalized_data = cls.get_normalized_data(data_df, dataset_id)
+            workers = max(1, min(CONFIG.SHAP_BATCH_WORKERS, len(pending), governor.threads_per_job))
+            n_jobs = max(1, governor.threads_per_job // workers)
+            logger.info(f"Computing SHAP values for {len(pending)} targets with {workers} workers x {n_jobs} threads")
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    col: executor.submit(cls._explain_target, normalized_data, col, cache_keys[col], n_jobs)
+                    for col in pending
+                }
+                for target_column, future in futures.items():
+                    results[target_column] = future.result()
+                    if cache_keys[target_column]:
+                        shap_values_cache.put(cache_keys[target_column], results[target_column])
+
+        return {col: results[col] for col in target_columns}
+
+    @staticmethod
+    def likely_targets(data_df: pd.DataFrame, limit: int) -> List[str]:
+        """
+        Numeric columns most likely to be the target of a dataset, whose Shapley values are computed
+        ahead of requests: those named like a target (see TARGET_NAMES), then those with few distinct
+        values (at most CONFIG.PIPELINE_TARGET_MAX_CLASSES, likely class labels), then the last column.
+        Constant columns are no targets.
+        """
+        numeric_columns = data_df.select_dtypes(include=["number"]).columns.tolist()
+        if len(numeric_columns) < 2:
+            return []
+
+        ranks = {}
+        for col in numeric_columns:
+            distinct = data_df[col].nunique()
+            if distinct < 2:
+                continue
+            if str(col).strip().lower() in TARGET_NAMES:
+                ranks[col] = 0
+            elif distinct <= CONFIG.PIPELINE_TARGET_MAX_CLASSES:
+                ranks[col] = 1
+            elif col == numeric_columns[-1]:
+                ranks[col] = 2
+        return sorted(ranks, key=ranks.get)[:limit]
+
+    @classmethod
+    def _explain_target(
+        cls, normalized_data: pd.DataFrame, target_column: str, cache_key: Optional[str], n_jobs: Optional[int] = None
+    ) -> pd.DataFrame:
+        """Explain one target of already normalized data, reusing a cached model if there is one."""
         X = normalized_data.drop(columns=[target_column])
         y = normalized_data[target_column]
 
@@ -72,4 +549,168 @@ class ShapleyService:
         if X.select_dtypes(include=["number"]).empty:
             raise ValueError("No numerical columns found in the dataset")
 
-        return cls.compute_shap_values(model, X, y)
+        model = shap_model_cache.get(cache_key) if cache_key else None
+        if model is None:
+            model = cls.get_shap_model(n_jobs)
+            shap_importance = cls.compute_shap_values(model, X, y)
+            if cache_key:
+                shap_model_cache.put(cache_key, model)
+        else:
+            logger.info(f"Using cached {CONFIG.SHAP_MODEL} model for {target_column} ({cache_key})")
+            shap_importance = cls.compute_shap_values(model, X)
+        return shap_importance
+
+    @classmethod
+    def explain_cluster_membership(
+        cls,
+        data_df: pd.DataFrame,
+        clusters: Dict[int, List[int]],
+        cluster_id: int,
+        dataset_id: Optional[str] = None,
+        exclude_features: Optional[List[str]] = None,
+        shared_trees: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Explain which features drive membership of one cluster of a feature pair.
+
+        By default a one-vs-rest classifier is fitted on the cluster's data point indices. If the
+        pair's shared multiclass model already exists (see `explain_all_cluster_memberships`), or
+        with shared_trees=True, the cluster is explained from that model instead, so clicking
+        through the clusters of a pair fits trees only once.
+
+        Returns a DataFrame with columns feature, "SHAP Value" (mean |SHAP| in log-odds over all
+        sampled rows) and "Member Effect" (mean SHAP over the sampled cluster members: positive
+        values push points into the cluster), sorted by "SHAP Value".
+        """
+        if cluster_id not in clusters:
+            raise ValueError(f"Cluster {cluster_id} not found")
+        if len(clusters) < 2:
+            raise ValueError("At least two clusters are required to explain membership")
+
+        digest = cls._clusters_digest(clusters, exclude_features)
+        values_key = make_cache_key(dataset_id, "membership", digest, cluster_id) if dataset_id else None
+        cached_values = shap_values_cache.get(values_key) if values_key else None
+        if cached_values is not None:
+            return cached_values
+
+        shared_key = make_cache_key(dataset_id, "membership_model", digest) if dataset_id else None
+        if shared_trees or (shared_key and shap_model_cache.get(shared_key) is not None):
+            return cls.explain_all_cluster_memberships(data_df, clusters, dataset_id, exclude_features)[cluster_id]
+
+        X, labels, fit_rows, explain_rows = cls._membership_inputs(data_df, clusters, dataset_id, exclude_features)
+        is_member = (labels == sorted(clusters).index(cluster_id)).astype(np.int32)
+
+        model_key = make_cache_key(dataset_id, "membership_model", digest, cluster_id) if dataset_id else None
+        model = shap_model_cache.get(model_key) if model_key else None
+        if model is None:
+            model = cls.get_shap_model(classifier=True)
+            model.fit(X.iloc[fit_rows], is_member[fit_rows])
+            if model_key:
+                shap_model_cache.put(model_key, model)
+
+        shap_values = shap.TreeExplainer(model).shap_values(X.iloc[explain_rows], check_additivity=False)
+        membership = cls._membership_importance(X.columns, shap_values, is_member[explain_rows] == 1)
+        if values_key:
+            shap_values_cache.put(values_key, membership)
+        return membership
+
+    @classmethod
+    def explain_all_cluster_memberships(
+        cls,
+        data_df: pd.DataFrame,
+        clusters: Dict[int, List[int]],
+        dataset_id: Optional[str] = None,
+        exclude_features: Optional[List[str]] = None,
+    ) -> Dict[int, pd.DataFrame]:
+        """
+        Explain membership of every cluster of a feature pair in one batch.
+
+        One multiclass classifier is fitted on the cluster labels; its trees are shared by all
+        clusters and one SHAP pass yields the per-class (one-vs-rest log-odds) attributions of
+        every cluster. The model and the explanations are cached, see `explain_cluster_membership`.
+        """
+        if len(clusters) < 2:
+            raise ValueError("At least two clusters are required to explain membership")
+
+        cluster_ids = sorted(clusters)
+        digest = cls._clusters_digest(clusters, exclude_features)
+        values_keys = {
+            cluster_id: make_cache_key(dataset_id, "membership", digest, cluster_id) if dataset_id else None
+            for cluster_id in cluster_ids
+        }
+        if dataset_id:
+            cached = {cluster_id: shap_values_cache.get(key) for cluster_id, key in values_keys.items()}
+            if all(values is not None for values in cached.values()):
+                return cached
+
+        X, labels, fit_rows, explain_rows = cls._membership_inputs(data_df, clusters, dataset_id, exclude_features)
+
+        model_key = make_cache_key(dataset_id, "membership_model", digest) if dataset_id else None
+        model = shap_model_cache.get(model_key) if model_key else None
+        if model is None:
+            model = cls.get_shap_model(classifier=True)
+            # classes missing from the fit sample would shift the label encoding, fit on all rows then
+            if len(np.unique(labels[fit_rows])) < len(cluster_ids):
+                fit_rows = np.arange(len(X))
+            model.fit(X.iloc[fit_rows], labels[fit_rows])
+            if model_key:
+                shap_model_cache.put(model_key, model)
+
+        shap_values = shap.TreeExplainer(model).shap_values(X.iloc[explain_rows], check_additivity=False)
+        if len(cluster_ids) == 2:
+            # binary classifiers explain the log-odds of the second class only
+            shap_values = np.stack([-shap_values, shap_values], axis=-1)
+
+        results = {}
+        for position, cluster_id in enumerate(cluster_ids):
+            results[cluster_id] = cls._membership_importance(
+                X.columns, shap_values[..., position], labels[explain_rows] == position
+            )
+            if values_keys[cluster_id]:
+                shap_values_cache.put(values_keys[cluster_id], results[cluster_id])
+        return results
+
+    @classmethod
+    def _membership_inputs(
+        cls,
+        data_df: pd.DataFrame,
+        clusters: Dict[int, List[int]],
+        dataset_id: Optional[str],
+        exclude_features: Optional[List[str]],
+    ) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]:
+        """Shared normalized features, label positions (index into sorted cluster ids) and fit/explain row samples."""
+        normalized_data = cls.get_normalized_data(data_df, dataset_id)
+        X = normalized_data.select_dtypes(include=["number"]).drop(columns=exclude_features or [], errors="ignore")
+        if X.empty:
+            raise ValueError("No numerical columns found in the dataset")
+
+        labels = np.full(len(X), -1, dtype=np.int32)
+        for position, cluster_id in enumerate(sorted(clusters)):
+            labels[np.asarray(clusters[cluster_id], dtype=np.int64)] = position
+        if (labels < 0).any():
+            raise ValueError("Clusters do not cover all data points of the dataset")
+
+        order = np.random.default_rng(0).permutation(len(X))
+        fit_rows = np.sort(order[: CONFIG.CLUSTER_EXPLAIN_FIT_ROWS])
+        explain_rows = np.sort(order[: CONFIG.CLUSTER_EXPLAIN_ROWS])
+        return X, labels, fit_rows, explain_rows
+
+    @staticmethod
+    def _clusters_digest(clusters: Dict[int, List[int]], exclude_features: Optional[List[str]]) -> str:
+        """Identifies a clustering, the model settings and the explained features in cache keys."""
+        model_parameters = CONFIG.SHAP_MODEL_PARAMETERS.get(CONFIG.SHAP_MODEL)
+        settings = (CONFIG.SHAP_MODEL, model_parameters, sorted(exclude_features or []))
+        digest = hashlib.sha256(repr(settings).encode())
+        for cluster_id in sorted(clusters):
+            digest.update(int(cluster_id).to_bytes(8, "little", signed=True))
+            indices = np.sort(np.asarray(clusters[cluster_id], dtype="<i8"))
+            digest.update(len(indices).to_bytes(8, "little"))
+            digest.update(indices.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _membership_importance(features: pd.Index, shap_values: np.ndarray, is_member: np.ndarray) -> pd.DataFrame:
+        member_effect = shap_values[is_member].mean(axis=0) if is_member.any() else np.zeros(len(features))
+        return pd.DataFrame(
+            {"feature": features, "SHAP Value": np.abs(shap_values).mean(axis=0), "Member Effect": member_effect}
+        ).sort_values(by="SHAP Value", ascending=False)
@@ -0,0 +1,196 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from core.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STORE_PREFIX = "cif-store-"
+# dataset IDs, entry names and array keys are path components of the store
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class SharedEntry(NamedTuple):
+    meta: Dict[str, Any]
+    arrays: Dict[str, np.ndarray]
+
+
+def check_name(name: str) -> str:
+    """Return name if it is a valid dataset ID, entry name or array key, raise a ValueError otherwise."""
+    if not isinstance(name, str) or not NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"Invalid shared store name {name!r}")
+    return name
+
+
+def _base_directory() -> Optional[str]:
+    # /dev/shm is memory backed on Linux, elsewhere the page cache shares the mapped files
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def create_store_directory() -> Path:
+    """Create a directory for a new store, named after the creating process so it can be cleaned up if it dies."""
+    return Path(tempfile.mkdtemp(prefix=f"{STORE_PREFIX}{os.getpid()}-", dir=_base_directory()))
+
+
+def remove_stale_store_directories() -> None:
+    """Remove store directories left behind by server processes that no longer run."""
+    base = Path(_base_directory() or tempfile.gettempdir())
+    for path in base.glob(f"{STORE_PREFIX}*"):
+        try:
+            pid = int(path.name[len(STORE_PREFIX) :].split("-", 1)[0])
+            os.kill(pid, 0)
+        except ValueError:
+            continue
+        except ProcessLookupError:
+            logger.info(f"Removing stale shared store {path}")
+            shutil.rmtree(path, ignore_errors=True)
+        except PermissionError:
+            continue  # process of another user
+
+
+class SharedArrayStore:
+    """
+    Arrays shared by all worker processes of the server, memory-mapped from .npy files.
+
+    Entries are derived data of a dataset, such as decoded cluster labels or normalized numeric
+    matrices, stored as named arrays plus JSON metadata under <directory>/<dataset_id>/<name>/.
+    An entry is written to a temporary directory and published with an atomic rename, so readers
+    only see complete entries. Every process maps the same files read-only, so the operating system
+    keeps one copy in memory. Each lookup compares the entry's inode with the mapped one, so entries
+    replaced or invalidated by another worker are not served stale.
+
+    Without a directory (single process mode) the store creates its own and removes it on `close`.
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self._owned = directory is None
+        self._directory = Path(directory) if directory else None
+        self._mapped: Dict[Tuple[str, str], Tuple[int, SharedEntry]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        with self._lock:
+            if self._directory is None:
+                self._directory = create_store_directory()
+                logger.info(f"Created shared store {self._directory}")
+            return self._directory
+
+    def _path(self, dataset_id: str, name: str) -> Path:
+        return self.directory / check_name(dataset_id) / check_name(name)
+
+    def get(self, dataset_id: str, name: str) -> Optional[SharedEntry]:
+        if self._directory is None or not (NAME_PATTERN.fullmatch(dataset_id) and NAME_PATTERN.fullmatch(name)):
+            return None  # nothing stored yet, or nothing that could be
+        path = self._path(dataset_id, name)
+        try:
+            inode = path.stat().st_ino
+        except FileNotFoundError:
+            with self._lock:
+                self._mapped.pop((dataset_id, name), None)
+            return None
+
+        with self._lock:
+            mapped = self._mapped.get((dataset_id, name))
+        if mapped is not None and mapped[0] == inode:
+            return mapped[1]
+
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            arrays = {key: np.load(path / f"{key}.npy", mmap_mode="r") for key in meta["arrays"]}
+        except FileNotFoundError:
+            return None  # invalidated while mapping
+        entry = SharedEntry(meta["meta"], arrays)
+        with self._lock:
+            self._mapped[(dataset_id, name)] = (inode, entry)
+        return entry
+
+    def put(self, dataset_id: str, name: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> SharedEntry:
+        """Publish an entry and return it memory-mapped. If another worker published it first, that entry is kept."""
+        path = self._path(dataset_id, name)
+        for key in arrays:
+            check_name(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(prefix=f".{name}.", dir=path.parent))
+        try:
+            for key, array in arrays.items():
+                np.save(tmp_path / f"{key}.npy", np.asarray(array), allow_pickle=False)
+            (tmp_path / "meta.json").write_text(json.dumps({"arrays": list(arrays), "meta": meta}))
+            os.rename(tmp_path, path)
+        except OSError as e:
+            if not path.exists():
+                logger.warning(f"Could not publish shared {name} entry of {dataset_id}: {str(e)}")
+                return SharedEntry(meta, arrays)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        entry = self.get(dataset_id, name)
+        if entry is None:
+            # invalidated right after publishing, serve the computed arrays to this request
+            return SharedEntry(meta, arrays)
+        return entry
+
+    def entries(self, dataset_id: str) -> Dict[str, SharedEntry]:
+        """All entries of a dataset, by name."""
+        if self._directory is None:
+            return {}
+        try:
+            paths = list((self.directory / check_name(dataset_id)).iterdir())
+        except FileNotFoundError:
+            return {}
+        entries = {}
+        for name in [path.name for path in paths if not path.name.startswith(".")]:
+            entry = self.get(dataset_id, name)
+            if entry is not None:
+                entries[name] = entry
+        return entries
+
+    def invalidate(self, dataset_id: str, name: Optional[str] = None) -> None:
+        """Drop one entry, or all entries of a dataset, for every worker."""
+        if self._directory is None:
+            return
+        path = self.directory / check_name(dataset_id)
+        if name is not None:
+            path = path / check_name(name)
+        with self._lock:
+            for key in [key for key in self._mapped if key[0] == dataset_id and name in (None, key[1])]:
+                del self._mapped[key]
+        self._remove(path)
+
+    def clear(self) -> None:
+        if self._directory is None:
+            return
+        with self._lock:
+            self._mapped.clear()
+        for path in self.directory.iterdir():
+            self._remove(path)
+
+    def close(self) -> None:
+        """Unmap all entries, and remove the directory if this store created it."""
+        with self._lock:
+            self._mapped.clear()
+            directory, self._directory = self._directory, (None if self._owned else self._directory)
+        if self._owned and directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        # rename first, so other workers never map a partially deleted entry
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.deleted")
+        try:
+            os.rename(path, tmp_path)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+shared_store = SharedArrayStore(CONFIG.SHARED_STORE_DIR)
@@ -0,0 +1,88 @@
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+BUNDLE_MAGIC = b"CIFBNDL\0"
+BUNDLE_VERSION = 1
+BUNDLE_ALIGNMENT = 64  # arrays start at multiples of this offset, so they can be mapped and vectorized in place
+_PREAMBLE = struct.Struct("<8sIIQ")  # magic, version, reserved, header length
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // BUNDLE_ALIGNMENT) * BUNDLE_ALIGNMENT
+
+
+def write_bundle(path: str | Path, header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> int:
+    """
+    Write a bundle file: a JSON header followed by the arrays, each aligned to BUNDLE_ALIGNMENT bytes.
+
+    The header lists the dtype, shape and offset of every array under "arrays", next to the given
+    header fields. The file is written under a temporary name and renamed, so it is never seen partially written.
+
+    Returns:
+        int: Size of the file in bytes
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout, size = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": size}
+        size = _aligned(size + array.nbytes)
+    encoded = json.dumps({**header, "arrays": layout}).encode()
+    data_start = _aligned(_PREAMBLE.size + len(encoded))
+
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(encoded)))
+            f.write(encoded)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(memoryview(array.reshape(-1)).cast("B") if array.size else b"")
+            f.truncate(data_start + size)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return data_start + size
+
+
+def read_bundle(path: str | Path) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Read the header of a bundle file and map its arrays read-only, without copying them into memory.
+
+    Raises:
+        ValueError: If the file is not a bundle or was written by a newer version
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError("Not a bundle file")
+        magic, version, _, header_length = _PREAMBLE.unpack(preamble)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError("Not a bundle file")
+        if version > BUNDLE_VERSION:
+            raise ValueError(f"Bundle version {version} is not supported (at most {BUNDLE_VERSION})")
+        header = json.loads(f.read(header_length))
+
+    data_start = _aligned(_PREAMBLE.size + header_length)
+    file_size = os.path.getsize(path)
+    arrays = {}
+    try:
+        for name, spec in header.pop("arrays").items():
+            dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+            offset = data_start + spec["offset"]
+            if dtype.hasobject:
+                raise ValueError(f"Bundle array {name} has the unsupported type {dtype}")
+            if offset < data_start or offset + dtype.itemsize * int(np.prod(shape)) > file_size:
+                raise ValueError(f"Bundle is truncated, array {name} is incomplete")
+            if not np.prod(shape):
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"Bundle header is malformed: {str(e)}")
+    return header, arrays
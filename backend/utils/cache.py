@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import joblib
+
+from core.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def hash_parameters(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parameters, independent of dict key order."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def make_cache_key(dataset_id: str, *parts: Any) -> str:
+    """Cache key scoped to a dataset, so all entries of a dataset can be invalidated together."""
+    return f"{dataset_id}/{hash_parameters(*parts)}"
+
+
+class ResultCache:
+    """
+    Two-level LRU cache for expensive results such as fitted models or SHAP values.
+
+    Recently used entries are kept in memory (at most `max_memory_entries`). Every entry is
+    also persisted with joblib under CONFIG.CACHE_DIR/<name>/<dataset_id>/, so results survive
+    restarts and are shared between processes. The files of a cache are evicted least recently
+    used first once their total size exceeds `max_disk_bytes`.
+
+    The files are the source of truth: an entry in memory is only served while the file it was
+    read from or written to is still in place, so entries invalidated or replaced by another
+    process (e.g. another worker of serve.py) are not served from memory.
+    """
+
+    def __init__(self, name: str, max_memory_entries: int, max_disk_bytes: int) -> None:
+        self.name = name
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.directory = Path(CONFIG.CACHE_DIR) / name
+        # value and identity of its file (None if it could not be persisted)
+        self._memory: OrderedDict[str, Tuple[Any, Optional[Tuple[int, ...]]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.joblib"
+
+    @staticmethod
+    def _identity(stat: os.stat_result) -> Tuple[int, ...]:
+        # files are replaced, never rewritten in place, and reads only touch their access time
+        return stat.st_dev, stat.st_ino, stat.st_mtime_ns
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None:
+            value, identity = entry
+            try:
+                current = self._identity(path.stat()) if identity is not None else None
+            except FileNotFoundError:
+                current = None
+            if current == identity:
+                with self._lock:
+                    if key in self._memory:
+                        self._memory.move_to_end(key)
+                return value
+            with self._lock:
+                self._memory.pop(key, None)
+
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                value = joblib.load(f)
+            # mark as recently used for disk eviction, keeping the modification time of the identity
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+            identity = self._identity(stat)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable {self.name} cache entry {key}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+
+        self._remember(key, value, identity)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        identity = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            joblib.dump(value, tmp_path)
+            identity = self._identity(tmp_path.stat())  # a rename keeps the identity
+            os.replace(tmp_path, path)  # atomic, concurrent readers never see partial files
+            self._evict_disk()
+        except Exception as e:
+            logger.warning(f"Could not persist {self.name} cache entry {key}: {str(e)}")
+        self._remember(key, value, identity)
+
+    def invalidate(self, dataset_id: str) -> None:
+        """Drop all entries of a dataset from memory and disk."""
+        with self._lock:
+            for key in [key for key in self._memory if key.startswith(f"{dataset_id}/")]:
+                del self._memory[key]
+        shutil.rmtree(self.directory / dataset_id, ignore_errors=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _remember(self, key: str, value: Any, identity: Optional[Tuple[int, ...]]) -> None:
+        with self._lock:
+            self._memory[key] = (value, identity)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        files = []
+        for path in self.directory.glob("*/*.joblib"):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                continue  # removed concurrently
+        total = sum(stat.st_size for _, stat in files)
+        if total <= self.max_disk_bytes:
+            return
+
+        for path, stat in sorted(files, key=lambda item: item[1].st_atime):
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+            if total <= self.max_disk_bytes:
+                break
+        logger.info(f"Evicted {self.name} cache entries down to {total} bytes on disk")
@@ -0,0 +1,132 @@
+import math
+from functools import reduce
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.config import CONFIG
+from utils.fingerprint import column_kinds
+
+ColumnSummaries = Dict[str, Any]
+
+
+def histogram_grid(bins: Tuple[int, ...]) -> int:
+    """Finest bin count that every histogram resolution divides, so each is a sum of adjacent grid bins."""
+    return reduce(lambda a, b: a * b // math.gcd(a, b), bins, 1)
+
+
+def filled_counts(report: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, int]:
+    """Values per column filled by the sanitization, from its report (see `utils.data_utils.sanitize_dataset`)."""
+    return {col: info.get("filled", 0) for col, info in (report or {}).items()}
+
+
+def summarize_columns(df: pd.DataFrame, missing: Optional[Dict[str, int]] = None) -> ColumnSummaries:
+    """
+    Statistics and histograms of every column, computed once and served instead of the full dataset.
+
+    Numeric columns are summarized together in one block: count, min, max, mean, std, the quantiles
+    in CONFIG.SUMMARY_QUANTILES, and equal-width histograms from min to max at each resolution in
+    CONFIG.SUMMARY_HISTOGRAM_BINS. The values are binned once, by a single bincount over all columns,
+    on the finest grid that every resolution divides; each resolution sums adjacent grid bins.
+    Other columns get their number of distinct values and the CONFIG.SUMMARY_TOP_VALUES most frequent ones.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Sanitized dataset
+    missing : Optional[Dict[str, int]]
+        Values per column that were missing or invalid and filled by the sanitization (see its report),
+        added to the nulls still in df
+
+    Returns
+    -------
+    ColumnSummaries
+        Row count, histogram resolutions and a summary per column
+    """
+    missing = missing or {}
+    kinds = column_kinds(df)
+    numeric_cols = [col for col in df.columns if kinds[col] == "numeric"]
+    n_rows = len(df)
+    columns: Dict[str, Dict[str, Any]] = {}
+
+    for col in df.columns:
+        if kinds[col] == "numeric":
+            continue
+        values = df[col]
+        counts = values.value_counts(dropna=True)
+        columns[col] = {
+            "type": "string" if kinds[col] == "string" else "empty",
+            "count": int(counts.sum()),
+            "missing": int(values.isna().sum()) + missing.get(col, 0),
+            "distinct": len(counts),
+            "top": [[str(value), int(count)] for value, count in counts.head(CONFIG.SUMMARY_TOP_VALUES).items()],
+        }
+
+    if numeric_cols:
+        # column-major, so reductions and quantiles run over contiguous columns
+        block = np.empty((n_rows, len(numeric_cols)), dtype=np.float64, order="F")
+        for i, col in enumerate(numeric_cols):
+            block[:, i] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        nan_counts = np.isnan(block).sum(axis=0)
+        counts = n_rows - nan_counts
+        has_values = counts > 0
+        mins, maxs, means, stds = (np.zeros(len(numeric_cols)) for _ in range(4))
+        quantiles = np.full((len(CONFIG.SUMMARY_QUANTILES), len(numeric_cols)), np.nan)
+
+        # sanitized numeric columns are complete, columns with NaN take the slower NaN-aware path
+        complete = nan_counts == 0
+        if n_rows and complete.any():
+            values = block[:, complete]
+            mins[complete], maxs[complete] = values.min(axis=0), values.max(axis=0)
+            means[complete], stds[complete] = values.mean(axis=0), values.std(axis=0)
+            # column by column: a partition of a contiguous column is faster than one over the block axis
+            for i in np.flatnonzero(complete):
+                quantiles[:, i] = np.quantile(block[:, i], CONFIG.SUMMARY_QUANTILES)
+        partial = has_values & ~complete
+        if partial.any():
+            values = block[:, partial]
+            mins[partial], maxs[partial] = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+            means[partial], stds[partial] = np.nanmean(values, axis=0), np.nanstd(values, axis=0)
+            quantiles[:, partial] = np.nanquantile(values, CONFIG.SUMMARY_QUANTILES, axis=0)
+
+        # grid bin of every value, offset per column so one bincount counts all columns
+        grid = histogram_grid(CONFIG.SUMMARY_HISTOGRAM_BINS)
+        scales = grid / np.where(maxs > mins, maxs - mins, 1.0)
+        positions = np.empty(block.shape, dtype=np.int64, order="F")
+        for i in range(len(numeric_cols)):
+            scaled = (block[:, i] - mins[i]) * scales[i]
+            np.clip(scaled, 0, grid - 1, out=scaled)
+            scaled += i * grid
+            positions[:, i] = np.nan_to_num(scaled, nan=-1)  # NaN is not counted
+        positions = positions.ravel(order="F")
+        grid_counts = np.bincount(positions[positions >= 0], minlength=len(numeric_cols) * grid).reshape(-1, grid)
+        del block, positions
+
+        for i, col in enumerate(numeric_cols):
+            summary: Dict[str, Any] = {
+                "type": "numeric",
+                "count": int(counts[i]),
+                "missing": int(n_rows - counts[i]) + missing.get(col, 0),
+            }
+            if has_values[i]:
+                summary.update(
+                    {
+                        "min": float(mins[i]),
+                        "max": float(maxs[i]),
+                        "mean": float(means[i]),
+                        "std": float(stds[i]),
+                        "quantiles": {str(q): float(quantiles[j, i]) for j, q in enumerate(CONFIG.SUMMARY_QUANTILES)},
+                        "histograms": {
+                            str(bins): grid_counts[i].reshape(bins, grid // bins).sum(axis=1).tolist()
+                            for bins in CONFIG.SUMMARY_HISTOGRAM_BINS
+                        },
+                    }
+                )
+            columns[col] = summary
+
+    return {
+        "rows": n_rows,
+        "histogram_bins": list(CONFIG.SUMMARY_HISTOGRAM_BINS),
+        "columns": {col: columns[col] for col in df.columns},
+    }
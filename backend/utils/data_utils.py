@@ -1,20 +1,234 @@
-import json
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 
+from core.config import CONFIG
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-def sanitize_and_parse_dataset(data: List[Dict[str, Any]]) -> pd.DataFrame:
+SanitizationReport = Dict[str, Dict[str, Any]]
+
+
+def _to_numeric_block(df: pd.DataFrame, columns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse `columns` of `df` as numbers into one Fortran-ordered float64 array.
+    Columns with a numeric dtype are copied directly. All other columns are factorized together
+    and only their distinct values are parsed, in a single `pd.to_numeric` call.
+    Invalid and non-finite values become NaN.
+
+    Returns the parsed block and the number of non-null input values per column.
+    """
+    parsed = np.empty((len(df), len(columns)), dtype=np.float64, order="F")
+    non_null = np.zeros(len(columns), dtype=np.int64)
+
+    # column-wise access, selecting all columns at once would consolidate them into a temporary copy
+    object_positions = []
+    for i, col in enumerate(columns):
+        if pd.api.types.is_numeric_dtype(df[col].dtype):
+            parsed[:, i] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            non_null[i] = len(df) - np.isnan(parsed[:, i]).sum()
+        else:
+            object_positions.append(i)
+
+    if object_positions:
+        values = np.concatenate([df[columns[i]].to_numpy(dtype=object) for i in object_positions])
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        unique_values = np.append(np.asarray(pd.to_numeric(uniques, errors="coerce"), dtype=np.float64), np.nan)
+        codes = codes.reshape((len(df), len(object_positions)), order="F")
+        parsed[:, object_positions] = unique_values[codes]
+        non_null[object_positions] = (codes != -1).sum(axis=0)
+
+    parsed[~np.isfinite(parsed)] = np.nan
+    return parsed, non_null
+
+
+def infer_column_types(df: pd.DataFrame, column_types: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Classify the columns of `df` as "numeric" or "string" in one vectorized pass over a row sample.
+
+    A column is numeric if it already has a numeric dtype, or if at least
+    CONFIG.SANITIZE_NUMERIC_THRESHOLD of its sampled non-null values parse as numbers.
+    Columns that are entirely null in the sample stay unclassified.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame to analyze
+    column_types : Optional[Dict[str, str]]
+        Already known column types, these columns are not inspected again
+
+    Returns
+    -------
+    Dict[str, str]
+        Known and newly inferred column types
+    """
+    column_types = dict(column_types or {})
+    pending = [col for col in df.columns if col not in column_types]
+    if not pending:
+        return column_types
+
+    sample = df[pending]
+    if len(sample) > CONFIG.SANITIZE_SAMPLE_ROWS:
+        sample = sample.sample(n=CONFIG.SANITIZE_SAMPLE_ROWS, random_state=0)
+
+    non_null = sample.notna().sum().to_numpy()
+    has_numeric_dtype = np.array(
+        [pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in sample.dtypes],
+        dtype=bool,
+    )
+    parsed_counts = np.zeros(len(pending), dtype=np.int64)
+    if not has_numeric_dtype.all():
+        parsed, _ = _to_numeric_block(sample, [col for col, is_num in zip(pending, has_numeric_dtype) if not is_num])
+        parsed_counts[~has_numeric_dtype] = (~np.isnan(parsed)).sum(axis=0)
+
+    for col, count, numeric_dtype, parsed_count in zip(pending, non_null, has_numeric_dtype, parsed_counts):
+        if count == 0:
+            continue
+        if numeric_dtype or parsed_count >= CONFIG.SANITIZE_NUMERIC_THRESHOLD * count:
+            column_types[col] = "numeric"
+        else:
+            column_types[col] = "string"
+
+    return column_types
+
+
+def _to_categorical(values: pd.Series) -> pd.Categorical:
+    """Convert a column to a categorical of strings, missing values become the empty string."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    categories = pd.Index(uniques).astype(str)
+    if (codes == -1).any():
+        if "" not in categories:
+            categories = categories.append(pd.Index([""]))
+        codes = np.where(codes == -1, categories.get_loc(""), codes)
+    if categories.has_duplicates:
+        # different raw values (e.g. 5 and "5") can share a string representation
+        codes, categories = pd.factorize(categories[codes])
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _coerce_columns(
+    df: pd.DataFrame, column_types: Dict[str, str]
+) -> Tuple[pd.DataFrame, np.ndarray, List[str], Dict[str, int]]:
+    """
+    Convert classified columns: numeric columns are parsed into one float64 block (NaN kept),
+    string columns become categoricals. Unclassified columns are left untouched.
+
+    Returns the frame of string/unclassified columns, the numeric block, its column names
+    and the number of non-null values per numeric column that could not be parsed.
+    """
+    numeric_cols = [col for col in df.columns if column_types.get(col) == "numeric"]
+    string_cols = [col for col in df.columns if column_types.get(col) == "string"]
+
+    numeric_block, non_null = _to_numeric_block(df, numeric_cols)
+    coerced = non_null - (~np.isnan(numeric_block)).sum(axis=0)
+
+    others = pd.DataFrame(
+        {
+            col: _to_categorical(df[col]) if col in string_cols else df[col]
+            for col in df.columns
+            if col not in numeric_cols
+        },
+        index=df.index,
+        copy=False,
+    )
+
+    return others, numeric_block, numeric_cols, dict(zip(numeric_cols, coerced.tolist()))
+
+
+def _column_means(numeric_block: np.ndarray) -> np.ndarray:
+    """Column means of a numeric block ignoring NaN, 0 for columns without any value."""
+    sums = np.nansum(numeric_block, axis=0)
+    counts = (~np.isnan(numeric_block)).sum(axis=0)
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def _fill_and_compact(
+    others: pd.DataFrame,
+    numeric_block: np.ndarray,
+    numeric_cols: List[str],
+    column_order: List[str],
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Replace NaN in the numeric block with the column means, store every numeric column as
+    float32 if that is lossless (float64 otherwise) and reassemble the columns in order.
+    """
+    missing = np.isnan(numeric_block)
+    filled_counts = missing.sum(axis=0)
+    if missing.any():
+        np.copyto(numeric_block, _column_means(numeric_block)[np.newaxis, :], where=missing)
+    del missing
+
+    as_float32 = numeric_block.astype(np.float32, order="F")
+    lossless = (as_float32 == numeric_block).all(axis=0)
+    positions = {col: i for i, col in enumerate(numeric_cols)}
+
+    columns = {}
+    for col in column_order:
+        if col in positions:
+            i = positions[col]
+            columns[col] = as_float32[:, i] if lossless[i] else numeric_block[:, i]
+        else:
+            columns[col] = others[col]
+
+    # columns are views into the compact blocks, avoid consolidating them into new copies
+    df = pd.DataFrame(columns, index=others.index, copy=False)
+    return df, dict(zip(numeric_cols, filled_counts.tolist()))
+
+
+def _build_report(
+    df: pd.DataFrame, column_types: Dict[str, str], coerced: Dict[str, int], filled: Dict[str, int]
+) -> SanitizationReport:
+    return {
+        col: {
+            "type": column_types.get(col, "empty"),
+            "dtype": str(df[col].dtype),
+            "coerced": coerced.get(col, 0),
+            "filled": filled.get(col, 0),
+        }
+        for col in df.columns
+    }
+
+
+def sanitize_dataset(data: List[Dict[str, Any]] | pd.DataFrame) -> Tuple[pd.DataFrame, SanitizationReport]:
     """
     Convert raw JSON data to a pandas DataFrame and sanitize it by:
-    1. Converting to appropriate data types
-    2. Handling null/missing values
-    3. Replacing invalid numeric values
+    1. Inferring column types over a row sample
+    2. Replacing invalid and missing numeric values with the column mean (0 if there is none)
+    3. Storing numeric columns as float32 where lossless and string columns as categoricals
+
+    Parameters
+    ----------
+    data : List[Dict[str, Any]] | pd.DataFrame
+        List of dictionaries (or a DataFrame) containing the dataset
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, SanitizationReport]
+        Sanitized pandas DataFrame and per-column type, dtype, coerced and filled value counts
+    """
+    try:
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+
+        column_types = infer_column_types(df)
+        others, numeric_block, numeric_cols, coerced = _coerce_columns(df, column_types)
+
+        df, filled = _fill_and_compact(others, numeric_block, numeric_cols, list(df.columns))
+
+        logger.info(f"Successfully sanitized dataset with {len(df)} rows and {len(df.columns)} columns")
+        return df, _build_report(df, column_types, coerced, filled)
+
+    except Exception as e:
+        logger.error(f"Error sanitizing dataset: {str(e)}")
+        raise RuntimeError(f"Failed to sanitize dataset: {str(e)}")
+
+
+def sanitize_and_parse_dataset(data: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Convert raw JSON data to a sanitized pandas DataFrame, see `sanitize_dataset`.
 
     Parameters
     ----------
@@ -26,50 +240,111 @@ def sanitize_and_parse_dataset(data: List[Dict[str, Any]]) -> pd.DataFrame:
     pd.DataFrame
         Sanitized pandas DataFrame
     """
+    df, _ = sanitize_dataset(data)
+    return df
+
+
+def _iter_file_chunks(path: str, file_format: Literal["csv", "parquet"], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if file_format == "csv":
+        with pd.read_csv(path, chunksize=chunk_rows, skipinitialspace=True) as reader:
+            yield from reader
+    elif file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet uploads require the optional 'pyarrow' package")
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def read_and_sanitize_file(
+    path: str, file_format: Literal["csv", "parquet"], chunk_rows: Optional[int] = None
+) -> Tuple[pd.DataFrame, SanitizationReport]:
+    """
+    Read a CSV or Parquet file in row chunks and sanitize each chunk as it is read.
+
+    The type of a column is inferred on the first chunk in which it has values and kept for the
+    later chunks, unlike `sanitize_dataset`, which samples rows across the whole frame: a column that
+    is numeric in that chunk and text further down stays numeric, and its text values are coerced.
+    Missing and coerced values are filled with the column means over all rows (empty rows included).
+
+    Only one chunk is held as raw values. The parsed chunks (float64 numbers and categorical codes)
+    are kept until the file is read and then copied into one numeric block, so the peak memory is
+    about twice the parsed numeric data, plus a raw chunk.
+
+    Parameters
+    ----------
+    path : str
+        Path of the uploaded file on disk
+    file_format : Literal["csv", "parquet"]
+        Format of the file
+    chunk_rows : Optional[int]
+        Number of rows per chunk, defaults to CONFIG.UPLOAD_READ_CHUNK_ROWS
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, SanitizationReport]
+        Sanitized pandas DataFrame and per-column type, dtype, coerced and filled value counts
+    """
     try:
-        df = pd.DataFrame(data)
+        column_types: Dict[str, str] = {}
+        coerced: Dict[str, int] = {}
+        numeric_chunks: List[Dict[str, np.ndarray]] = []
+        other_chunks: List[pd.DataFrame] = []
+        column_order: List[str] = []
+
+        for chunk in _iter_file_chunks(path, file_format, chunk_rows or CONFIG.UPLOAD_READ_CHUNK_ROWS):
+            chunk = chunk.reset_index(drop=True)
+            column_order = column_order or list(chunk.columns)
+            column_types = infer_column_types(chunk, column_types)
 
-        numeric_cols = []
-        string_cols = []
+            others, numeric_block, numeric_cols, chunk_coerced = _coerce_columns(chunk, column_types)
+            for col, count in chunk_coerced.items():
+                coerced[col] = coerced.get(col, 0) + count
+            numeric_chunks.append(dict(zip(numeric_cols, numeric_block.T)))
+            other_chunks.append(others)
 
-        for col in df.columns:
-            if df[col].isna().all():
+        if not other_chunks:
+            raise ValueError("No data found in file")
+
+        # Columns classified only in a later chunk are all null in the earlier ones
+        numeric_cols = [col for col in column_order if column_types.get(col) == "numeric"]
+        n_rows = sum(len(others) for others in other_chunks)
+        numeric_block = np.full((n_rows, len(numeric_cols)), np.nan, order="F")
+        offset = 0
+        for rows_in_chunk in [len(others) for others in other_chunks]:
+            block = numeric_chunks.pop(0)
+            for i, col in enumerate(numeric_cols):
+                if col in block:
+                    numeric_block[offset : offset + rows_in_chunk, i] = block[col]
+            offset += rows_in_chunk
+            del block
+
+        other_columns = {}
+        for col in column_order:
+            col_type = column_types.get(col)
+            if col_type == "numeric":
                 continue
-            # try to convert to numeric and see if it works
-            try:
-                non_null_values = df[col].dropna()
-                if len(non_null_values) > 0:
-                    # Try converting a sample
-                    pd.to_numeric(non_null_values.iloc[0])
-                    numeric_cols.append(col)
-                else:
-                    string_cols.append(col)
-            except (ValueError, TypeError):
-                string_cols.append(col)
-
-        # Handle numeric columns - convert to float and fill NaN
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors="coerce")  # Convert non-numeric values to NaN
-
-            # Replace NaN with column mean or 0 if all NaN
-            if df[col].isna().any():
-                mean_val = df[col].mean()
-                if pd.isna(mean_val):  # All values are NaN
-                    df[col] = df[col].fillna(0)
-                else:
-                    df[col] = df[col].fillna(mean_val)
-
-        # Handle string columns - fill NaN with empty string
-        for col in string_cols:
-            df[col] = df[col].fillna("")
-            df[col] = df[col].astype(str)
+            parts = [others.pop(col) for others in other_chunks]
+            if col_type == "string":
+                parts = [p if isinstance(p.dtype, pd.CategoricalDtype) else _to_categorical(p) for p in parts]
+                other_columns[col] = union_categoricals(parts)
+            else:
+                other_columns[col] = pd.concat(parts, ignore_index=True)
+        other_frame = pd.DataFrame(other_columns, index=pd.RangeIndex(n_rows))
 
-        logger.info(f"Successfully sanitized dataset with {len(df)} rows and {len(df.columns)} columns")
-        return df
+        df, filled = _fill_and_compact(other_frame, numeric_block, numeric_cols, column_order)
+
+        logger.info(f"Successfully read {file_format} file with {len(df)} rows and {len(df.columns)} columns")
+        return df, _build_report(df, column_types, coerced, filled)
 
     except Exception as e:
-        logger.error(f"Error sanitizing dataset: {str(e)}")
-        raise RuntimeError(f"Failed to sanitize dataset: {str(e)}")
+        logger.error(f"Error reading dataset file: {str(e)}")
+        raise RuntimeError(f"Failed to read dataset file: {str(e)}")
 
 
 def dataframe_to_dict_list(df: pd.DataFrame) -> List[Dict[str, Any]]:
@@ -87,9 +362,17 @@ def dataframe_to_dict_list(df: pd.DataFrame) -> List[Dict[str, Any]]:
     List[Dict[str, Any]]
         List of dictionaries with all values JSON serializable
     """
-    # Convert to dict and handle any remaining NaN values
-    dict_list = json.loads(df.replace({np.nan: None}).to_json(orient="records"))
-    return dict_list
+    # Handle any remaining NaN values, to_dict keeps full float precision unlike a to_json round trip
+    nan_columns = df.columns[df.isna().any()]
+    if len(nan_columns) > 0:
+        df = df.copy(deep=False)
+        df[nan_columns] = df[nan_columns].astype(object).where(df[nan_columns].notna(), None)
+    return df.to_dict(orient="records")
+
+
+def canonical_pair(feature1: str, feature2: str) -> Tuple[str, str]:
+    """Feature pairs are stored and looked up in sorted order, so (b, a) and (a, b) are the same pair."""
+    return (feature1, feature2) if feature1 <= feature2 else (feature2, feature1)
 
 
 def get_numeric_columns(df: pd.DataFrame) -> List[str]:
@@ -0,0 +1,99 @@
+import hashlib
+from typing import Dict, Literal, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.config import CONFIG
+
+ColumnKind = Literal["numeric", "string", "empty"]
+
+FINGERPRINT_VERSION = b"clusters-in-focus/dataset-fingerprint/v2"
+
+
+def column_kinds(df: pd.DataFrame) -> Dict[str, ColumnKind]:
+    """
+    Classify columns for fingerprinting by dtype: numeric dtypes are "numeric", entirely null
+    columns are "empty" and everything else is "string". A sanitized frame and a frame rebuilt
+    from its stored JSON records get the same kinds.
+    """
+    kinds: Dict[str, ColumnKind] = {}
+    for col in df.columns:
+        if df[col].isna().all():
+            kinds[col] = "empty"
+        elif pd.api.types.is_numeric_dtype(df[col].dtype) and not pd.api.types.is_bool_dtype(df[col].dtype):
+            kinds[col] = "numeric"
+        else:
+            kinds[col] = "string"
+    return kinds
+
+
+def _length_prefixed(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    return len(encoded).to_bytes(4, "little") + encoded
+
+
+class FingerprintHasher:
+    """
+    Incremental sha256 fingerprint of a dataset over a canonical columnar byte representation.
+
+    Every column has its own hasher that is fed row blocks in order: numeric columns as
+    little-endian float64, string columns as length-prefixed UTF-8. The final digest covers
+    the format version, the row count and each column's name, kind and digest, so it does not
+    depend on how the rows were split into blocks or on the in-memory dtypes.
+    """
+
+    def __init__(self, kinds: Dict[str, ColumnKind]) -> None:
+        self.kinds = kinds
+        self.rows = 0
+        self._hashers = {col: hashlib.sha256() for col, kind in kinds.items() if kind != "empty"}
+
+    def update(self, block: pd.DataFrame) -> None:
+        """Feed the next block of rows, columns are matched by name."""
+        for col, hasher in self._hashers.items():
+            if self.kinds[col] == "numeric":
+                values = block[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                hasher.update(np.ascontiguousarray(values, dtype="<f8").tobytes())
+            else:
+                values = block[col]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+                else:
+                    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+                # encode each distinct value once, missing values (code -1) hash as the empty string
+                encoded = np.array([_length_prefixed(str(u)) for u in uniques] + [_length_prefixed("")], dtype=object)
+                hasher.update(b"".join(encoded[codes].tolist()))
+        self.rows += len(block)
+
+    def hexdigest(self) -> str:
+        digest = hashlib.sha256(FINGERPRINT_VERSION)
+        digest.update(self.rows.to_bytes(8, "little"))
+        for col, kind in self.kinds.items():
+            digest.update(_length_prefixed(str(col)))
+            digest.update(_length_prefixed(kind))
+            if kind != "empty":
+                digest.update(self._hashers[col].digest())
+        return digest.hexdigest()
+
+
+def fingerprint_dataframe(df: pd.DataFrame, block_rows: Optional[int] = None) -> str:
+    """
+    Fingerprint a (sanitized) DataFrame block by block without serializing it.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame to fingerprint
+    block_rows : Optional[int]
+        Number of rows hashed at a time, defaults to CONFIG.FINGERPRINT_BLOCK_ROWS
+
+    Returns
+    -------
+    str
+        Hex digest identifying the dataset content
+    """
+    block_rows = block_rows or CONFIG.FINGERPRINT_BLOCK_ROWS
+    hasher = FingerprintHasher(column_kinds(df))
+    for start in range(0, len(df), block_rows):
+        hasher.update(df.iloc[start : start + block_rows])
+    return hasher.hexdigest()
@@ -0,0 +1,140 @@
+from typing import Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+
+HeatmapStatistic = Literal["mean", "median"]
+
+
+def pyramid_block_sizes(n_rows: int, factor: int, tile_rows: int) -> List[int]:
+    """
+    Rows per block of every zoom level, from the coarsest, which fits in one tile, to the rows themselves.
+    Each level aggregates factor times more rows per block than the next.
+    """
+    sizes = [1]
+    while -(-n_rows // sizes[-1]) > tile_rows:
+        sizes.append(sizes[-1] * factor)
+    return sizes[::-1]
+
+
+def column_ranges(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Minimum and range of every column, the heatmap colors span each column from its minimum to its maximum."""
+    if not len(values):
+        return np.zeros(values.shape[1]), np.zeros(values.shape[1])
+    mins = values.min(axis=0)
+    return mins, values.max(axis=0) - mins
+
+
+def normalize_rows(values: np.ndarray, mins: np.ndarray, ranges: np.ndarray) -> np.ndarray:
+    """Rows scaled to [0, 1] per column, 0.5 for constant columns (as the Data Panel heatmap colors them)."""
+    scaled = (values - mins) / np.where(ranges > 0, ranges, 1.0)
+    scaled[:, ranges <= 0] = 0.5
+    return scaled.astype(np.float32)
+
+
+def _block_sums(values: np.ndarray, size: int) -> np.ndarray:
+    """Column sums of every size consecutive rows, the last block may hold fewer rows."""
+    full = len(values) // size
+    sums = values[: full * size].reshape(full, size, -1).sum(axis=1)
+    if full * size < len(values):
+        sums = np.vstack([sums, values[full * size :].sum(axis=0)])
+    return sums
+
+
+def _block_medians(columns: np.ndarray, size: int) -> np.ndarray:
+    """
+    Medians of every size consecutive rows, the last block may hold fewer rows.
+    Takes the rows column-major, shape (columns, rows), and sorts its blocks in place.
+    """
+    full = columns.shape[1] // size
+    # each block is contiguous, sorting it is faster than np.median's partition over the row axis
+    blocks = columns[:, : full * size].reshape(len(columns), full, size)
+    blocks.sort(axis=2)
+    medians = (blocks[:, :, (size - 1) // 2] + blocks[:, :, size // 2]) / 2
+    if full * size < columns.shape[1]:
+        medians = np.hstack([medians, np.median(columns[:, full * size :], axis=1, keepdims=True)])
+    return medians.T
+
+
+def build_pyramid(
+    values: np.ndarray,
+    statistic: HeatmapStatistic,
+    factor: int,
+    tile_rows: int,
+    chunk_columns: int,
+    order: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Aggregated heatmap levels of a numeric matrix, see pyramid_block_sizes.
+
+    Rows (reordered by `order`, if given) are aggregated into blocks of consecutive rows by their mean
+    or median, the last block of a level may hold fewer rows. Means are built level by level from the
+    sums of the next finer one, medians from the rows of each block. Both commute with the per column
+    normalization, which is applied to the aggregates only. Columns are processed chunk_columns at a
+    time, which bounds the temporary memory.
+
+    Returns:
+        Dict with the column "mins" and "ranges", and all aggregated "levels" (without the rows
+        themselves) stacked from the coarsest, level l in rows level_offsets[l]:level_offsets[l + 1]
+    """
+    n_rows, n_columns = values.shape
+    mins, ranges = column_ranges(values)
+    sizes = pyramid_block_sizes(n_rows, factor, tile_rows)[:-1]
+    counts = [np.minimum(size, n_rows - np.arange(0, n_rows, size))[:, None] for size in sizes]
+    level_offsets = np.concatenate([[0], np.cumsum([len(c) for c in counts])]).astype(np.int64)
+    levels = np.empty((int(level_offsets[-1]), n_columns), dtype=np.float32)
+
+    for start in range(0, n_columns, chunk_columns):
+        columns = slice(start, min(start + chunk_columns, n_columns))
+        rows = values[:, columns] if order is None else values[order, columns]
+        if statistic == "mean":
+            sums, finer = np.ascontiguousarray(rows), 1
+        else:
+            sorted_columns = np.array(rows.T, order="C")
+        # from the finest level up, so the sums of each level are built from those of the previous one
+        for level in range(len(sizes) - 1, -1, -1):
+            size = sizes[level]
+            if statistic == "mean":
+                sums, finer = _block_sums(sums, size // finer), size
+                aggregates = sums / counts[level]
+            else:
+                aggregates = _block_medians(sorted_columns, size)
+            target = slice(level_offsets[level], level_offsets[level + 1])
+            levels[target, columns] = normalize_rows(aggregates, mins[columns], ranges[columns])
+
+    return {"mins": mins, "ranges": ranges, "levels": levels, "level_offsets": level_offsets}
+
+
+def cluster_order(labels: np.ndarray, n_labels: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rows grouped by label, in their original order within each label.
+
+    Returns:
+        Tuple of the row order and the first position of each label in it (plus the number of rows)
+    """
+    order = np.argsort(labels, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_labels))])
+    return order, starts
+
+
+def heatmap_tile(
+    values: np.ndarray,
+    pyramid: Dict[str, np.ndarray],
+    level: int,
+    first_block: int,
+    n_blocks: int,
+    columns: slice,
+    block_sizes: List[int],
+) -> np.ndarray:
+    """
+    Normalized values of n_blocks blocks from first_block of a zoom level (see build_pyramid), for the columns.
+    The finest level is read from the rows themselves, reordered by the pyramid's "order" if it has one.
+    """
+    if level == len(block_sizes) - 1:
+        rows = slice(first_block, min(first_block + n_blocks, len(values)))
+        if "order" in pyramid:
+            rows = pyramid["order"][rows]
+        return normalize_rows(values[rows, columns], pyramid["mins"][columns], pyramid["ranges"][columns])
+
+    offsets = pyramid["level_offsets"]
+    start = offsets[level] + first_block
+    return np.asarray(pyramid["levels"][start : min(start + n_blocks, offsets[level + 1]), columns])
@@ -0,0 +1,80 @@
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Any, Dict, List
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_lazy_modules: Dict[str, "LazyModule"] = {}
+
+
+class LazyModule(ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Heavy libraries (shap, xgboost, lightgbm, sklearn, scipy) take seconds to import, so modules
+    bind them with `lazy_import` and the server starts without loading them. The first request
+    that uses one pays its import, unless `warm_up` has loaded it in the background before.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    logger.info(f"Imported {self.__name__} in {time.perf_counter() - start:.2f}s")
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> Any:
+    """Return a module proxy for `name` that imports the module when it is first used."""
+    if name not in _lazy_modules:
+        _lazy_modules[name] = LazyModule(name)
+    return _lazy_modules[name]
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Import all modules registered with `lazy_import`.
+
+    Returns:
+        Dict[str, float]: Seconds spent importing each module that was not loaded yet
+    """
+    timings = {}
+    for name, module in list(_lazy_modules.items()):
+        if module.loaded:
+            continue
+        start = time.perf_counter()
+        try:
+            module._load()
+        except ImportError as e:
+            # optional backends (e.g. lightgbm when SHAP_MODEL is xgboost) may be missing
+            logger.warning(f"Could not import {name} during warm-up: {str(e)}")
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def import_status() -> Dict[str, bool]:
+    """Whether each lazily imported module has been loaded."""
+    return {name: module.loaded for name, module in _lazy_modules.items()}
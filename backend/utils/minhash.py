@@ -0,0 +1,86 @@
+import math
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# hash functions h(x) = (a * x + b) mod p with the Mersenne prime p = 2^31 - 1; for point indices
+# below 2^32, a * x + b fits in 64 bits and the hash values fit in 32 bits
+MINHASH_PRIME = (1 << 31) - 1
+MINHASH_EMPTY = np.uint32(MINHASH_PRIME)  # signature value of empty sets, above every hash value
+HASH_CHUNK_ELEMENTS = 1 << 22  # hash values computed at a time, bounds the temporary memory
+
+
+def _hash_parameters(num_perm: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+    return np.stack([a, b])
+
+
+def minhash_signatures(indices: np.ndarray, offsets: np.ndarray, num_perm: int, seed: int) -> np.ndarray:
+    """
+    MinHash signatures of sets stored back to back: set k is `indices[offsets[k]:offsets[k + 1]]`.
+
+    The fraction of equal signature values of two sets is an unbiased estimate of their Jaccard
+    index. The same (num_perm, seed) must be used for signatures that are compared.
+
+    Returns:
+        np.ndarray: uint32 array of shape (number of sets, num_perm)
+    """
+    n_sets = len(offsets) - 1
+    signatures = np.full((n_sets, num_perm), MINHASH_EMPTY, dtype=np.uint32)
+    sizes = np.diff(offsets)
+    if not n_sets or not sizes.sum():
+        return signatures
+
+    a, b = _hash_parameters(num_perm, seed)
+    owners = np.repeat(np.arange(n_sets), sizes)
+    chunk = max(1, HASH_CHUNK_ELEMENTS // num_perm)
+    for start in range(0, len(owners), chunk):
+        points = np.asarray(indices[start : start + chunk], dtype=np.uint64)
+        chunk_owners = owners[start : start + chunk]
+        hashes = ((points[:, None] * a + b) % MINHASH_PRIME).astype(np.uint32)
+        # minimum per set within the chunk, sets spanning chunk boundaries are combined below
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(chunk_owners)) + 1])
+        sets = chunk_owners[starts]
+        signatures[sets] = np.minimum(signatures[sets], np.minimum.reduceat(hashes, starts, axis=0))
+    return signatures
+
+
+def minhash_signatures_of(sets: List[Sequence[int]], num_perm: int, seed: int) -> np.ndarray:
+    """MinHash signatures of a list of point index lists, see `minhash_signatures`."""
+    offsets = np.concatenate([[0], np.cumsum([len(points) for points in sets], dtype=np.int64)])
+    indices = np.concatenate([np.asarray(points, dtype=np.int64) for points in sets]) if sets else np.empty(0)
+    return minhash_signatures(indices, offsets, num_perm, seed)
+
+
+def lsh_band_keys(signatures: np.ndarray, bands: int) -> np.ndarray:
+    """
+    Hash each of `bands` equal slices of the signatures into one 64 bit bucket key.
+    Two sets with Jaccard index J share at least one bucket with probability 1 - (1 - J^r)^bands,
+    where r = num_perm / bands, so similar sets become candidates and dissimilar ones rarely do.
+
+    Returns:
+        np.ndarray: uint64 array of shape (number of sets, bands)
+    """
+    n_sets, num_perm = signatures.shape
+    rows = num_perm // bands
+    multipliers = np.random.default_rng(0).integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    banded = signatures[:, : bands * rows].reshape(n_sets, bands, rows).astype(np.uint64)
+    return (banded * multipliers).sum(axis=2, dtype=np.uint64)  # wraps modulo 2^64
+
+
+def estimate_jaccard(signatures: np.ndarray, query: np.ndarray, num_perm: Optional[int] = None) -> np.ndarray:
+    """Estimated Jaccard index of the query set with each set, from the first `num_perm` signature values."""
+    num_perm = num_perm or signatures.shape[1]
+    return (signatures[:, :num_perm] == query[:num_perm]).mean(axis=1)
+
+
+def estimate_error(num_perm: int, confidence: float) -> float:
+    """Hoeffding bound: an estimate from num_perm values is within this error with probability `confidence`."""
+    return math.sqrt(math.log(2 / (1 - confidence)) / (2 * num_perm))
+
+
+def permutations_for_error(max_error: float, confidence: float) -> int:
+    """Number of signature values needed for estimates within `max_error` with probability `confidence`."""
+    return math.ceil(math.log(2 / (1 - confidence)) / (2 * max_error**2))
@@ -0,0 +1,76 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+PairView = Dict[str, np.ndarray]
+
+
+def grid_cells(x: np.ndarray, y: np.ndarray, resolution: int) -> Tuple[np.ndarray, Tuple[float, float, float, float]]:
+    """
+    Cell of every point on a resolution x resolution grid spanning the points, row-major (y * resolution + x).
+
+    Returns:
+        Tuple of the cell indices and the grid extent (x min, x max, y min, y max)
+    """
+    extent = (float(x.min()), float(x.max()), float(y.min()), float(y.max())) if len(x) else (0.0, 0.0, 0.0, 0.0)
+    cells = np.zeros(len(x), dtype=np.int64)
+    for values, low, high, scale in ((y, extent[2], extent[3], resolution), (x, extent[0], extent[1], 1)):
+        position = (values - low) * (resolution / (high - low) if high > low else 0.0)
+        cells += np.clip(position.astype(np.int64), 0, resolution - 1) * scale
+    return cells, extent
+
+
+def density_tiles(labels: np.ndarray, cells: np.ndarray, resolution: int) -> PairView:
+    """
+    Points per label and occupied grid cell.
+
+    Returns:
+        PairView with the "label", "cell" and "count" of every occupied (label, cell), ordered by label and cell
+    """
+    keys, counts = np.unique(labels.astype(np.int64) * resolution * resolution + cells, return_counts=True)
+    return {"label": keys // (resolution * resolution), "cell": keys % (resolution * resolution), "count": counts}
+
+
+def density_sample(labels: np.ndarray, cells: np.ndarray, resolution: int, max_points: int, seed: int) -> PairView:
+    """
+    Random sample of at most max_points points that preserves the density of every label.
+
+    Points are stratified by (label, grid cell). Each stratum keeps its share of the sample, and at
+    least one point, so sparse regions and small clusters stay visible. When the minimum of one point
+    per stratum exceeds max_points, the strata keep their first point only and are sampled at random.
+    Each sampled point is weighted by the number of points it stands for: those of its stratum, and a
+    share of the strata of its label left without a sampled point, so the weights of a label sum to its size.
+
+    Returns:
+        PairView with the "index" (row), "label" and "weight" of every sampled point, ordered by row
+    """
+    n_points = len(labels)
+    if n_points <= max_points:
+        return {"index": np.arange(n_points), "label": labels, "weight": np.ones(n_points)}
+
+    priority = np.random.default_rng(seed).random(n_points)
+    keys = labels.astype(np.int64) * resolution * resolution + cells
+    # strata in contiguous runs, in random order within each: the priority is the fractional part of the sort key
+    order = np.argsort(keys + priority)
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sizes = np.diff(np.r_[starts, n_points])
+    strata = np.repeat(np.arange(len(starts)), sizes)
+    ranks = np.arange(n_points) - starts[strata]
+
+    quotas = np.maximum(1, np.rint(sizes * (max_points / n_points))).astype(np.int64)
+    kept = np.flatnonzero(ranks < quotas[strata])
+    if len(kept) > max_points:
+        # the lowest ranks first, so every stratum keeps as many points as possible
+        kept = kept[np.lexsort((priority[order[kept]], ranks[kept]))[:max_points]]
+
+    kept_per_stratum = np.bincount(strata[kept], minlength=len(starts))
+    weights = sizes[strata[kept]] / kept_per_stratum[strata[kept]]
+    rows = order[kept]
+    # the points of strata without a sampled point are spread over the sampled points of their label
+    sampled_labels = labels[rows].astype(np.int64)
+    label_points = np.bincount(labels.astype(np.int64))
+    label_weights = np.bincount(sampled_labels, weights=weights, minlength=len(label_points))
+    weights *= label_points[sampled_labels] / label_weights[sampled_labels]
+    by_row = np.argsort(rows)
+    return {"index": rows[by_row], "label": labels[rows[by_row]], "weight": weights[by_row]}